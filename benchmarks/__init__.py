@@ -0,0 +1,4 @@
+# Персонален Десктоп Асистент
+# Бенчмаркове
+
+"""Micro-benchmarks for the Personal Assistant."""
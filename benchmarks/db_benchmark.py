@@ -0,0 +1,107 @@
+"""
+Micro-benchmark for DatabaseManager connection handling.
+
+Compares the old connect-per-call pattern with the pooled per-thread
+connection for single-row inserts and reads, and per-row commits with
+the batched transaction API.
+
+Usage:
+    python -m benchmarks.db_benchmark [operations]
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from src.database.db_manager import DatabaseManager
+
+
+def legacy_add_note(db_path: str, title: str, content: str) -> int:
+    """Insert a note the way DatabaseManager did before connection pooling."""
+    with sqlite3.connect(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO notes (title, content) VALUES (?, ?)",
+            (title, content)
+        )
+        conn.commit()
+        return cursor.lastrowid
+
+
+def legacy_get_note(db_path: str, note_id: int):
+    """Read a single note with a fresh connection."""
+    with sqlite3.connect(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM notes WHERE id=?", (note_id,))
+        return cursor.fetchone()
+
+
+def pooled_get_note(db: DatabaseManager, note_id: int):
+    """Read a single note through the pooled connection."""
+    cursor = db._get_connection().execute("SELECT * FROM notes WHERE id=?", (note_id,))
+    return cursor.fetchone()
+
+
+def measure(label: str, operations: int, func) -> float:
+    """Run func(i) for each operation and print operations per second."""
+    start = time.perf_counter()
+    for i in range(operations):
+        func(i)
+    elapsed = time.perf_counter() - start
+    rate = operations / elapsed if elapsed else float("inf")
+    print(f"{label:<28} {rate:>12,.0f} ops/s  ({elapsed * 1000:.1f} ms)")
+    return rate
+
+
+def measure_once(label: str, rows: int, func) -> float:
+    """Run func() once and print the elapsed time for the whole batch."""
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed * 1000:>12.1f} ms for {rows} rows")
+    return elapsed
+
+
+def main(operations: int = 2000):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        legacy_path = os.path.join(tmp_dir, "legacy.db")
+        pooled_path = os.path.join(tmp_dir, "pooled.db")
+
+        # Create both schemas; the legacy database keeps the default rollback journal
+        DatabaseManager(legacy_path).close()
+        with sqlite3.connect(legacy_path) as conn:
+            conn.execute("PRAGMA journal_mode=DELETE")
+        db = DatabaseManager(pooled_path)
+
+        print(f"{operations} operations per case\n")
+
+        before_insert = measure("insert (connect per call)", operations,
+                                lambda i: legacy_add_note(legacy_path, f"Бележка {i}", "текст"))
+        after_insert = measure("insert (pooled, WAL)", operations,
+                               lambda i: db.add_note(f"Бележка {i}", "текст"))
+
+        before_read = measure("read (connect per call)", operations,
+                              lambda i: legacy_get_note(legacy_path, i % operations + 1))
+        after_read = measure("read (pooled)", operations,
+                             lambda i: pooled_get_note(db, i % operations + 1))
+
+        print(f"\ninsert speed-up: {after_insert / before_insert:.1f}x")
+        print(f"read speed-up:   {after_read / before_read:.1f}x\n")
+
+        todos = [{"task": f"Задача {i}", "priority": "medium"} for i in range(operations)]
+        per_row = measure_once("add_todo per row", operations,
+                               lambda: [db.add_todo(**todo) for todo in todos])
+        batched = measure_once("add_todos_bulk", operations,
+                               lambda: db.add_todos_bulk(todos))
+        ids = [todo["id"] for todo in db.get_todos()]
+        measure_once("delete_todos", len(ids), lambda: db.delete_todos(ids))
+
+        print(f"\nbulk insert speed-up: {per_row / batched:.1f}x")
+
+        db.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,80 @@
+"""
+HTTP overhead benchmark: module-level requests calls vs. pooled sessions.
+
+Starts a local keep-alive stub server and sends the same small request
+with requests.get (a new connection every call, as LLMService and
+WeatherWidget did before) and with http_client.get (one pooled
+connection per host). Prints the average latency and the number of TCP
+connections the server accepted.
+
+Usage:
+    python -m benchmarks.http_benchmark [requests]
+"""
+
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from src.services import http_client
+
+BODY = b'{"message": {"content": "OK"}, "done": true}'
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True  # headers and body are separate writes
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server() -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    server.connections = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def measure(label: str, server: ThreadingHTTPServer, count: int, func) -> float:
+    """Call func() count times and print the average latency and connections used."""
+    server.connections = 0
+    start = time.perf_counter()
+    for _ in range(count):
+        func().raise_for_status()
+    elapsed = (time.perf_counter() - start) / count * 1000
+    print(f"{label:<28} {elapsed:>8.3f} ms/request  {server.connections:>5} connections")
+    return elapsed
+
+
+def main(count: int = 500):
+    server = start_server()
+    url = f"http://127.0.0.1:{server.server_address[1]}/api/version"
+
+    print(f"{count} requests to a local stub server\n")
+    before = measure("requests.get (no pooling)", server, count,
+                     lambda: requests.get(url, timeout=10))
+    after = measure("http_client.get (pooled)", server, count,
+                    lambda: http_client.get(url, timeout=10))
+    print(f"\nper-request overhead removed: {before - after:.3f} ms ({before / after:.1f}x faster)")
+
+    http_client.close_all()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,72 @@
+"""
+First-message latency benchmark for the Ollama warm-up.
+
+Needs a running Ollama server with the model pulled. For each round the
+model is unloaded (keep_alive 0), then the time to the first streamed
+token of a chat message is measured:
+
+  cold     - the message is sent right after the unload
+  warm     - LLMService.warm_up() ran (and finished) before the message
+  repeat   - a second message in the same chat, reusing the cached prefix
+
+Usage:
+    python -m benchmarks.llm_warmup [model] [rounds]
+"""
+
+import statistics
+import sys
+import time
+
+import config
+from src.services import http_client
+from src.services.llm_service import LLMService
+
+QUESTION = "Каква е столицата на България?"
+FOLLOW_UP = "А колко жители има?"
+
+
+def unload(service: LLMService, model: str):
+    """Ask Ollama to drop the model from memory."""
+    http_client.post(f"{service.registry.get('ollama').api_url}/chat",
+                     json={"model": model, "messages": [], "keep_alive": 0},
+                     timeout=config.API_TIMEOUT).raise_for_status()
+
+
+def first_token_ms(service: LLMService, message: str, history=None) -> float:
+    """Time until the first piece of the reply arrives; reads the rest of the reply too."""
+    start = time.perf_counter()
+    first = None
+    for _ in service.stream_response(message, history):
+        if first is None:
+            first = (time.perf_counter() - start) * 1000
+    return first
+
+
+def main(model: str = config.DEFAULT_LLM_MODEL, rounds: int = 3):
+    service = LLMService()
+    service.model = model
+    history = [{"role": "user", "content": QUESTION},
+               {"role": "assistant", "content": "София."}]
+
+    results = {"cold": [], "warm": [], "repeat": []}
+    for _ in range(rounds):
+        unload(service, model)
+        results["cold"].append(first_token_ms(service, QUESTION))
+
+        unload(service, model)
+        service.warm_up()
+        service._executor.submit(lambda: None).result()  # wait for the warm-up
+        results["warm"].append(first_token_ms(service, QUESTION))
+        results["repeat"].append(first_token_ms(service, FOLLOW_UP, history))
+
+    print(f"model {model}, keep_alive {config.OLLAMA_KEEP_ALIVE}, {rounds} rounds\n")
+    print(f"{'first message':<16} {'median':>10} {'min':>10} {'max':>10}")
+    for label, times in results.items():
+        print(f"{label:<16} {statistics.median(times):>7.0f} ms {min(times):>7.0f} ms {max(times):>7.0f} ms")
+
+    service.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else config.DEFAULT_LLM_MODEL,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 3)
@@ -0,0 +1,111 @@
+"""
+Query-plan benchmark for the list queries used by the widgets.
+
+Fills a database with sample notes, todos and events, then makes the store
+calls the widgets make, captures the SQL they send and prints its EXPLAIN
+QUERY PLAN output and the timing of each call, with the list indexes and
+again after dropping them.
+
+Usage:
+    python -m benchmarks.query_plans [rows]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+from src.database.db_manager import DatabaseManager
+from src.database.stores import EventStore, NotesStore, TodoStore
+
+# Rows shown before "load more" (NOTES_PAGE_SIZE in notes_widget.py,
+# TODOS_PAGE_SIZE in todo_widget.py)
+NOTES_PAGE_SIZE = 50
+TODOS_PAGE_SIZE = 50
+
+# Store calls made by the widgets when they show their lists
+CALLS = [
+    ("notes, first page", lambda db: NotesStore(db).load_page(NOTES_PAGE_SIZE)),
+    ("todos, first page", lambda db: TodoStore(db).load_page(TODOS_PAGE_SIZE)),
+    ("active todos, first page", lambda db: TodoStore(db).load_page(TODOS_PAGE_SIZE, completed=False)),
+    ("todo counts", lambda db: TodoStore(db).counts()),
+    ("events on a day", lambda db: EventStore(db).load_day("2024-06-15")),
+    ("event dates of a month", lambda db: EventStore(db).event_dates("2024-06-01", "2024-06-30")),
+]
+
+INDEXES = [
+    "idx_notes_updated_at",
+    "idx_todos_list_order",
+    "idx_events_date_time",
+]
+
+REPEATS = 20
+
+
+def populate(db: DatabaseManager, rows: int):
+    with db.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO notes (title, content, updated_at) VALUES (?, ?, datetime('now', ?))",
+            ((f"Бележка {i}", "текст", f"-{i} minutes") for i in range(rows))
+        )
+        conn.executemany(
+            "INSERT INTO todos (task, completed, priority, created_at) "
+            "VALUES (?, ?, ?, datetime('now', ?))",
+            ((f"Задача {i}", i % 3 == 0, random.choice(["low", "medium", "high"]), f"-{i} minutes")
+             for i in range(rows))
+        )
+        conn.executemany(
+            "INSERT INTO events (title, description, event_date, event_time) "
+            "VALUES (?, '', date('2024-01-01', ?), ?)",
+            ((f"Събитие {i}", f"+{i % 365} days", f"{i % 24:02d}:00") for i in range(rows))
+        )
+
+
+def captured_queries(db: DatabaseManager, call) -> list:
+    """Run a store call once and return the SELECT statements it sent, parameters filled in."""
+    conn = db._get_connection()
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        call(db)
+    finally:
+        conn.set_trace_callback(None)
+    return [sql for sql in statements if sql.lstrip().upper().startswith("SELECT")]
+
+
+def report(db: DatabaseManager):
+    conn = db._get_connection()
+    for label, call in CALLS:
+        plans = [
+            "; ".join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}"))
+            for sql in captured_queries(db, call)
+        ]
+        start = time.perf_counter()
+        for _ in range(REPEATS):
+            call(db)
+        elapsed = (time.perf_counter() - start) / REPEATS * 1000
+        print(f"  {label:<24} {elapsed:>8.2f} ms  {' | '.join(plans)}")
+
+
+def main(rows: int = 50_000):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = DatabaseManager(os.path.join(tmp_dir, "plans.db"))
+        populate(db, rows)
+        db._get_connection().execute("ANALYZE")
+
+        print(f"{rows} rows per table\n\nWith indexes:")
+        report(db)
+
+        with db.transaction() as conn:
+            for index in INDEXES:
+                conn.execute(f"DROP INDEX {index}")
+            conn.execute("ANALYZE")
+
+        print("\nWithout indexes:")
+        report(db)
+        db.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000)
@@ -0,0 +1,81 @@
+"""
+Semantic index benchmark: search latency and incremental re-embedding.
+
+Fills a database with short notes, indexes them with a stand-in embedder
+(random unit vectors, so no Ollama server is needed), then times
+SemanticIndex.search_vector over all chunks and counts how many texts are
+embedded again after one note is edited. Without a dimensions argument it
+runs at 384 dimensions and at the size of the default model.
+
+Usage:
+    python -m benchmarks.retrieval_benchmark [chunks] [dimensions]
+"""
+
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from src.database.db_manager import DatabaseManager
+from src.services.retrieval import SemanticIndex, normalize
+
+REPEATS = 50
+SYNC_BATCH = 5000
+
+# Embedding size of bge-m3, the default EMBEDDING_MODEL
+MODEL_DIMENSIONS = 1024
+
+
+class RandomEmbedder:
+    """Stand-in for embed_texts that counts the texts it was asked to embed."""
+
+    def __init__(self, dimensions: int):
+        self.dimensions = dimensions
+        self.rng = np.random.default_rng(0)
+        self.embedded = 0
+
+    def __call__(self, texts):
+        self.embedded += len(texts)
+        return normalize(self.rng.standard_normal((len(texts), self.dimensions), dtype=np.float32))
+
+
+def main(count: int = 100_000, dimensions: int = 384):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = DatabaseManager(os.path.join(tmp_dir, "retrieval.db"))
+        db.add_notes_bulk({'title': f"Бележка {i}", 'content': f"Кратък текст {i}"} for i in range(count))
+
+        embedder = RandomEmbedder(dimensions)
+        index = SemanticIndex(db, "benchmark", os.path.join(tmp_dir, "embeddings"), embed=embedder)
+        start = time.perf_counter()
+        while index.sync(SYNC_BATCH):
+            pass
+        print(f"indexed {count} chunks of {dimensions} dimensions in {time.perf_counter() - start:.1f} s "
+              f"({os.path.getsize(index.path) / 2 ** 20:.0f} MiB file)\n")
+
+        queries = embedder(["заявка"] * REPEATS)
+        index.search_vector(queries[0])  # page the file in
+        times = []
+        for query in queries:
+            start = time.perf_counter()
+            index.search_vector(query, k=4, min_score=-1.0)
+            times.append((time.perf_counter() - start) * 1000)
+        print(f"search top-4: median {statistics.median(times):.2f} ms, "
+              f"min {min(times):.2f} ms, max {max(times):.2f} ms")
+
+        embedder.embedded = 0
+        db.update_note(count // 2, "Бележка", "Променен текст")
+        index.sync()
+        print(f"after editing one note: {embedder.embedded} text(s) embedded again")
+
+        index.close()
+        db.close()
+
+
+if __name__ == "__main__":
+    chunks = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    for dimensions in [int(sys.argv[2])] if len(sys.argv) > 2 else [384, MODEL_DIMENSIONS]:
+        main(chunks, dimensions)
+        print()
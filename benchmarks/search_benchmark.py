@@ -0,0 +1,72 @@
+"""
+Notes search benchmark: substring scan vs. the FTS5 index.
+
+Fills a database with long notes and times one search with the old
+NotesWidget approach (loading every note and checking title and content
+with `in`) and with NotesStore.search.
+
+Usage:
+    python -m benchmarks.search_benchmark [notes]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+from src.database.db_manager import DatabaseManager
+from src.database.stores import NotesStore
+
+WORDS = [
+    "среща", "проект", "купи", "мляко", "хляб", "учене", "програмиране",
+    "здраве", "спорт", "книга", "филм", "пътуване", "python", "tkinter",
+    "отчет", "бюджет", "лекар", "рожден", "ден", "подарък", "ремонт",
+]
+
+QUERIES = ["мляко", "прог", "рожден ден", "несъществуваща"]
+
+WORDS_PER_NOTE = 300
+REPEATS = 10
+
+
+def make_notes(count: int):
+    for i in range(count):
+        yield {
+            'title': f"Бележка {i} " + " ".join(random.choices(WORDS, k=2)),
+            'content': " ".join(random.choices(WORDS, k=WORDS_PER_NOTE)) + f" уникална{i}"
+        }
+
+
+def scan_search(db: DatabaseManager, term: str):
+    """Search the way NotesWidget did before the full-text index."""
+    term = term.lower()
+    return [note for note in db.get_notes()
+            if term in note['title'].lower() or term in note['content'].lower()]
+
+
+def measure_ms(func) -> float:
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        func()
+    return (time.perf_counter() - start) / REPEATS * 1000
+
+
+def main(count: int = 5000):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = DatabaseManager(os.path.join(tmp_dir, "search.db"))
+        db.add_notes_bulk(make_notes(count))
+        store = NotesStore(db)
+
+        print(f"{count} notes, {WORDS_PER_NOTE} words each\n")
+        print(f"{'query':<20} {'scan':>12} {'FTS5':>12}")
+        for query in QUERIES + [f"уникална{count // 2}"]:
+            scan_ms = measure_ms(lambda: scan_search(db, query))
+            fts_ms = measure_ms(lambda: store.search(query))
+            print(f"{query:<20} {scan_ms:>9.2f} ms {fts_ms:>9.2f} ms")
+
+        db.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,73 @@
+"""
+Save-latency benchmark: whole-file JSON rewrite vs. single-row SQLite write.
+
+For growing dataset sizes, measures how long saving one edited note takes
+with the old NotesWidget.save_notes approach (json.dump of every note with
+indent=4) and with NotesStore.save.
+
+Usage:
+    python -m benchmarks.storage_benchmark
+"""
+
+import json
+import os
+import tempfile
+import time
+
+from src.database.db_manager import DatabaseManager
+from src.database.stores import NotesStore
+
+SIZES = [10, 1_000, 10_000, 100_000]
+REPEATS = 5
+
+
+def make_notes(count: int):
+    timestamp = "2024-01-01T10:00:00"
+    return [
+        {
+            'id': str(i + 1),
+            'title': f"Бележка {i}",
+            'content': "Съдържание на бележката " * 10,
+            'created': timestamp,
+            'modified': timestamp
+        }
+        for i in range(count)
+    ]
+
+
+def json_save_ms(path: str, notes) -> float:
+    """Average time of one save_notes() call on a list of this size."""
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        notes[0]['content'] += "."
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(notes, f, ensure_ascii=False, indent=4)
+    return (time.perf_counter() - start) / REPEATS * 1000
+
+
+def store_save_ms(store: NotesStore, note_id: int) -> float:
+    """Average time of one NotesStore.save() update."""
+    start = time.perf_counter()
+    for i in range(REPEATS):
+        store.save(note_id, "Бележка", f"Редактирано съдържание {i}")
+    return (time.perf_counter() - start) / REPEATS * 1000
+
+
+def main():
+    print(f"{'records':>10} {'JSON rewrite':>15} {'SQLite row':>15}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in SIZES:
+            notes = make_notes(size)
+            json_ms = json_save_ms(os.path.join(tmp_dir, f"notes_{size}.json"), notes)
+
+            db = DatabaseManager(os.path.join(tmp_dir, f"notes_{size}.db"))
+            db.add_notes_bulk(notes)
+            store = NotesStore(db)
+            sqlite_ms = store_save_ms(store, size // 2 + 1)
+            db.close()
+
+            print(f"{size:>10,} {json_ms:>12.2f} ms {sqlite_ms:>12.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
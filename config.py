@@ -25,24 +25,82 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 
 # LLM settings
 DEFAULT_LLM_MODEL = os.getenv("LLM_MODEL", "llama3.2")
-AVAILABLE_MODELS = ["llama3.2", "mistral", "phi3", "openai"]
+# Ollama models offered until the installed ones are read from /api/tags
+AVAILABLE_MODELS = ["llama3.2", "mistral", "phi3"]
+LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.7"))
+LLM_QUEUE_SIZE = 4  # requests that may wait behind the one being generated
+LLM_CONTEXT_TOKENS = 1024  # prompt budget: system prompt, history and the new message
+
+# OpenAI or any compatible server (LM Studio, vLLM, llama.cpp); shown as "openai" in the settings
+OPENAI_API_URL = os.getenv("OPENAI_API_URL", "https://api.openai.com/v1")
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+
+# Providers tried when the selected one fails, fastest first (LLM_FAILOVER in .env);
+# the stub provider repeats the question and is only registered with LLM_STUB=true
+LLM_FAILOVER = [name.strip() for name in os.getenv("LLM_FAILOVER", "ollama,openai,stub").split(",") if name.strip()]
+LLM_STUB_ENABLED = os.getenv("LLM_STUB", "false").lower() == "true"
+LLM_HEALTH_INTERVAL = 60  # seconds a failed provider is skipped before it is tried again
+LLM_STATS_WINDOW = 50  # requests kept for the latency and error statistics
+LLM_METRICS_SIZE = 200  # calls kept for the diagnostics in the settings
+
+# How long Ollama keeps the model loaded after the last request ("30m", "1h", "-1m" for ever)
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+OLLAMA_NUM_CTX = 4096  # context window; must fit the prompt budget plus the reply
+
+# Response cache for repeated prompts (LLM_CACHE in .env):
+# "deterministic" caches only when LLM_TEMPERATURE is 0, "all" always, "off" never
+LLM_CACHE_MODE = os.getenv("LLM_CACHE", "deterministic").lower()
+LLM_CACHE_PATH = "data/llm_cache.db"
+LLM_CACHE_MAX_ENTRIES = 1000
+LLM_CACHE_TTL = 24 * 3600  # seconds
+
+# Rolling summary of the chat turns that no longer fit the prompt (LLM_SUMMARY=true in .env)
+LLM_SUMMARY_ENABLED = os.getenv("LLM_SUMMARY", "false").lower() == "true"
+LLM_SUMMARY_TOKENS = 256  # maximum length of the summary
+
+# Semantic search over notes, todos and events for the chat (RAG=true in .env)
+RAG_ENABLED = os.getenv("RAG", "false").lower() == "true"
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "bge-m3")  # multilingual Ollama embedding model
+EMBEDDINGS_DIR = "data/embeddings"
+RAG_TOP_K = 4  # chunks considered per message
+RAG_MIN_SCORE = 0.5  # cosine similarity below which a chunk is not related
+RAG_CONTEXT_TOKENS = 384  # part of LLM_CONTEXT_TOKENS the retrieved chunks may use
+RAG_SYNC_BATCH = 16  # changed records embedded per step
 
 # UI settings
 DEFAULT_THEME = "dark"
 SIDEBAR_WIDTH = 200
+# Build the frames not shown yet while the app is idle (PREBUILD_FRAMES=false in .env to build on first use only)
+PREBUILD_FRAMES = os.getenv("PREBUILD_FRAMES", "true").lower() == "true"
+PREBUILD_DELAY = 200  # milliseconds between two prebuilt frames
 
 # Weather settings
 DEFAULT_LOCATION = "София,BG"
+WEATHER_CACHE_PATH = "data/weather_cache.db"
+WEATHER_CACHE_TTL = int(os.getenv("WEATHER_CACHE_TTL", "600"))  # seconds a response is used without asking again
+WEATHER_REFRESH_INTERVAL = int(os.getenv("WEATHER_REFRESH_INTERVAL", "600"))  # seconds between background refreshes
+WEATHER_BACKOFF_BASE = 30  # seconds before the first retry after an error or without an API key
+WEATHER_BACKOFF_MAX = 3600  # seconds, the retry delay doubles up to this
+WEATHER_WORKERS = 10  # parallel OpenWeather requests (one per dashboard location)
+WEATHER_ICONS_DIR = "data/weather_icons"  # downloaded condition icons, also used offline
+WEATHER_ICON_CACHE_SIZE = 32  # decoded icons kept in memory (about 40 KB each)
 
 # Pomodoro settings
 DEFAULT_WORK_TIME = 25  # minutes
 DEFAULT_BREAK_TIME = 5  # minutes
 DEFAULT_LONG_BREAK_TIME = 15  # minutes
 
-# Request timeouts
+# Request timeouts (seconds); API_TIMEOUT and WEATHER_TIMEOUT are read timeouts
+CONNECT_TIMEOUT = 5
+FAILOVER_CONNECT_TIMEOUT = 2  # for an LLM provider when another one can take over
 API_TIMEOUT = 30
 WEATHER_TIMEOUT = 10
 
+# HTTP retries for 429 and 5xx responses
+HTTP_MAX_RETRIES = 3
+HTTP_BACKOFF_BASE = 0.5  # seconds, doubled after every attempt
+HTTP_BACKOFF_MAX = 8.0  # seconds
+
 # File paths
 ASSETS_DIR = "src/assets"
 COMPONENTS_DIR = "src/components"
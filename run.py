@@ -22,7 +22,8 @@ REQUIRED_PACKAGES = [
     "pillow",
     "ollama",
     "python-dotenv",
-    "tkcalendar"
+    "tkcalendar",
+    "numpy"
 ]
 
 def check_dependencies():
@@ -1,23 +1,16 @@
 import customtkinter as ctk
 from tkcalendar import Calendar
-import json
-import os
+import calendar
 import datetime
 from datetime import datetime as dt
 
 
 class CalendarWidget(ctk.CTkFrame):
-    def __init__(self, parent):
+    def __init__(self, parent, store):
         super().__init__(parent)
         
-        self.events_file = "data/events.json"
-        self.events = []
-        
-        # Ensure data directory exists
-        os.makedirs(os.path.dirname(self.events_file), exist_ok=True)
-        
-        # Load existing events
-        self.load_events()
+        self.store = store
+        self.events = []  # Events of the selected day
         
         # Create main layout
         self.create_layout()
@@ -61,8 +54,12 @@ class CalendarWidget(ctk.CTkFrame):
         
         self.calendar.pack(fill="both", expand=True, padx=10, pady=10)
         
-        # Bind selection event
+        # Days with events are marked with a calendar event tag
+        self.calendar.tag_config("event", background="#3B8ED0", foreground="white")
+        
+        # Bind selection and month change events
         self.calendar.bind("<<CalendarSelected>>", self.on_date_selected)
+        self.calendar.bind("<<CalendarMonthChanged>>", lambda event: self.mark_event_dates())
         
         # Today button
         self.today_button = ctk.CTkButton(self.calendar_frame, text="Днес", 
@@ -136,25 +133,29 @@ class CalendarWidget(ctk.CTkFrame):
         self.delete_button.pack(side="right", fill="x", expand=True, padx=5)
         
         # Update events display
+        self.mark_event_dates()
         self.refresh_events_display(current_date.strftime("%Y-%m-%d"))
     
-    def load_events(self):
+    def mark_event_dates(self):
+        # One query for the dates with events in the visible month
+        month, year = self.calendar.get_displayed_month()
+        last_day = calendar.monthrange(year, month)[1]
+        start = datetime.date(year, month, 1)
+        end = datetime.date(year, month, last_day)
+        
         try:
-            if os.path.exists(self.events_file):
-                with open(self.events_file, 'r', encoding='utf-8') as f:
-                    self.events = json.load(f)
-            else:
-                self.events = []
+            event_dates = self.store.event_dates(start.isoformat(), end.isoformat())
         except Exception as e:
             print(f"Грешка при зареждане на събития: {e}")
-            self.events = []
-    
-    def save_events(self):
-        try:
-            with open(self.events_file, 'w', encoding='utf-8') as f:
-                json.dump(self.events, f, ensure_ascii=False, indent=4)
-        except Exception as e:
-            print(f"Грешка при запазване на събития: {e}")
+            return
+        
+        self.calendar.calevent_remove("all")
+        for date_str in event_dates:
+            try:
+                date_obj = dt.strptime(date_str, "%Y-%m-%d").date()
+            except ValueError:
+                continue
+            self.calendar.calevent_create(date_obj, "Събитие", tags="event")
     
     def on_date_selected(self, event):
         selected_date = self.calendar.get_date()
@@ -172,6 +173,8 @@ class CalendarWidget(ctk.CTkFrame):
     def go_to_today(self):
         today = dt.now()
         self.calendar.selection_set(today)
+        self.calendar.see(today)
+        self.mark_event_dates()
         self.date_label.configure(text=today.strftime("%d %B %Y"))
         self.refresh_events_display(today.strftime("%Y-%m-%d"))
     
@@ -180,20 +183,21 @@ class CalendarWidget(ctk.CTkFrame):
         for widget in self.events_list_frame.winfo_children():
             widget.destroy()
         
-        # Find events for the selected date
-        date_events = [event for event in self.events if event['date'] == date_str]
+        # Query the events for the selected date (already sorted by time)
+        try:
+            self.events = self.store.load_day(date_str)
+        except Exception as e:
+            print(f"Грешка при зареждане на събития: {e}")
+            self.events = []
         
-        if not date_events:
+        if not self.events:
             no_events_label = ctk.CTkLabel(self.events_list_frame, 
                                          text="Няма събития за този ден",
                                          text_color="gray")
             no_events_label.pack(pady=20)
         else:
-            # Sort events by time
-            sorted_events = sorted(date_events, key=lambda x: x.get('time', '00:00'))
-            
             # Add events to list
-            for event in sorted_events:
+            for event in self.events:
                 self.create_event_item(event)
     
     def create_event_item(self, event):
@@ -272,33 +276,16 @@ class CalendarWidget(ctk.CTkFrame):
         # Format time
         time_str = f"{self.hour_var.get()}:{self.minute_var.get()}"
         
-        if self.current_event_id is None:
-            # Create new event
-            new_event = {
-                'id': str(len(self.events) + 1),
-                'title': title,
-                'description': description,
-                'date': date_str,
-                'time': time_str,
-                'created': dt.now().isoformat()
-            }
-            self.events.append(new_event)
-        else:
-            # Update existing event
-            for event in self.events:
-                if event.get('id') == self.current_event_id:
-                    event['title'] = title
-                    event['description'] = description
-                    event['date'] = date_str
-                    event['time'] = time_str
-                    event['modified'] = dt.now().isoformat()
-                    break
-        
-        # Save to file
-        self.save_events()
+        # Save to database (a single-row write)
+        try:
+            self.store.save(self.current_event_id, title, description, date_str, time_str)
+        except Exception as e:
+            print(f"Грешка при запазване на събития: {e}")
+            return
         
         # Clear form and refresh display
         self.clear_event_fields()
+        self.mark_event_dates()
         self.refresh_events_display(date_str)
     
     def delete_event(self):
@@ -311,11 +298,13 @@ class CalendarWidget(ctk.CTkFrame):
         date_str = date_obj.strftime("%Y-%m-%d")
         
         # Remove event
-        self.events = [event for event in self.events if event.get('id') != self.current_event_id]
-        
-        # Save changes
-        self.save_events()
+        try:
+            self.store.delete(self.current_event_id)
+        except Exception as e:
+            print(f"Грешка при изтриване на събитие: {e}")
+            return
         
         # Clear form and refresh display
         self.clear_event_fields()
+        self.mark_event_dates()
         self.refresh_events_display(date_str) 
\ No newline at end of file
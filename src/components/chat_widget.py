@@ -1,20 +1,26 @@
 import customtkinter as ctk
-import json
-import os
 import datetime
-import threading
+import queue
+import time
+
+# Messages loaded per page; older ones are fetched on demand
+CHAT_PAGE_SIZE = 50
+
+# Minimum time (ms) between redraws of a streaming reply (~30 frames per second)
+STREAM_FRAME_MS = 33
 
 
 class ChatWidget(ctk.CTkFrame):
-    def __init__(self, parent, llm_service):
+    def __init__(self, parent, llm_service, store):
         super().__init__(parent)
         
         self.llm_service = llm_service
-        self.chat_history = []
-        self.chat_file = "data/chat_history.json"
-        
-        # Ensure data directory exists
-        os.makedirs(os.path.dirname(self.chat_file), exist_ok=True)
+        self.store = store
+        self.chat_history = []  # Loaded messages, oldest first
+        self.has_older = False
+        self.older_button = None
+        self.active_streams = []  # Replies queued or streaming, oldest first
+        self.unsaved = []  # Shown messages not stored yet, in screen order
         
         # Load chat history
         self.load_chat_history()
@@ -44,6 +50,10 @@ class ChatWidget(ctk.CTkFrame):
                                         fg_color="#FF5555", hover_color="#FF3333")
         self.clear_button.pack(side="right", padx=5)
         
+        self.stop_button = ctk.CTkButton(self.input_frame, text="Спри",
+                                       command=self.stop_responses, state="disabled")
+        self.stop_button.pack(side="right", padx=5)
+        
         # Status indicator
         self.status_frame = ctk.CTkFrame(self, height=30)
         self.status_frame.pack(fill="x", padx=10, pady=(0, 10))
@@ -55,6 +65,11 @@ class ChatWidget(ctk.CTkFrame):
                                       text=f"Модел: {self.llm_service.model}")
         self.model_label.pack(side="right", padx=5)
         
+        # Response cache counters (hidden when the cache is off)
+        self.cache_label = ctk.CTkLabel(self.status_frame, text="", text_color="gray")
+        self.cache_label.pack(side="right", padx=5)
+        self.update_cache_label()
+        
         # Display existing chat history
         self.display_chat_history()
         
@@ -63,22 +78,62 @@ class ChatWidget(ctk.CTkFrame):
             self.add_assistant_message("Здравейте! С какво мога да ви помогна днес?")
     
     def load_chat_history(self):
+        # Only the most recent page is loaded at startup
         try:
-            if os.path.exists(self.chat_file):
-                with open(self.chat_file, 'r', encoding='utf-8') as f:
-                    self.chat_history = json.load(f)
-            else:
-                self.chat_history = []
+            self.chat_history, self.has_older = self.store.load_page(CHAT_PAGE_SIZE)
         except Exception as e:
             print(f"Грешка при зареждане на чат история: {e}")
-            self.chat_history = []
+            self.chat_history, self.has_older = [], False
     
-    def save_chat_history(self):
+    def load_older_messages(self):
+        oldest_id = next((message['id'] for message in self.chat_history if 'id' in message), None)
+        if oldest_id is None:
+            return
+        
         try:
-            with open(self.chat_file, 'w', encoding='utf-8') as f:
-                json.dump(self.chat_history, f, ensure_ascii=False, indent=4)
+            older, self.has_older = self.store.load_page(CHAT_PAGE_SIZE, before_id=oldest_id)
         except Exception as e:
-            print(f"Грешка при запазване на чат история: {e}")
+            print(f"Грешка при зареждане на чат история: {e}")
+            return
+        
+        # Insert the older messages above the ones already shown
+        self.older_button.destroy()
+        self.older_button = None
+        children = self.chat_frame.winfo_children()
+        anchor = children[0] if children else None
+        for message in older:
+            self.display_message(message['role'], message['content'], before=anchor)
+        
+        self.chat_history = older + self.chat_history
+        self.show_older_button()
+    
+    def show_older_button(self):
+        if not self.has_older:
+            return
+        
+        children = self.chat_frame.winfo_children()
+        self.older_button = ctk.CTkButton(self.chat_frame, text="Покажи по-стари съобщения",
+                                        fg_color="transparent", border_width=1,
+                                        command=self.load_older_messages)
+        if children:
+            self.older_button.pack(pady=5, before=children[0])
+        else:
+            self.older_button.pack(pady=5)
+    
+    def save_message(self, message):
+        self.unsaved.append(message)
+        self.save_pending_messages()
+    
+    def save_pending_messages(self):
+        # Messages are stored in screen order, and a reply only once it is complete,
+        # so a reply that is still streaming holds back the messages sent after it
+        streaming = [stream["message"] for stream in self.active_streams]
+        while self.unsaved and not any(self.unsaved[0] is reply for reply in streaming):
+            message = self.unsaved.pop(0)
+            try:
+                message['id'] = self.store.append(message['role'], message['content'])
+            except Exception as e:
+                print(f"Грешка при запазване на чат история: {e}")
     
     def display_chat_history(self):
         # Clear existing messages
@@ -88,8 +143,10 @@ class ChatWidget(ctk.CTkFrame):
         # Display messages
         for message in self.chat_history:
             self.display_message(message['role'], message['content'])
+        
+        self.show_older_button()
     
-    def display_message(self, role, content):
+    def display_message(self, role, content, before=None):
         # Create message frame
         if role == "user":
             message_frame = ctk.CTkFrame(self.chat_frame, fg_color="#1E3A5F")
@@ -98,7 +155,10 @@ class ChatWidget(ctk.CTkFrame):
             message_frame = ctk.CTkFrame(self.chat_frame, fg_color="#2D4263")
             align = "w"  # west = left
         
-        message_frame.pack(fill="x", pady=5, padx=10, anchor=align)
+        if before is not None:
+            message_frame.pack(fill="x", pady=5, padx=10, anchor=align, before=before)
+        else:
+            message_frame.pack(fill="x", pady=5, padx=10, anchor=align)
         
         # Role label
         role_text = "Вие" if role == "user" else "Асистент"
@@ -123,18 +183,20 @@ class ChatWidget(ctk.CTkFrame):
                                font=ctk.CTkFont(size=10),
                                text_color="gray")
         time_label.pack(anchor="e", padx=10, pady=(0, 5))
+        
+        return content_label
     
     def add_user_message(self, content):
         message = {"role": "user", "content": content, "time": datetime.datetime.now().isoformat()}
         self.chat_history.append(message)
         self.display_message("user", content)
-        self.save_chat_history()
+        self.save_message(message)
     
     def add_assistant_message(self, content):
         message = {"role": "assistant", "content": content, "time": datetime.datetime.now().isoformat()}
         self.chat_history.append(message)
         self.display_message("assistant", content)
-        self.save_chat_history()
+        self.save_message(message)
     
     def on_enter_key(self, event):
         # Only send if not combined with Shift (which creates a new line)
@@ -147,36 +209,126 @@ class ChatWidget(ctk.CTkFrame):
         if not message:
             return
         
+        # Context for this request; the service adds the new message itself
+        history = list(self.chat_history)
+        
+        # Reply placeholder; its content is filled in when the reply ends, before
+        # the next queued request reads the history
+        reply = {"role": "assistant", "content": "", "time": datetime.datetime.now().isoformat()}
+        stream = {"queue": queue.Queue(), "text": "", "message": reply}
+        
+        def finish(text, cancelled):
+            reply["content"] = text
+            stream["queue"].put(None)
+        
+        def receive(delta):
+            # The arrival time shows how long the piece waits to be drawn
+            stream["queue"].put((time.perf_counter(), delta))
+        
+        # Queue the request; replies are generated one at a time, in order
+        request = self.llm_service.submit(message, history, on_delta=receive, on_done=finish)
+        if request is None:
+            self.status_indicator.configure(text="Изчакайте текущите отговори", text_color="red")
+            return
+        stream["request"] = request
+        
         # Clear input
         self.message_entry.delete("1.0", "end")
         
         # Add user message to chat
         self.add_user_message(message)
         
+        # Empty reply bubble that is filled in as the response streams in;
+        # it is stored when the reply is complete
+        stream["label"] = self.display_message("assistant", "")
+        self.active_streams.append(stream)
+        self.chat_history.append(reply)
+        self.save_message(reply)
+        
         # Update status
         self.status_indicator.configure(text="Мисля...", text_color="orange")
+        self.stop_button.configure(state="normal")
         
-        # Get response in separate thread
-        threading.Thread(target=self.get_response, args=(message,), daemon=True).start()
+        self.after(STREAM_FRAME_MS, self.update_stream, stream)
     
-    def get_response(self, message):
-        try:
-            # This would call the LLM service
-            response = self.llm_service.get_response(message, self.chat_history)
-            
-            # Update UI in main thread
-            self.after(0, lambda: self.add_assistant_message(response))
-        except Exception as e:
-            error_message = f"Грешка при комуникацията с LLM: {str(e)}"
-            self.after(0, lambda: self.add_assistant_message(error_message))
-        finally:
+    def update_stream(self, stream):
+        # The chat was cleared while the reply was streaming
+        if not stream["label"].winfo_exists():
+            return
+        
+        # Take everything that arrived since the last frame and redraw once
+        finished = False
+        pieces = []
+        first_arrival = None
+        while True:
+            try:
+                item = stream["queue"].get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                finished = True
+                break
+            arrival, delta = item
+            if first_arrival is None:
+                first_arrival = arrival
+            pieces.append(delta)
+        
+        if pieces:
+            stream["text"] += "".join(pieces)
+            stream["label"].configure(text=stream["text"])
+            self.llm_service.metrics.record_ui_delay(time.perf_counter() - first_arrival)
+        
+        if not finished:
+            self.after(STREAM_FRAME_MS, self.update_stream, stream)
+            return
+        
+        self.finish_stream(stream)
+    
+    def finish_stream(self, stream):
+        reply = stream["message"]
+        self.active_streams.remove(stream)
+        if not reply["content"]:
+            # Stopped or failed before any text arrived: drop the empty bubble unsaved
+            stream["label"].master.destroy()
+            self.chat_history = [message for message in self.chat_history if message is not reply]
+            self.unsaved = [message for message in self.unsaved if message is not reply]
+        self.save_pending_messages()
+        
+        self.update_cache_label()
+        if not self.active_streams:
             # Reset status
-            self.after(0, lambda: self.status_indicator.configure(text="Готов", text_color="green"))
+            self.status_indicator.configure(text="Готов", text_color="green")
+            self.stop_button.configure(state="disabled")
+    
+    def update_cache_label(self):
+        stats = self.llm_service.cache_stats()
+        if stats is None:
+            return
+        self.cache_label.configure(
+            text=f"Кеш: {stats['hits']} попадения / {stats['misses']} пропуска"
+        )
+    
+    def stop_responses(self):
+        # Cancel the reply being generated and the ones waiting behind it
+        for stream in self.active_streams:
+            stream["request"].cancel()
     
     def clear_chat(self):
+        # Stop pending replies; their bubbles are removed below
+        self.stop_responses()
+        self.active_streams = []
+        self.stop_button.configure(state="disabled")
+        self.status_indicator.configure(text="Готов", text_color="green")
+        
         # Clear chat history
         self.chat_history = []
-        self.save_chat_history()
+        self.unsaved = []
+        self.has_older = False
+        self.older_button = None
+        try:
+            self.store.clear()
+        except Exception as e:
+            print(f"Грешка при изчистване на чат история: {e}")
         
         # Clear display
         for widget in self.chat_frame.winfo_children():
@@ -1,18 +1,37 @@
 import customtkinter as ctk
-import json
-import os
 import datetime
+import queue
+import threading
+from collections import OrderedDict
+
+from src.database.stores import SEARCH_LIMIT
+
+# Notes loaded per page into the list
+NOTES_PAGE_SIZE = 50
+
+# Pause in typing (ms) before the search runs
+SEARCH_DELAY_MS = 250
+
+# Number of recent search results kept in memory
+SEARCH_CACHE_SIZE = 16
 
 
 class NotesWidget(ctk.CTkFrame):
-    def __init__(self, parent):
+    def __init__(self, parent, store):
         super().__init__(parent)
         
-        self.notes_file = "data/notes.json"
-        self.notes = []
+        self.store = store
+        self.notes = []  # Loaded note summaries, newest first
+        self.next_cursor = None
         
-        # Ensure data directory exists
-        os.makedirs(os.path.dirname(self.notes_file), exist_ok=True)
+        # Search state; searches run on a worker thread, newest request wins
+        self.search_job = None
+        self.search_generation = 0
+        self.search_queue = queue.Queue()
+        self.search_thread = None
+        self.search_cache = OrderedDict()  # query -> results, least recently used first
+        self.last_search = None  # (query, results) currently shown
+        self.note_rows = []  # Reusable list rows
         
         # Load existing notes
         self.load_notes()
@@ -36,6 +55,8 @@ class NotesWidget(ctk.CTkFrame):
         
         self.search_entry = ctk.CTkEntry(self.search_frame, placeholder_text="Търсене...")
         self.search_entry.pack(side="left", fill="x", expand=True, padx=5)
+        self.search_entry.bind("<KeyRelease>", self.schedule_search)
+        self.search_entry.bind("<Return>", lambda event: self.search_notes())
         
         self.search_button = ctk.CTkButton(self.search_frame, text="🔍", width=30, command=self.search_notes)
         self.search_button.pack(side="right", padx=5)
@@ -47,6 +68,10 @@ class NotesWidget(ctk.CTkFrame):
         self.notes_listbox = ctk.CTkScrollableFrame(self.notes_listbox_frame)
         self.notes_listbox.pack(fill="both", expand=True)
         
+        self.more_button = ctk.CTkButton(self.notes_listbox, text="Покажи още",
+                                       fg_color="transparent", border_width=1,
+                                       command=self.load_more_notes)
+        
         # Create add note button
         self.add_button = ctk.CTkButton(self.notes_list_frame, text="Нова Бележка", command=self.new_note)
         self.add_button.pack(pady=10, padx=5, fill="x")
@@ -81,53 +106,78 @@ class NotesWidget(ctk.CTkFrame):
         self.refresh_notes_list()
     
     def load_notes(self):
+        # Only the first page is loaded; more are fetched on demand
         try:
-            if os.path.exists(self.notes_file):
-                with open(self.notes_file, 'r', encoding='utf-8') as f:
-                    self.notes = json.load(f)
-            else:
-                self.notes = []
+            self.notes, self.next_cursor = self.store.load_page(NOTES_PAGE_SIZE)
         except Exception as e:
             print(f"Грешка при зареждане на бележки: {e}")
-            self.notes = []
+            self.notes, self.next_cursor = [], None
     
-    def save_notes(self):
+    def load_more_notes(self):
+        if self.next_cursor is None:
+            return
+        
         try:
-            with open(self.notes_file, 'w', encoding='utf-8') as f:
-                json.dump(self.notes, f, ensure_ascii=False, indent=4)
+            page, self.next_cursor = self.store.load_page(NOTES_PAGE_SIZE, after=self.next_cursor)
         except Exception as e:
-            print(f"Грешка при запазване на бележки: {e}")
+            print(f"Грешка при зареждане на бележки: {e}")
+            return
+        
+        self.notes.extend(page)
+        self.refresh_notes_list()
+    
+    def refresh_notes_list(self):
+        self.show_notes(self.notes, show_more=self.next_cursor is not None)
     
-    def refresh_notes_list(self, search_term=None):
-        # Clear existing notes
-        for widget in self.notes_listbox.winfo_children():
-            widget.destroy()
-        
-        # Sort notes by last modified date (newest first)
-        sorted_notes = sorted(self.notes, key=lambda x: x.get('modified', ''), reverse=True)
-        
-        # Filter notes if search term provided
-        if search_term:
-            search_term = search_term.lower()
-            sorted_notes = [note for note in sorted_notes if 
-                          search_term in note['title'].lower() or 
-                          search_term in note['content'].lower()]
-        
-        # Add notes to listbox
-        for i, note in enumerate(sorted_notes):
-            note_frame = ctk.CTkFrame(self.notes_listbox)
-            note_frame.pack(fill="x", expand=True, padx=5, pady=2)
+    def show_notes(self, notes, show_more=False):
+        # Hide the page button so rows packed below keep their order
+        self.more_button.pack_forget()
+        
+        # Reuse the existing rows and only create the missing ones
+        while len(self.note_rows) < len(notes):
+            self.note_rows.append(self.create_note_row())
+        
+        for i, row in enumerate(self.note_rows):
+            if i >= len(notes):
+                row['frame'].pack_forget()
+                continue
             
+            note = notes[i]
             title = note['title'] if note['title'] else "Без заглавие"
             date = note.get('modified', '')[:10]
             
-            note_button = ctk.CTkButton(note_frame, text=f"{title}", 
-                                     anchor="w", 
-                                     command=lambda n=note: self.display_note(n))
-            note_button.pack(side="left", fill="x", expand=True, padx=5, pady=5)
+            row['button'].configure(text=f"{title}", command=lambda n=note: self.display_note(n))
+            row['date'].configure(text=f"{date}")
             
-            date_label = ctk.CTkLabel(note_frame, text=f"{date}")
-            date_label.pack(side="right", padx=5, pady=5)
+            # Matching text of search results, with the found words marked
+            if note.get('snippet'):
+                row['snippet'].configure(text=note['snippet'])
+                row['snippet'].pack(side="bottom", fill="x", padx=10, pady=(0, 5),
+                                    before=row['button'])
+            else:
+                row['snippet'].pack_forget()
+            
+            if not row['frame'].winfo_manager():
+                row['frame'].pack(fill="x", expand=True, padx=5, pady=2)
+        
+        # Button for the next page
+        if show_more:
+            self.more_button.pack(fill="x", padx=5, pady=5)
+    
+    def create_note_row(self):
+        note_frame = ctk.CTkFrame(self.notes_listbox)
+        
+        snippet_label = ctk.CTkLabel(note_frame, text="", anchor="w", justify="left",
+                                   wraplength=300, text_color="gray")
+        
+        note_button = ctk.CTkButton(note_frame, text="", anchor="w")
+        note_button.pack(side="left", fill="x", expand=True, padx=5, pady=5)
+        
+        date_label = ctk.CTkLabel(note_frame, text="")
+        date_label.pack(side="right", padx=5, pady=5)
+        
+        return {'frame': note_frame, 'button': note_button,
+                'date': date_label, 'snippet': snippet_label}
     
     def new_note(self):
         # Save current note before creating a new one
@@ -147,6 +197,13 @@ class NotesWidget(ctk.CTkFrame):
         if self.current_note_id is not None:
             self.save_current_note()
         
+        # Load the full note (the list only holds summaries)
+        try:
+            note = self.store.get(note.get('id')) or note
+        except Exception as e:
+            print(f"Грешка при зареждане на бележка: {e}")
+            return
+        
         # Display selected note
         self.current_note_id = note.get('id')
         
@@ -168,50 +225,120 @@ class NotesWidget(ctk.CTkFrame):
         
         timestamp = datetime.datetime.now().isoformat()
         
-        if self.current_note_id is None:
-            # New note
-            new_note = {
-                'id': str(len(self.notes) + 1),  # Simple ID generation
-                'title': title,
-                'content': content,
-                'created': timestamp,
-                'modified': timestamp
-            }
-            self.notes.append(new_note)
-            self.current_note_id = new_note['id']
-        else:
-            # Update existing note
-            for note in self.notes:
-                if note.get('id') == self.current_note_id:
-                    note['title'] = title
-                    note['content'] = content
-                    note['modified'] = timestamp
-                    break
-        
-        # Save to file
-        self.save_notes()
-        
-        # Refresh notes list
-        self.refresh_notes_list()
+        # Save to database (a single-row write)
+        try:
+            note_id = self.store.save(self.current_note_id, title, content)
+        except Exception as e:
+            print(f"Грешка при запазване на бележки: {e}")
+            return
+        
+        # The saved note is now the most recently modified one
+        self.notes = [note for note in self.notes if note.get('id') != note_id]
+        self.notes.insert(0, {
+            'id': note_id,
+            'title': title,
+            'modified': timestamp
+        })
+        self.current_note_id = note_id
+        
+        # Cached search results may no longer match; refresh the list or the current search
+        self.clear_search_cache()
+        self.search_notes()
     
     def delete_current_note(self):
         if self.current_note_id is None:
             return
         
-        # Find and remove the current note
-        self.notes = [note for note in self.notes if note.get('id') != self.current_note_id]
+        # Remove the current note
+        try:
+            self.store.delete(self.current_note_id)
+        except Exception as e:
+            print(f"Грешка при изтриване на бележка: {e}")
+            return
         
-        # Save changes
-        self.save_notes()
+        self.notes = [note for note in self.notes if note.get('id') != self.current_note_id]
         
         # Clear fields
         self.title_entry.delete(0, "end")
         self.content_text.delete("1.0", "end")
         self.current_note_id = None
         
-        # Refresh list
-        self.refresh_notes_list()
+        # Refresh list (or the current search)
+        self.clear_search_cache()
+        self.search_notes()
+    
+    def schedule_search(self, event=None):
+        # Restart the delay on every keystroke so only the last one searches
+        if self.search_job is not None:
+            self.after_cancel(self.search_job)
+        self.search_job = self.after(SEARCH_DELAY_MS, self.search_notes)
     
     def search_notes(self):
+        if self.search_job is not None:
+            self.after_cancel(self.search_job)
+            self.search_job = None
+        
         search_term = self.search_entry.get().strip()
-        self.refresh_notes_list(search_term if search_term else None) 
\ No newline at end of file
+        self.search_generation += 1
+        
+        if not search_term:
+            self.last_search = None
+            self.refresh_notes_list()
+            return
+        
+        if search_term in self.search_cache:
+            self.search_cache.move_to_end(search_term)
+            self.show_search_results(self.search_generation, search_term,
+                                     self.search_cache[search_term])
+            return
+        
+        # A longer query can only match a subset of the previous results,
+        # so a complete previous result set is narrowed instead of re-queried
+        base = None
+        if self.last_search is not None:
+            last_term, last_results = self.last_search
+            if search_term.startswith(last_term) and len(last_results) < SEARCH_LIMIT:
+                base = last_results
+        
+        if self.search_thread is None:
+            self.search_thread = threading.Thread(target=self.run_searches, daemon=True)
+            self.search_thread.start()
+        self.search_queue.put((self.search_generation, search_term, base))
+    
+    def run_searches(self):
+        while True:
+            generation, search_term, base = self.search_queue.get()
+            
+            # Skip requests that a newer keystroke has already replaced
+            if generation != self.search_generation:
+                continue
+            
+            try:
+                if base is not None:
+                    results = self.store.narrow(base, search_term)
+                else:
+                    results = self.store.search(search_term)
+            except Exception as e:
+                print(f"Грешка при търсене на бележки: {e}")
+                results = []
+            
+            # Update UI in main thread
+            self.after(0, lambda g=generation, t=search_term, r=results:
+                       self.show_search_results(g, t, r))
+    
+    def show_search_results(self, generation, search_term, results):
+        self.search_cache[search_term] = results
+        self.search_cache.move_to_end(search_term)
+        while len(self.search_cache) > SEARCH_CACHE_SIZE:
+            self.search_cache.popitem(last=False)
+        
+        # Results of an outdated query are cached but not shown
+        if generation != self.search_generation:
+            return
+        
+        self.last_search = (search_term, results)
+        self.show_notes(results)
+    
+    def clear_search_cache(self):
+        self.search_cache.clear()
+        self.last_search = None
@@ -1,15 +1,15 @@
 import customtkinter as ctk
 import time
 import threading
-import json
-import os
 from datetime import datetime, timedelta
 
 
 class PomodoroWidget(ctk.CTkFrame):
-    def __init__(self, parent):
+    def __init__(self, parent, store):
         super().__init__(parent)
         
+        self.store = store
+        
         # Default settings
         self.pomodoro_length = 25 * 60  # 25 minutes in seconds
         self.short_break_length = 5 * 60  # 5 minutes
@@ -25,12 +25,8 @@ class PomodoroWidget(ctk.CTkFrame):
         self.remaining_seconds = self.pomodoro_length
         self.timer_thread = None
         
-        # Stats file
-        self.stats_file = "data/pomodoro_stats.json"
-        self.stats = {"completed_pomodoros": 0, "total_focus_time": 0, "sessions": []}
-        
-        # Ensure data directory exists
-        os.makedirs(os.path.dirname(self.stats_file), exist_ok=True)
+        # Stats
+        self.stats = {"completed_pomodoros": 0, "total_focus_time": 0}
         
         # Load stats
         self.load_stats()
@@ -175,8 +171,13 @@ class PomodoroWidget(ctk.CTkFrame):
                                           text=f"Общо фокус време: {hours}ч {minutes}м")
         self.total_time_label.pack(fill="x", padx=5)
         
-        # Listen to window close event
-        self.bind("<Destroy>", self.on_close)
+        self.today_label = ctk.CTkLabel(self.stats_frame, text="Днес: 0ч 0м")
+        self.today_label.pack(fill="x", padx=5)
+        
+        self.streak_label = ctk.CTkLabel(self.stats_frame, text="Поредни дни: 0 (рекорд: 0)")
+        self.streak_label.pack(fill="x", padx=5)
+        
+        self.update_analytics_display()
         
         # Update the timer display
         self.update_timer_display()
@@ -184,21 +185,10 @@ class PomodoroWidget(ctk.CTkFrame):
     
     def load_stats(self):
         try:
-            if os.path.exists(self.stats_file):
-                with open(self.stats_file, 'r', encoding='utf-8') as f:
-                    self.stats = json.load(f)
-            else:
-                self.stats = {"completed_pomodoros": 0, "total_focus_time": 0, "sessions": []}
+            self.stats = self.store.get_stats()
         except Exception as e:
             print(f"Грешка при зареждане на pomodoro статистика: {e}")
-            self.stats = {"completed_pomodoros": 0, "total_focus_time": 0, "sessions": []}
-    
-    def save_stats(self):
-        try:
-            with open(self.stats_file, 'w', encoding='utf-8') as f:
-                json.dump(self.stats, f, ensure_ascii=False, indent=4)
-        except Exception as e:
-            print(f"Грешка при запазване на pomodoro статистика: {e}")
+            self.stats = {"completed_pomodoros": 0, "total_focus_time": 0}
     
     def start_timer(self):
         if self.timer_paused:
@@ -267,15 +257,10 @@ class PomodoroWidget(ctk.CTkFrame):
             self.stats['total_focus_time'] += self.pomodoro_length
             
             # Add session record
-            session = {
-                "date": datetime.now().strftime("%Y-%m-%d"),
-                "time": datetime.now().strftime("%H:%M:%S"),
-                "duration": self.pomodoro_length
-            }
-            self.stats['sessions'].append(session)
-            
-            # Save stats
-            self.save_stats()
+            try:
+                self.store.add_session(self.pomodoro_length)
+            except Exception as e:
+                print(f"Грешка при запазване на pomodoro статистика: {e}")
             
             # Update stats display
             self.update_stats_display()
@@ -332,6 +317,24 @@ class PomodoroWidget(ctk.CTkFrame):
         self.total_time_label.configure(
             text=f"Общо фокус време: {hours}ч {minutes}м"
         )
+        
+        self.update_analytics_display()
+    
+    def update_analytics_display(self):
+        # Aggregates are computed in SQL from the daily rollup table
+        try:
+            today_time = self.store.get_today_focus_time()
+            streak = self.store.get_streak()
+        except Exception as e:
+            print(f"Грешка при зареждане на pomodoro статистика: {e}")
+            return
+        
+        self.today_label.configure(
+            text=f"Днес: {today_time // 3600}ч {(today_time % 3600) // 60}м"
+        )
+        self.streak_label.configure(
+            text=f"Поредни дни: {streak['current']} (рекорд: {streak['longest']})"
+        )
     
     def highlight_active_mode(self):
         default_color = "#1f538d"  # Default button color
@@ -358,7 +361,3 @@ class PomodoroWidget(ctk.CTkFrame):
             print(f"Грешка при прилагане на настройките: {e}")
             # Handle invalid input (could show error dialog)
             pass
-    
-    def on_close(self, event):
-        # Save stats when closing
-        self.save_stats() 
\ No newline at end of file
@@ -1,18 +1,20 @@
 import customtkinter as ctk
-import json
-import os
-import datetime
+
+# Todos loaded per page into the list
+TODOS_PAGE_SIZE = 50
+
+# Completion filter of each tab for TodoStore.load_page
+TAB_FILTERS = {"all": None, "active": False, "completed": True}
 
 
 class TodoWidget(ctk.CTkFrame):
-    def __init__(self, parent):
+    def __init__(self, parent, store):
         super().__init__(parent)
         
-        self.todo_file = "data/todos.json"
-        self.todos = []
-        
-        # Ensure data directory exists
-        os.makedirs(os.path.dirname(self.todo_file), exist_ok=True)
+        self.store = store
+        self.todos = []  # Loaded todos of the current tab, in list order
+        self.next_cursor = None
+        self.current_tab = "all"
         
         # Load existing todos
         self.load_todos()
@@ -62,14 +64,17 @@ class TodoWidget(ctk.CTkFrame):
                                          command=lambda: self.show_tab("completed"))
         self.completed_tab.pack(side="left", fill="x", expand=True, padx=2)
         
-        # Set default active tab
-        self.current_tab = "all"
+        # Highlight the default tab
         self.highlight_active_tab()
         
         # Create tasks list
         self.tasks_frame = ctk.CTkScrollableFrame(self)
         self.tasks_frame.pack(fill="both", expand=True, padx=10, pady=10)
         
+        self.more_button = ctk.CTkButton(self.tasks_frame, text="Покажи още",
+                                       fg_color="transparent", border_width=1,
+                                       command=self.load_more_todos)
+        
         # Footer with stats
         self.footer_frame = ctk.CTkFrame(self)
         self.footer_frame.pack(fill="x", padx=10, pady=10)
@@ -88,74 +93,84 @@ class TodoWidget(ctk.CTkFrame):
         self.refresh_todo_list()
         self.update_stats()
     
-    def load_todos(self):
+    def load_todos(self, limit=TODOS_PAGE_SIZE):
+        # Only the first page of the current tab is loaded; more are fetched on demand
         try:
-            if os.path.exists(self.todo_file):
-                with open(self.todo_file, 'r', encoding='utf-8') as f:
-                    self.todos = json.load(f)
-            else:
-                self.todos = []
+            self.todos, self.next_cursor = self.store.load_page(
+                limit, completed=TAB_FILTERS[self.current_tab])
         except Exception as e:
             print(f"Грешка при зареждане на задачи: {e}")
-            self.todos = []
+            self.todos, self.next_cursor = [], None
     
-    def save_todos(self):
+    def load_more_todos(self):
+        if self.next_cursor is None:
+            return
+        
         try:
-            with open(self.todo_file, 'w', encoding='utf-8') as f:
-                json.dump(self.todos, f, ensure_ascii=False, indent=4)
+            page, self.next_cursor = self.store.load_page(
+                TODOS_PAGE_SIZE, after=self.next_cursor, completed=TAB_FILTERS[self.current_tab])
         except Exception as e:
-            print(f"Грешка при запазване на задачи: {e}")
+            print(f"Грешка при зареждане на задачи: {e}")
+            return
+        
+        self.todos.extend(page)
+        self.refresh_todo_list()
+    
+    def reload_todos(self):
+        # A change can move todos anywhere in the order; read the loaded part again
+        self.load_todos(max(TODOS_PAGE_SIZE, len(self.todos)))
+        self.refresh_todo_list()
+        self.update_stats()
     
     def add_todo(self):
         task_text = self.task_entry.get().strip()
         if not task_text:
             return
         
-        timestamp = datetime.datetime.now().isoformat()
-        
-        new_todo = {
-            'id': str(len(self.todos) + 1),
-            'text': task_text,
-            'completed': False,
-            'created': timestamp,
-            'priority': self.priority_var.get()
-        }
-        
-        self.todos.append(new_todo)
-        self.save_todos()
+        try:
+            self.store.add(task_text, self.priority_var.get())
+        except Exception as e:
+            print(f"Грешка при запазване на задачи: {e}")
+            return
         
         # Clear input field
         self.task_entry.delete(0, "end")
         
         # Refresh UI
-        self.refresh_todo_list()
-        self.update_stats()
+        self.reload_todos()
     
     def toggle_todo(self, todo_id):
-        for todo in self.todos:
-            if todo['id'] == todo_id:
-                todo['completed'] = not todo['completed']
-                break
+        try:
+            self.store.toggle(todo_id)
+        except Exception as e:
+            print(f"Грешка при запазване на задачи: {e}")
+            return
         
-        self.save_todos()
-        self.refresh_todo_list()
-        self.update_stats()
+        self.reload_todos()
     
     def delete_todo(self, todo_id):
-        self.todos = [todo for todo in self.todos if todo['id'] != todo_id]
-        self.save_todos()
-        self.refresh_todo_list()
-        self.update_stats()
+        try:
+            self.store.delete(todo_id)
+        except Exception as e:
+            print(f"Грешка при изтриване на задача: {e}")
+            return
+        
+        self.reload_todos()
     
     def clear_completed(self):
-        self.todos = [todo for todo in self.todos if not todo['completed']]
-        self.save_todos()
-        self.refresh_todo_list()
-        self.update_stats()
+        # Remove all completed todos, loaded or not, in one statement
+        try:
+            self.store.delete_completed()
+        except Exception as e:
+            print(f"Грешка при изтриване на задачи: {e}")
+            return
+        
+        self.reload_todos()
     
     def show_tab(self, tab):
         self.current_tab = tab
         self.highlight_active_tab()
+        self.load_todos()
         self.refresh_todo_list()
     
     def highlight_active_tab(self):
@@ -167,27 +182,18 @@ class TodoWidget(ctk.CTkFrame):
         self.completed_tab.configure(fg_color=active_color if self.current_tab == "completed" else default_color)
     
     def refresh_todo_list(self):
-        # Clear existing todos
+        # Clear existing todos; the page button is kept and packed again last
+        self.more_button.pack_forget()
         for widget in self.tasks_frame.winfo_children():
-            widget.destroy()
-        
-        # Filter todos based on current tab
-        filtered_todos = self.todos
-        if self.current_tab == "active":
-            filtered_todos = [todo for todo in self.todos if not todo['completed']]
-        elif self.current_tab == "completed":
-            filtered_todos = [todo for todo in self.todos if todo['completed']]
-        
-        # Sort todos by priority and creation date
-        priority_order = {"High": 0, "Medium": 1, "Low": 2}
-        sorted_todos = sorted(
-            filtered_todos, 
-            key=lambda x: (x['completed'], priority_order.get(x['priority'], 99), x.get('created', ''))
-        )
+            if widget is not self.more_button:
+                widget.destroy()
         
-        # Add todos to list
-        for todo in sorted_todos:
+        # The todos come filtered by tab and sorted by the database
+        for todo in self.todos:
             self.create_todo_item(todo)
+        
+        if self.next_cursor is not None:
+            self.more_button.pack(fill="x", padx=5, pady=5)
     
     def create_todo_item(self, todo):
         # Create frame for todo item
@@ -237,8 +243,12 @@ class TodoWidget(ctk.CTkFrame):
         delete_button.pack(side="right", padx=5)
     
     def update_stats(self):
-        active_count = sum(1 for todo in self.todos if not todo['completed'])
-        completed_count = sum(1 for todo in self.todos if todo['completed'])
+        # Counted in the database, since not every todo is loaded
+        try:
+            active_count, completed_count = self.store.counts()
+        except Exception as e:
+            print(f"Грешка при зареждане на задачи: {e}")
+            return
         
         self.stats_label.configure(
             text=f"{active_count} активни, {completed_count} завършени"
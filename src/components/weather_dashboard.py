@@ -0,0 +1,262 @@
+import os
+import tkinter as tk
+import customtkinter as ctk
+
+from src.services.weather_service import WeatherScheduler, has_api_key
+from src.utils.logger import log_error, setup_logger
+
+logger = setup_logger()
+
+# Location cards per row
+DASHBOARD_COLUMNS = 4
+
+# Size of the condition icons in pixels
+ICON_SIZE = 40
+
+
+class WeatherDashboard(ctk.CTkFrame):
+    def __init__(self, parent, service, store, icons):
+        """
+        Args:
+            parent: Parent widget
+            service: WeatherService shared with the weather widget
+            store: WeatherLocationStore with the saved locations
+            icons: IconCache shared with the weather widget
+        """
+        super().__init__(parent)
+        self.configure(corner_radius=10)
+        
+        self.service = service
+        self.store = store
+        self.icons = icons
+        self.cards = {}  # location ID -> labels and scheduler of its card
+        self.api_key = ""
+        
+        # Header with the field for a new location
+        self.header_frame = ctk.CTkFrame(self)
+        self.header_frame.pack(pady=10, padx=10, fill="x")
+        
+        self.title_label = ctk.CTkLabel(self.header_frame, text="Други места:",
+                                      font=ctk.CTkFont(size=14))
+        self.title_label.pack(side="left", padx=5)
+        
+        self.location_entry = ctk.CTkEntry(self.header_frame, width=200,
+                                         placeholder_text="Град,Държава")
+        self.location_entry.pack(side="left", padx=5)
+        self.location_entry.bind("<Return>", lambda event: self.add_location())
+        
+        self.add_button = ctk.CTkButton(self.header_frame, text="Добави", width=80,
+                                      command=self.add_location)
+        self.add_button.pack(side="left", padx=5)
+        
+        self.refresh_button = ctk.CTkButton(self.header_frame, text="Обнови", width=80,
+                                          command=self.refresh)
+        self.refresh_button.pack(side="right", padx=5)
+        
+        self.status_label = ctk.CTkLabel(self.header_frame, text="", text_color="red",
+                                       font=ctk.CTkFont(size=12))
+        self.status_label.pack(side="left", padx=5)
+        
+        # Location cards
+        self.cards_frame = ctk.CTkFrame(self, fg_color="transparent")
+        self.cards_frame.pack(pady=5, padx=10, fill="x")
+        for column in range(DASHBOARD_COLUMNS):
+            self.cards_frame.grid_columnconfigure(column, weight=1)
+        
+        self.empty_label = ctk.CTkLabel(self.cards_frame, text="Добавете местоположение, за да го следите тук.",
+                                      font=ctk.CTkFont(size=12))
+        
+        # Every card refreshes on its own scheduler, paused while the window is minimized
+        self.winfo_toplevel().bind("<Unmap>", self.on_window_state, add="+")
+        self.winfo_toplevel().bind("<Map>", self.on_window_state, add="+")
+        
+        self.load_locations()
+        self.refresh()
+    
+    def load_locations(self):
+        for card in self.cards.values():
+            card['scheduler'].stop()
+            card['frame'].destroy()
+        self.cards = {}
+        
+        try:
+            locations = self.store.load()
+        except Exception as e:
+            self.show_store_error("Грешка при зареждане на местоположенията", e)
+            locations = []
+        
+        for location in locations:
+            self.create_card(location)
+        self.layout_cards()
+    
+    def create_card(self, location):
+        frame = ctk.CTkFrame(self.cards_frame)
+        
+        name_label = ctk.CTkLabel(frame, text=location['name'],
+                                font=ctk.CTkFont(size=14, weight="bold"))
+        name_label.pack(pady=(5, 0), padx=10)
+        
+        temp_label = ctk.CTkLabel(frame, text="--°C", font=ctk.CTkFont(size=22, weight="bold"),
+                                compound="left")
+        temp_label.pack(padx=10)
+        
+        condition_label = ctk.CTkLabel(frame, text="--", font=ctk.CTkFont(size=12), wraplength=160)
+        condition_label.pack(padx=10)
+        
+        status_label = ctk.CTkLabel(frame, text="", font=ctk.CTkFont(size=10), text_color="gray")
+        status_label.pack(pady=(0, 5), padx=10)
+        
+        remove_button = ctk.CTkButton(frame, text="✕", width=24, height=24,
+                                    fg_color="transparent", hover_color=("gray75", "gray30"),
+                                    command=lambda: self.remove_location(location['id']))
+        remove_button.place(relx=1.0, x=-4, y=4, anchor="ne")
+        
+        def on_update(name, current, forecast, error, location_id=location['id']):
+            # Called on the scheduler thread
+            self.after(0, lambda: self.apply_update(location_id, current, error))
+        
+        scheduler = WeatherScheduler(self.service, on_update, forecast=False)
+        if self.winfo_toplevel().state() == "iconic":
+            scheduler.pause()
+        scheduler.start()
+        
+        self.cards[location['id']] = {
+            'frame': frame,
+            'name': location['name'],
+            'temp': temp_label,
+            'condition': condition_label,
+            'status': status_label,
+            'icon': None,
+            'scheduler': scheduler,
+        }
+    
+    def layout_cards(self):
+        if not self.cards:
+            self.empty_label.grid(row=0, column=0, columnspan=DASHBOARD_COLUMNS, pady=10)
+            return
+        
+        self.empty_label.grid_forget()
+        for index, card in enumerate(self.cards.values()):
+            card['frame'].grid(row=index // DASHBOARD_COLUMNS, column=index % DASHBOARD_COLUMNS,
+                               padx=5, pady=5, sticky="nsew")
+    
+    def refresh(self, location_ids=None):
+        """
+        Show the cached weather of the saved locations and refresh it in the
+        background.
+        
+        Each card's scheduler refreshes right away whatever is older than the
+        cache TTL, then on its interval, backing off after a failure.
+        
+        Args:
+            location_ids: Only these cards (default: all)
+        """
+        self.api_key = os.getenv("OPENWEATHER_API_KEY", "")
+        
+        for location_id in location_ids or list(self.cards):
+            card = self.cards[location_id]
+            if not has_api_key(self.api_key):
+                card['condition'].configure(text="API ключ не е намерен")
+            else:
+                cached = self.service.cached(card['name'])
+                if cached is not None:
+                    self.show_weather(location_id, cached[0])
+                else:
+                    card['condition'].configure(text="Зареждане...")
+            card['scheduler'].set_target(card['name'], self.api_key)
+    
+    def apply_update(self, location_id, current, error):
+        if error is None:
+            self.show_weather(location_id, current)
+        elif not has_api_key(self.api_key):
+            card = self.cards.get(location_id)
+            if card is not None:
+                card['condition'].configure(text="API ключ не е намерен")
+        else:
+            self.show_error(location_id, error)
+    
+    def on_window_state(self, event):
+        # The bindings of the window also get the events of its children
+        if event.widget is not self.winfo_toplevel():
+            return
+        for card in self.cards.values():
+            if event.type == tk.EventType.Unmap:
+                card['scheduler'].pause()
+            else:
+                card['scheduler'].resume()
+    
+    def show_weather(self, location_id, data):
+        card = self.cards.get(location_id)
+        if card is None:
+            return  # Removed while it was loading
+        
+        try:
+            card['temp'].configure(text=f"{round(data['main']['temp'])}°C")
+            card['condition'].configure(text=data['weather'][0]['description'].capitalize())
+            card['status'].configure(text="")
+            self.show_icon(location_id, data['weather'][0]['icon'])
+        except (KeyError, IndexError, TypeError) as e:
+            self.show_error(location_id, f"Неочаквани данни за времето: {e}")
+    
+    def show_icon(self, location_id, code):
+        self.cards[location_id]['icon'] = code
+        
+        def on_ready(image):
+            card = self.cards.get(location_id)
+            # Skip an icon for a card that was removed or has moved on to another one
+            if card is not None and card['icon'] == code:
+                card['temp'].configure(image=image)
+        
+        self.icons.load(code, ICON_SIZE, self, on_ready)
+    
+    def show_error(self, location_id, message):
+        card = self.cards.get(location_id)
+        if card is None:
+            return
+        
+        logger.warning(f"Error refreshing the weather of {card['name']}: {message}")
+        
+        # A failed refresh keeps the data already shown
+        if self.service.cached(card['name']) is None:
+            card['temp'].configure(text="--°C")
+            card['condition'].configure(text=f"Грешка: {message}")
+        else:
+            card['status'].configure(text="Неуспешно обновяване (остаряло)")
+    
+    def show_store_error(self, message, error):
+        log_error(logger, error, message)
+        self.status_label.configure(text=f"{message}: {error}")
+    
+    def add_location(self):
+        name = " ".join(self.location_entry.get().split())
+        if not name:
+            return
+        
+        try:
+            location_id = self.store.add(name)
+        except Exception as e:
+            self.show_store_error("Грешка при запазване на местоположението", e)
+            return
+        
+        self.status_label.configure(text="")
+        self.location_entry.delete(0, "end")
+        if location_id is None:
+            return  # Already on the dashboard
+        
+        self.create_card({'id': location_id, 'name': name})
+        self.layout_cards()
+        self.refresh([location_id])
+    
+    def remove_location(self, location_id):
+        try:
+            self.store.delete(location_id)
+        except Exception as e:
+            self.show_store_error("Грешка при изтриване на местоположението", e)
+            return
+        
+        self.status_label.configure(text="")
+        card = self.cards.pop(location_id, None)
+        if card is not None:
+            card['scheduler'].stop()
+            card['frame'].destroy()
+        self.layout_cards()
@@ -1,18 +1,33 @@
 import os
-import requests
-import json
+import tkinter as tk
 import customtkinter as ctk
-from PIL import Image, ImageTk
 import datetime
 
+import config
+from src.services.weather_service import (
+    FORECAST_DAYS, WeatherScheduler, WeatherService, daily_forecast, has_api_key, location_key
+)
+from src.services.weather_icons import IconCache
+
+# Icon sizes in pixels
+ICON_SIZE = 64
+FORECAST_ICON_SIZE = 40
+
+# Short Bulgarian weekday names for the forecast
+WEEKDAYS = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Нд"]
+
 
 class WeatherWidget(ctk.CTkFrame):
-    def __init__(self, parent):
+    def __init__(self, parent, service=None, icons=None):
         super().__init__(parent)
         self.configure(corner_radius=10)
         
         self.api_key = os.getenv("OPENWEATHER_API_KEY", "")
-        self.location = "София,BG"  # Default location
+        self.location = config.DEFAULT_LOCATION
+        self.service = service or WeatherService()
+        self.icons = icons or IconCache(self.service)
+        self.icon_codes = {}  # label -> icon code it should show
+        self.measured_at = "--:--"
         
         # Weather display
         self.location_frame = ctk.CTkFrame(self)
@@ -34,7 +49,10 @@ class WeatherWidget(ctk.CTkFrame):
         self.weather_frame = ctk.CTkFrame(self)
         self.weather_frame.pack(pady=10, padx=10, fill="x")
         
-        # Temperature and condition
+        # Condition icon, temperature and condition
+        self.icon_label = ctk.CTkLabel(self.weather_frame, text="")
+        self.icon_label.pack(side="left", padx=(20, 0))
+        
         self.temp_label = ctk.CTkLabel(self.weather_frame, text="--°C", 
                                      font=ctk.CTkFont(size=36, weight="bold"))
         self.temp_label.pack(side="left", padx=20)
@@ -57,54 +75,150 @@ class WeatherWidget(ctk.CTkFrame):
                                      font=ctk.CTkFont(size=12))
         self.wind_label.pack(side="left", padx=10)
         
-        # Fetch weather if API key is available
-        if self.api_key and self.api_key != "your_openweather_api_key_here":
-            self.refresh_weather()
-        else:
-            self.show_api_missing()
+        # Time of the shown data
+        self.updated_label = ctk.CTkLabel(self.details_frame, text="",
+                                        font=ctk.CTkFont(size=12))
+        self.updated_label.pack(side="right", padx=10)
+        
+        # 5-day forecast, one column per day
+        self.forecast_frame = ctk.CTkFrame(self)
+        self.forecast_frame.pack(pady=5, padx=10, fill="x")
+        
+        self.forecast_labels = []
+        for column in range(FORECAST_DAYS):
+            self.forecast_frame.grid_columnconfigure(column, weight=1)
+            label = ctk.CTkLabel(self.forecast_frame, text="--", font=ctk.CTkFont(size=12),
+                               compound="top")
+            label.grid(row=0, column=column, padx=5, pady=5)
+            self.forecast_labels.append(label)
+        
+        # Refresh on an interval in the background, paused while the window is minimized
+        self.scheduler = WeatherScheduler(self.service, self.on_scheduled_update)
+        self.winfo_toplevel().bind("<Unmap>", self.on_window_state, add="+")
+        self.winfo_toplevel().bind("<Map>", self.on_window_state, add="+")
+        self.scheduler.start()
+        
+        # Show the cached weather at once; the request runs in the background
+        self.refresh_weather()
     
     def refresh_weather(self):
+        """Show the cached weather of the entered location and refresh it in the background"""
         self.location = self.location_entry.get()
+        self.api_key = os.getenv("OPENWEATHER_API_KEY", "")
         
-        if not self.api_key or self.api_key == "your_openweather_api_key_here":
+        if not has_api_key(self.api_key):
             self.show_api_missing()
+        else:
+            current = self.service.cached(self.location)
+            forecast = self.service.cached_forecast(self.location)
+            if current is not None:
+                self.show_weather(current[0], stale=current[1] > self.service.ttl)
+            else:
+                self.show_error("Зареждане...")
+            if forecast is not None:
+                self.show_forecast(forecast[0])
+        
+        # Fetches only what is missing or older than the cache TTL
+        self.scheduler.set_target(self.location, self.api_key)
+    
+    def on_scheduled_update(self, location, current, forecast, error):
+        # Called on the scheduler thread
+        self.after(0, lambda: self.apply_update(location, current, forecast, error))
+    
+    def apply_update(self, location, current, forecast, error):
+        # A reply for a location the user has already replaced is dropped
+        if location_key(location) != location_key(self.location):
             return
         
+        if error is None:
+            self.show_weather(current)
+            self.show_forecast(forecast)
+        elif not has_api_key(self.api_key):
+            self.show_api_missing()
+        elif self.service.cached(self.location) is not None:
+            # Keep showing the cached data when only the refresh failed
+            self.updated_label.configure(text=f"Обновено: {self.measured_at} (остаряло)")
+            print(f"Грешка при обновяване на времето: {error}")
+        else:
+            self.show_error(f"Грешка: {error}")
+    
+    def on_window_state(self, event):
+        # The bindings of the window also get the events of its children
+        if event.widget is not self.winfo_toplevel():
+            return
+        if event.type == tk.EventType.Unmap:
+            self.scheduler.pause()
+        else:
+            self.scheduler.resume()
+    
+    def show_weather(self, data, stale=False):
         try:
-            url = f"http://api.openweathermap.org/data/2.5/weather?q={self.location}&appid={self.api_key}&units=metric&lang=bg"
-            response = requests.get(url, timeout=10)
-            data = response.json()
+            # Update temperature
+            temp = round(data['main']['temp'])
+            self.temp_label.configure(text=f"{temp}°C")
             
-            if response.status_code == 200:
-                # Update temperature
-                temp = round(data['main']['temp'])
-                self.temp_label.configure(text=f"{temp}°C")
-                
-                # Update condition
-                condition = data['weather'][0]['description'].capitalize()
-                self.condition_label.configure(text=condition)
-                
-                # Update humidity
-                humidity = data['main']['humidity']
-                self.humidity_label.configure(text=f"Влажност: {humidity}%")
-                
-                # Update wind
-                wind = data['wind']['speed']
-                self.wind_label.configure(text=f"Вятър: {wind} м/с")
-            else:
-                self.show_error(f"Грешка: {data.get('message', 'Unknown error')}")
-        
-        except Exception as e:
+            # Update condition
+            condition = data['weather'][0]['description'].capitalize()
+            self.condition_label.configure(text=condition)
+            self.show_icon(self.icon_label, data['weather'][0]['icon'], ICON_SIZE)
+            
+            # Update humidity
+            humidity = data['main']['humidity']
+            self.humidity_label.configure(text=f"Влажност: {humidity}%")
+            
+            # Update wind
+            wind = data['wind']['speed']
+            self.wind_label.configure(text=f"Вятър: {wind} м/с")
+            
+            # Time of the measurement, marked while a newer one is being fetched
+            self.measured_at = datetime.datetime.fromtimestamp(data.get('dt', 0)).strftime("%H:%M")
+            self.updated_label.configure(text=f"Обновено: {self.measured_at}" + (" (обновява се...)" if stale else ""))
+        except (KeyError, IndexError, TypeError) as e:
             self.show_error(f"Грешка при извличане на данни за времето: {str(e)}")
     
+    def show_forecast(self, forecast):
+        try:
+            days = daily_forecast(forecast)
+        except (KeyError, IndexError, TypeError) as e:
+            print(f"Грешка при обработка на прогнозата: {e}")
+            return
+        
+        for label, day in zip(self.forecast_labels, days + [None] * FORECAST_DAYS):
+            if day is None:
+                label.configure(text="--")
+                self.show_icon(label, None, FORECAST_ICON_SIZE)
+                continue
+            weekday = WEEKDAYS[day['date'].weekday()]
+            label.configure(text=f"{weekday}\n{round(day['temp_max'])}° / {round(day['temp_min'])}°\n"
+                                 f"{day['description'].capitalize()}")
+            self.show_icon(label, day['icon'], FORECAST_ICON_SIZE)
+    
+    def show_icon(self, label, code, size):
+        """Show a condition icon on a label (None clears it); icons are only loaded once"""
+        self.icon_codes[label] = code
+        if code is None:
+            label.configure(image=None)
+            return
+        
+        def on_ready(image):
+            # Skip an icon that arrives after the label moved on to another one
+            if self.icon_codes.get(label) == code:
+                label.configure(image=image)
+        
+        self.icons.load(code, size, self, on_ready)
+    
     def show_api_missing(self):
+        self.show_icon(self.icon_label, None, ICON_SIZE)
         self.temp_label.configure(text="--°C")
         self.condition_label.configure(text="API ключ не е намерен")
         self.humidity_label.configure(text="Влажност: --%")
         self.wind_label.configure(text="Вятър: -- м/с")
+        self.updated_label.configure(text="")
     
     def show_error(self, message):
+        self.show_icon(self.icon_label, None, ICON_SIZE)
         self.temp_label.configure(text="--°C")
         self.condition_label.configure(text=message)
         self.humidity_label.configure(text="Влажност: --%")
-        self.wind_label.configure(text="Вятър: -- м/с") 
\ No newline at end of file
+        self.wind_label.configure(text="Вятър: -- м/с")
+        self.updated_label.configure(text="")
@@ -5,9 +5,410 @@ Handles SQLite database operations for storing notes, todos, etc.
 
 import sqlite3
 import os
-import json
-from datetime import datetime
-from typing import List, Dict, Optional
+import re
+import threading
+import weakref
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.database.json_stream import iter_json_array
+from src.utils.logger import log_error, setup_logger
+
+logger = setup_logger()
+
+# Number of prepared statements kept per connection by the sqlite3 module
+STATEMENT_CACHE_SIZE = 256
+
+# Seconds a writer waits for a lock held by another thread before failing
+BUSY_TIMEOUT = 5.0
+
+# strftime formats for grouping pomodoro sessions by local day, week and month
+FOCUS_PERIOD_FORMATS = {
+    "day": "%Y-%m-%d",
+    "week": "%Y-W%W",
+    "month": "%Y-%m",
+}
+
+# A word as the notes_fts tokenizer (unicode61) splits them: letters and
+# digits, with underscores and every other character separating words
+FTS_WORD = re.compile(r"[^\W_]+")
+
+# Rows fetched per query by the keyset-paginated readers
+PAGE_SIZE = 200
+
+# Rows per executemany call when importing the legacy JSON files
+MIGRATION_CHUNK_SIZE = 1000
+
+# Table and columns read for each record type of the semantic index
+EMBEDDING_SOURCES = {
+    "note": ("notes", "title, content"),
+    "todo": ("todos", "task, completed, priority, due_date"),
+    "event": ("events", "title, description, event_date, event_time"),
+}
+
+
+# Schema migrations applied in order; PRAGMA user_version stores how many ran.
+# Version 1 is the original schema, so databases created before versioning
+# (user_version 0) upgrade in place thanks to IF NOT EXISTS.
+SCHEMA_MIGRATIONS = [
+    # 1: base tables
+    [
+        # Notes table
+        """
+            CREATE TABLE IF NOT EXISTS notes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                content TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """,
+        
+        # Todos table
+        """
+            CREATE TABLE IF NOT EXISTS todos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                task TEXT NOT NULL,
+                completed BOOLEAN DEFAULT FALSE,
+                priority TEXT DEFAULT 'medium',
+                due_date DATE,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """,
+        
+        # Calendar events table
+        """
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                description TEXT,
+                event_date DATE NOT NULL,
+                event_time TIME,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """,
+        
+        # Pomodoro sessions table
+        """
+            CREATE TABLE IF NOT EXISTS pomodoro_sessions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                duration INTEGER NOT NULL,
+                completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """,
+        """
+            CREATE INDEX IF NOT EXISTS idx_pomodoro_sessions_completed_at
+            ON pomodoro_sessions (completed_at, duration)
+        """,
+        
+        # Per local day and per local hour rollups, kept in sync by triggers,
+        # so statistics never have to scan every session
+        """
+            CREATE TABLE IF NOT EXISTS pomodoro_daily (
+                day DATE PRIMARY KEY,
+                sessions INTEGER NOT NULL,
+                focus_time INTEGER NOT NULL
+            ) WITHOUT ROWID
+        """,
+        """
+            CREATE TABLE IF NOT EXISTS pomodoro_hourly (
+                hour INTEGER PRIMARY KEY,
+                sessions INTEGER NOT NULL
+            )
+        """,
+        """
+            CREATE TRIGGER IF NOT EXISTS pomodoro_sessions_rollup_insert
+            AFTER INSERT ON pomodoro_sessions
+            BEGIN
+                INSERT INTO pomodoro_daily (day, sessions, focus_time)
+                VALUES (date(NEW.completed_at, 'localtime'), 1, NEW.duration)
+                ON CONFLICT (day) DO UPDATE SET
+                    sessions = sessions + 1,
+                    focus_time = focus_time + excluded.focus_time;
+                INSERT INTO pomodoro_hourly (hour, sessions)
+                VALUES (CAST(strftime('%H', NEW.completed_at, 'localtime') AS INTEGER), 1)
+                ON CONFLICT (hour) DO UPDATE SET sessions = sessions + 1;
+            END
+        """,
+        """
+            CREATE TRIGGER IF NOT EXISTS pomodoro_sessions_rollup_delete
+            AFTER DELETE ON pomodoro_sessions
+            BEGIN
+                UPDATE pomodoro_daily
+                SET sessions = sessions - 1, focus_time = focus_time - OLD.duration
+                WHERE day = date(OLD.completed_at, 'localtime');
+                UPDATE pomodoro_hourly
+                SET sessions = sessions - 1
+                WHERE hour = CAST(strftime('%H', OLD.completed_at, 'localtime') AS INTEGER);
+            END
+        """,
+        
+        # Backfill the rollups for sessions recorded before they existed
+        """
+            INSERT INTO pomodoro_daily (day, sessions, focus_time)
+            SELECT date(completed_at, 'localtime'), COUNT(*), SUM(duration)
+            FROM pomodoro_sessions
+            WHERE NOT EXISTS (SELECT 1 FROM pomodoro_daily)
+            GROUP BY 1
+        """,
+        """
+            INSERT INTO pomodoro_hourly (hour, sessions)
+            SELECT CAST(strftime('%H', completed_at, 'localtime') AS INTEGER), COUNT(*)
+            FROM pomodoro_sessions
+            WHERE NOT EXISTS (SELECT 1 FROM pomodoro_hourly)
+            GROUP BY 1
+        """,
+        
+        # Chat messages table
+        """
+            CREATE TABLE IF NOT EXISTS chat_messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """,
+        
+        # Imported JSON files, so the migration runs once per file; the size
+        # and modification time tell whether a file changed after its import
+        """
+            CREATE TABLE IF NOT EXISTS json_migrations (
+                source TEXT PRIMARY KEY,
+                file_size INTEGER NOT NULL,
+                file_mtime_ns INTEGER NOT NULL,
+                row_count INTEGER NOT NULL,
+                migrated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """,
+    ],
+    
+    # 2: indexes for the list queries used by the widgets
+    [
+        """
+            CREATE INDEX IF NOT EXISTS idx_notes_updated_at
+            ON notes (updated_at)
+        """,
+        # The todo list shows active todos first, then by priority (high to
+        # low) and age; a generated column makes the priority sortable
+        """
+            ALTER TABLE todos ADD COLUMN priority_rank INTEGER GENERATED ALWAYS AS (
+                CASE priority WHEN 'high' THEN 0 WHEN 'medium' THEN 1 WHEN 'low' THEN 2 ELSE 3 END
+            ) VIRTUAL
+        """,
+        """
+            CREATE INDEX IF NOT EXISTS idx_todos_list_order
+            ON todos (completed, priority_rank, created_at, id)
+        """,
+        """
+            CREATE INDEX IF NOT EXISTS idx_events_date_time
+            ON events (event_date, event_time)
+        """,
+    ],
+    
+    # 3: full-text index over notes, kept in sync with the notes table by triggers
+    [
+        """
+            CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+                title, content,
+                content='notes', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        """,
+        """
+            CREATE TRIGGER IF NOT EXISTS notes_fts_insert AFTER INSERT ON notes
+            BEGIN
+                INSERT INTO notes_fts (rowid, title, content)
+                VALUES (NEW.id, NEW.title, NEW.content);
+            END
+        """,
+        """
+            CREATE TRIGGER IF NOT EXISTS notes_fts_delete AFTER DELETE ON notes
+            BEGIN
+                INSERT INTO notes_fts (notes_fts, rowid, title, content)
+                VALUES ('delete', OLD.id, OLD.title, OLD.content);
+            END
+        """,
+        """
+            CREATE TRIGGER IF NOT EXISTS notes_fts_update AFTER UPDATE OF title, content ON notes
+            BEGIN
+                INSERT INTO notes_fts (notes_fts, rowid, title, content)
+                VALUES ('delete', OLD.id, OLD.title, OLD.content);
+                INSERT INTO notes_fts (rowid, title, content)
+                VALUES (NEW.id, NEW.title, NEW.content);
+            END
+        """,
+        # Rank by bm25 with title matches weighing more than content matches
+        "INSERT INTO notes_fts (notes_fts, rank) VALUES ('rank', 'bm25(5.0, 1.0)')",
+        # Index the notes that existed before this version
+        "INSERT INTO notes_fts (notes_fts) VALUES ('rebuild')",
+    ],
+    
+    # 4: rolling summary of older chat messages, dropped when a covered message changes
+    [
+        """
+            CREATE TABLE IF NOT EXISTS chat_summary (
+                covered_until INTEGER PRIMARY KEY,
+                summary TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """,
+        """
+            CREATE TRIGGER IF NOT EXISTS chat_summary_update
+            AFTER UPDATE OF role, content ON chat_messages
+            BEGIN
+                DELETE FROM chat_summary WHERE covered_until >= OLD.id;
+            END
+        """,
+        """
+            CREATE TRIGGER IF NOT EXISTS chat_summary_delete AFTER DELETE ON chat_messages
+            BEGIN
+                DELETE FROM chat_summary WHERE covered_until >= OLD.id;
+            END
+        """,
+    ],
+    
+    # 5: chunks of the semantic index (vectors live in a memory-mapped file, see
+    # src/services/retrieval.py) and a queue of records whose text changed
+    [
+        """
+            CREATE TABLE IF NOT EXISTS embedding_chunks (
+                row INTEGER PRIMARY KEY,
+                source TEXT NOT NULL,
+                record_id INTEGER NOT NULL,
+                content TEXT NOT NULL
+            )
+        """,
+        """
+            CREATE INDEX IF NOT EXISTS idx_embedding_chunks_record
+            ON embedding_chunks (source, record_id)
+        """,
+        # The model whose vectors the chunks point at; every model has its own
+        # vector file, but the chunks are shared
+        """
+            CREATE TABLE IF NOT EXISTS embedding_model (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                name TEXT NOT NULL
+            )
+        """,
+        # Re-queuing a record gives it a new id, so a sync that read the older
+        # text does not remove the newer entry
+        """
+            CREATE TABLE IF NOT EXISTS embedding_queue (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                source TEXT NOT NULL,
+                record_id INTEGER NOT NULL,
+                UNIQUE (source, record_id) ON CONFLICT REPLACE
+            )
+        """,
+        """
+            CREATE TRIGGER IF NOT EXISTS notes_embed_insert AFTER INSERT ON notes
+            BEGIN
+                INSERT INTO embedding_queue (source, record_id) VALUES ('note', NEW.id);
+            END
+        """,
+        """
+            CREATE TRIGGER IF NOT EXISTS notes_embed_update AFTER UPDATE OF title, content ON notes
+            WHEN OLD.title IS NOT NEW.title OR OLD.content IS NOT NEW.content
+            BEGIN
+                INSERT INTO embedding_queue (source, record_id) VALUES ('note', NEW.id);
+            END
+        """,
+        """
+            CREATE TRIGGER IF NOT EXISTS notes_embed_delete AFTER DELETE ON notes
+            BEGIN
+                INSERT INTO embedding_queue (source, record_id) VALUES ('note', OLD.id);
+            END
+        """,
+        """
+            CREATE TRIGGER IF NOT EXISTS todos_embed_insert AFTER INSERT ON todos
+            BEGIN
+                INSERT INTO embedding_queue (source, record_id) VALUES ('todo', NEW.id);
+            END
+        """,
+        """
+            CREATE TRIGGER IF NOT EXISTS todos_embed_update
+            AFTER UPDATE OF task, completed, priority, due_date ON todos
+            WHEN OLD.task IS NOT NEW.task OR OLD.completed IS NOT NEW.completed
+                OR OLD.priority IS NOT NEW.priority OR OLD.due_date IS NOT NEW.due_date
+            BEGIN
+                INSERT INTO embedding_queue (source, record_id) VALUES ('todo', NEW.id);
+            END
+        """,
+        """
+            CREATE TRIGGER IF NOT EXISTS todos_embed_delete AFTER DELETE ON todos
+            BEGIN
+                INSERT INTO embedding_queue (source, record_id) VALUES ('todo', OLD.id);
+            END
+        """,
+        """
+            CREATE TRIGGER IF NOT EXISTS events_embed_insert AFTER INSERT ON events
+            BEGIN
+                INSERT INTO embedding_queue (source, record_id) VALUES ('event', NEW.id);
+            END
+        """,
+        """
+            CREATE TRIGGER IF NOT EXISTS events_embed_update
+            AFTER UPDATE OF title, description, event_date, event_time ON events
+            WHEN OLD.title IS NOT NEW.title OR OLD.description IS NOT NEW.description
+                OR OLD.event_date IS NOT NEW.event_date OR OLD.event_time IS NOT NEW.event_time
+            BEGIN
+                INSERT INTO embedding_queue (source, record_id) VALUES ('event', NEW.id);
+            END
+        """,
+        """
+            CREATE TRIGGER IF NOT EXISTS events_embed_delete AFTER DELETE ON events
+            BEGIN
+                INSERT INTO embedding_queue (source, record_id) VALUES ('event', OLD.id);
+            END
+        """,
+        # Index the records that existed before this version
+        "INSERT INTO embedding_queue (source, record_id) SELECT 'note', id FROM notes",
+        "INSERT INTO embedding_queue (source, record_id) SELECT 'todo', id FROM todos",
+        "INSERT INTO embedding_queue (source, record_id) SELECT 'event', id FROM events",
+    ],
+    # 6: locations on the weather dashboard
+    [
+        """
+            CREATE TABLE IF NOT EXISTS weather_locations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                name_key TEXT NOT NULL UNIQUE,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """,
+    ],
+]
+
+# Current schema version (value of PRAGMA user_version after migrating)
+SCHEMA_VERSION = len(SCHEMA_MIGRATIONS)
+
+
+class JSONMigrationError(Exception):
+    """Raised by migrate_from_json after the files that could be imported were imported."""
+    
+    def __init__(self, errors: Dict[str, Exception], results: Dict[str, int]):
+        """
+        Args:
+            errors: Exception per file name that failed to import
+            results: Number of imported rows per file name that succeeded
+        """
+        super().__init__("; ".join(f"{source}: {error}" for source, error in errors.items()))
+        self.errors = errors
+        self.results = results
+
+
+class _ConnectionOwner:
+    """Kept in a thread's local data; its finalizer closes the thread's connection."""
+
+
+def _release_connection(conn: sqlite3.Connection, connections: List[sqlite3.Connection],
+                        lock: threading.Lock):
+    with lock:
+        if conn not in connections:
+            return  # Already closed by DatabaseManager.close()
+        connections.remove(conn)
+    conn.close()
 
 
 class DatabaseManager:
@@ -15,308 +416,941 @@ class DatabaseManager:
         """Initialize the database manager."""
         self.db_path = db_path
         
+        # One long-lived connection per thread (UI thread, chat and timer workers)
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        
         # Ensure data directory exists
-        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
         
         # Initialize database
         self._init_database()
     
-    def _init_database(self):
-        """Initialize the database with required tables."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # Notes table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS notes (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    title TEXT NOT NULL,
-                    content TEXT NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            # Todos table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS todos (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    task TEXT NOT NULL,
-                    completed BOOLEAN DEFAULT FALSE,
-                    priority TEXT DEFAULT 'medium',
-                    due_date DATE,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
+    def _get_connection(self) -> sqlite3.Connection:
+        """Return the calling thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.db_path,
+                timeout=BUSY_TIMEOUT,
+                cached_statements=STATEMENT_CACHE_SIZE,
+                check_same_thread=False
+            )
+            # WAL lets readers run alongside a writer; NORMAL sync is durable in WAL mode
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA temp_store=MEMORY")
             
-            # Calendar events table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS events (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    title TEXT NOT NULL,
-                    description TEXT,
-                    event_date DATE NOT NULL,
-                    event_time TIME,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
             
+            # The thread's local data is dropped when the thread ends; close
+            # the connection then, so short-lived workers do not leak one each
+            self._local.owner = _ConnectionOwner()
+            weakref.finalize(self._local.owner, _release_connection, conn,
+                             self._connections, self._connections_lock)
+        return conn
+    
+    def close(self):
+        """Close every pooled connection."""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+    
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Group several writes into a single transaction.
+        
+        Commits once on success and rolls back on error. Nested calls
+        join the outermost transaction, so the regular write methods can
+        be used inside it without committing on their own.
+        """
+        conn = self._get_connection()
+        depth = getattr(self._local, "depth", 0)
+        if depth:
+            self._local.depth = depth + 1
+            try:
+                yield conn
+            finally:
+                self._local.depth = depth
+            return
+        
+        conn.execute("BEGIN IMMEDIATE")
+        self._local.depth = 1
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
             conn.commit()
+        finally:
+            self._local.depth = 0
+    
+    def _init_database(self):
+        """Bring the database schema up to the latest version."""
+        for version, statements in enumerate(SCHEMA_MIGRATIONS, start=1):
+            with self.transaction() as conn:
+                # Re-read inside the write lock in case another process migrated first
+                current = conn.execute("PRAGMA user_version").fetchone()[0]
+                if current >= version:
+                    continue
+                
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {version}")
     
     def add_note(self, title: str, content: str) -> int:
         """Add a new note and return its ID."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.transaction() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 "INSERT INTO notes (title, content) VALUES (?, ?)",
                 (title, content)
             )
-            conn.commit()
             return cursor.lastrowid
     
     def get_notes(self) -> List[Dict]:
         """Get all notes."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM notes ORDER BY updated_at DESC")
-            rows = cursor.fetchall()
-            
-            return [
-                {
-                    "id": row[0],
-                    "title": row[1],
-                    "content": row[2],
-                    "created_at": row[3],
-                    "updated_at": row[4]
-                }
-                for row in rows
-            ]
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM notes ORDER BY updated_at DESC")
+        rows = cursor.fetchall()
+        
+        return [
+            {
+                "id": row[0],
+                "title": row[1],
+                "content": row[2],
+                "created_at": row[3],
+                "updated_at": row[4]
+            }
+            for row in rows
+        ]
+    
+    def get_note(self, note_id: int) -> Optional[sqlite3.Row]:
+        """Get a single note with its content."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        cursor.execute("SELECT * FROM notes WHERE id=?", (note_id,))
+        return cursor.fetchone()
+    
+    def iter_notes(self, limit: Optional[int] = None, after: Optional[tuple] = None,
+                   columns: str = "id, title, updated_at") -> Iterator[sqlite3.Row]:
+        """
+        Stream notes newest first using keyset pagination.
+        
+        Args:
+            limit: Maximum number of rows to yield (None for all)
+            after: Cursor (updated_at, id) of the last row already seen
+            columns: Columns to select; the note list does not need content
+        """
+        return self._iter_keyset("notes", columns, ("updated_at", "id"),
+                                 limit=limit, after=after)
+    
+    def search_notes(self, query: str, limit: int = 20) -> List[Dict]:
+        """
+        Full-text search over note titles and content.
+        
+        Every word of the query must match, each as a prefix, so results
+        narrow while the user is still typing. Results are ranked with bm25
+        (title matches weigh more).
+        
+        Args:
+            query: Free text typed by the user
+            limit: Maximum number of results
+        
+        Returns:
+            List of {"id", "title", "content", "updated_at", "rank"} dicts, best first
+        """
+        match = _fts_prefix_query(query)
+        if not match:
+            return []
+        
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        # Ordering by the built-in rank column lets FTS5 sort internally,
+        # so only the returned rows are joined with notes
+        cursor.execute(
+            """
+            SELECT notes.id, notes.title, notes.content, notes.updated_at, matches.rank
+            FROM (
+                SELECT rowid, rank
+                FROM notes_fts
+                WHERE notes_fts MATCH ?
+                ORDER BY rank
+                LIMIT ?
+            ) AS matches
+            JOIN notes ON notes.id = matches.rowid
+            ORDER BY matches.rank
+            """,
+            (match, limit)
+        )
+        rows = cursor.fetchall()
+        
+        return [
+            {
+                "id": row[0],
+                "title": row[1],
+                "content": row[2],
+                "updated_at": row[3],
+                "rank": row[4]
+            }
+            for row in rows
+        ]
     
     def update_note(self, note_id: int, title: str, content: str) -> bool:
         """Update an existing note."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.transaction() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 "UPDATE notes SET title=?, content=?, updated_at=CURRENT_TIMESTAMP WHERE id=?",
                 (title, content, note_id)
             )
-            conn.commit()
             return cursor.rowcount > 0
     
+    def add_notes_bulk(self, notes: Iterable[Dict]) -> int:
+        """Add many notes in one transaction and return how many were inserted."""
+        with self.transaction() as conn:
+            cursor = conn.executemany(
+                "INSERT INTO notes (title, content) VALUES (?, ?)",
+                ((note.get("title", ""), note.get("content", "")) for note in notes)
+            )
+            return cursor.rowcount
+    
     def delete_note(self, note_id: int) -> bool:
         """Delete a note."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.transaction() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM notes WHERE id=?", (note_id,))
-            conn.commit()
             return cursor.rowcount > 0
     
     def add_todo(self, task: str, priority: str = "medium", due_date: str = None) -> int:
         """Add a new todo and return its ID."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.transaction() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 "INSERT INTO todos (task, priority, due_date) VALUES (?, ?, ?)",
                 (task, priority, due_date)
             )
-            conn.commit()
             return cursor.lastrowid
     
+    def add_todos_bulk(self, todos: Iterable[Dict]) -> int:
+        """Add many todos in one transaction and return how many were inserted."""
+        with self.transaction() as conn:
+            cursor = conn.executemany(
+                "INSERT INTO todos (task, priority, due_date) VALUES (?, ?, ?)",
+                ((todo.get("task", ""), todo.get("priority", "medium"), todo.get("due_date"))
+                 for todo in todos)
+            )
+            return cursor.rowcount
+    
     def get_todos(self) -> List[Dict]:
-        """Get all todos."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM todos ORDER BY created_at DESC")
-            rows = cursor.fetchall()
-            
-            return [
-                {
-                    "id": row[0],
-                    "task": row[1],
-                    "completed": bool(row[2]),
-                    "priority": row[3],
-                    "due_date": row[4],
-                    "created_at": row[5]
-                }
-                for row in rows
-            ]
+        """Get all todos in list order: active first, then by priority and age."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM todos ORDER BY completed, priority_rank, created_at, id")
+        rows = cursor.fetchall()
+        
+        return [
+            {
+                "id": row[0],
+                "task": row[1],
+                "completed": bool(row[2]),
+                "priority": row[3],
+                "due_date": row[4],
+                "created_at": row[5]
+            }
+            for row in rows
+        ]
+    
+    def iter_todos(self, limit: Optional[int] = None, after: Optional[tuple] = None,
+                   completed: Optional[bool] = None) -> Iterator[sqlite3.Row]:
+        """
+        Stream todos in list order (active first, then by priority and age)
+        using keyset pagination over idx_todos_list_order.
+        
+        Args:
+            limit: Maximum number of rows to yield (None for all)
+            after: Cursor (completed, priority_rank, created_at, id) of the last row already seen
+            completed: Only active (False) or completed (True) todos
+        """
+        if completed is None:
+            return self._iter_keyset("todos", "*", ("completed", "priority_rank", "created_at", "id"),
+                                     limit=limit, after=after, descending=False)
+        # With completed fixed, the index is searched on the rest of the key
+        return self._iter_keyset("todos", "*", ("priority_rank", "created_at", "id"),
+                                 where="completed=?", params=(1 if completed else 0,),
+                                 limit=limit, after=after[1:] if after is not None else None,
+                                 descending=False)
+    
+    def count_todos(self) -> Tuple[int, int]:
+        """Return the number of (active, completed) todos."""
+        conn = self._get_connection()
+        counts = dict(conn.execute("SELECT completed, COUNT(*) FROM todos GROUP BY completed"))
+        return counts.get(0, 0), counts.get(1, 0)
     
     def toggle_todo(self, todo_id: int) -> bool:
         """Toggle todo completion status."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.transaction() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 "UPDATE todos SET completed = NOT completed WHERE id=?",
                 (todo_id,)
             )
-            conn.commit()
             return cursor.rowcount > 0
     
     def delete_todo(self, todo_id: int) -> bool:
         """Delete a todo."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.transaction() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM todos WHERE id=?", (todo_id,))
-            conn.commit()
             return cursor.rowcount > 0
     
+    def toggle_todos(self, todo_ids: Iterable[int]) -> int:
+        """Toggle the completion status of several todos in one transaction."""
+        with self.transaction() as conn:
+            cursor = conn.executemany(
+                "UPDATE todos SET completed = NOT completed WHERE id=?",
+                ((todo_id,) for todo_id in todo_ids)
+            )
+            return cursor.rowcount
+    
+    def delete_completed_todos(self) -> int:
+        """Delete every completed todo and return how many were removed."""
+        with self.transaction() as conn:
+            return conn.execute("DELETE FROM todos WHERE completed=1").rowcount
+    
+    def delete_todos(self, todo_ids: Iterable[int]) -> int:
+        """Delete several todos in one transaction and return how many were removed."""
+        with self.transaction() as conn:
+            cursor = conn.executemany(
+                "DELETE FROM todos WHERE id=?",
+                ((todo_id,) for todo_id in todo_ids)
+            )
+            return cursor.rowcount
+    
     def add_event(self, title: str, description: str, date: str, time: str) -> int:
         """Add a new event and return its ID."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.transaction() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 "INSERT INTO events (title, description, event_date, event_time) VALUES (?, ?, ?, ?)",
                 (title, description, date, time)
             )
-            conn.commit()
             return cursor.lastrowid
     
     def get_events(self) -> List[Dict]:
         """Get all events."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM events ORDER BY event_date DESC")
-            rows = cursor.fetchall()
-            
-            return [
-                {
-                    "id": row[0],
-                    "title": row[1],
-                    "description": row[2],
-                    "event_date": row[3],
-                    "event_time": row[4],
-                    "created_at": row[5]
-                }
-                for row in rows
-            ]
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM events ORDER BY event_date DESC")
+        rows = cursor.fetchall()
+        
+        return [
+            {
+                "id": row[0],
+                "title": row[1],
+                "description": row[2],
+                "event_date": row[3],
+                "event_time": row[4],
+                "created_at": row[5]
+            }
+            for row in rows
+        ]
+    
+    def get_events_between(self, start_date: str, end_date: str) -> List[Dict]:
+        """Get events from start_date to end_date inclusive (YYYY-MM-DD), ordered by date and time."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT * FROM events WHERE event_date BETWEEN ? AND ? ORDER BY event_date, event_time",
+            (start_date, end_date)
+        )
+        rows = cursor.fetchall()
+        
+        return [
+            {
+                "id": row[0],
+                "title": row[1],
+                "description": row[2],
+                "event_date": row[3],
+                "event_time": row[4],
+                "created_at": row[5]
+            }
+            for row in rows
+        ]
+    
+    def get_event_dates(self, start_date: str, end_date: str) -> List[str]:
+        """Get the distinct dates that have events between start_date and end_date inclusive."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT DISTINCT event_date FROM events WHERE event_date BETWEEN ? AND ? ORDER BY event_date",
+            (start_date, end_date)
+        )
+        return [row[0] for row in cursor.fetchall()]
     
     def update_event(self, event_id: int, title: str, description: str, date: str, time: str) -> bool:
         """Update an existing event."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.transaction() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 "UPDATE events SET title=?, description=?, event_date=?, event_time=? WHERE id=?",
                 (title, description, date, time, event_id)
             )
-            conn.commit()
             return cursor.rowcount > 0
     
     def delete_event(self, event_id: int) -> bool:
         """Delete an event."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.transaction() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM events WHERE id=?", (event_id,))
-            conn.commit()
             return cursor.rowcount > 0
     
     def add_pomodoro_session(self, duration: int) -> int:
         """Add a completed pomodoro session and return its ID."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.transaction() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 "INSERT INTO pomodoro_sessions (duration) VALUES (?)",
                 (duration,)
             )
-            conn.commit()
             return cursor.lastrowid
     
     def get_pomodoro_stats(self) -> Dict:
         """Get pomodoro statistics."""
-        with sqlite3.connect(self.db_path) as conn:
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT SUM(sessions) as count, SUM(focus_time) as total FROM pomodoro_daily")
+        result = cursor.fetchone()
+        
+        return {
+            "completed_pomodoros": result[0] or 0,
+            "total_focus_time": result[1] or 0
+        }
+    
+    def get_focus_totals(self, period: str = "day", since: Optional[str] = None) -> List[Dict]:
+        """
+        Get focus time grouped by local day, week or month.
+        
+        Args:
+            period: "day", "week" or "month"
+            since: Optional local date (YYYY-MM-DD) to start from
+        
+        Returns:
+            List of {"period", "sessions", "focus_time"} dicts, oldest first
+        """
+        bucket_format = FOCUS_PERIOD_FORMATS.get(period)
+        if bucket_format is None:
+            raise ValueError(f"Unknown period: {period}")
+        
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT strftime(?, day) AS bucket, SUM(sessions), SUM(focus_time)
+            FROM pomodoro_daily
+            WHERE day >= ? AND sessions > 0
+            GROUP BY bucket
+            ORDER BY bucket
+            """,
+            (bucket_format, since or "")
+        )
+        rows = cursor.fetchall()
+        
+        return [
+            {
+                "period": row[0],
+                "sessions": row[1],
+                "focus_time": row[2] or 0
+            }
+            for row in rows
+        ]
+    
+    def get_focus_streak(self) -> Dict:
+        """Get the current and the longest run of consecutive days with a pomodoro."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            WITH runs AS (
+                SELECT MAX(day) AS last_day, COUNT(*) AS length
+                FROM (
+                    SELECT day, julianday(day) - ROW_NUMBER() OVER (ORDER BY day) AS run_id
+                    FROM pomodoro_daily
+                    WHERE sessions > 0
+                )
+                GROUP BY run_id
+            )
+            SELECT
+                COALESCE(MAX(CASE WHEN last_day >= date('now', 'localtime', '-1 day')
+                                  THEN length END), 0),
+                COALESCE(MAX(length), 0)
+            FROM runs
+        """)
+        result = cursor.fetchone()
+        
+        return {
+            "current": result[0],
+            "longest": result[1]
+        }
+    
+    def get_focus_by_hour(self) -> List[int]:
+        """Get the number of completed pomodoros for each local hour of the day."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT hour, sessions FROM pomodoro_hourly")
+        
+        histogram = [0] * 24
+        for hour, count in cursor.fetchall():
+            histogram[hour] = count
+        return histogram
+    
+    def add_chat_message(self, role: str, content: str) -> int:
+        """Add a chat message and return its ID."""
+        with self.transaction() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) as count, SUM(duration) as total FROM pomodoro_sessions")
-            result = cursor.fetchone()
-            
-            return {
-                "completed_pomodoros": result[0],
-                "total_focus_time": result[1]
+            cursor.execute(
+                "INSERT INTO chat_messages (role, content) VALUES (?, ?)",
+                (role, content)
+            )
+            return cursor.lastrowid
+    
+    def get_chat_messages(self) -> List[Dict]:
+        """Get the chat history in chronological order."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, role, content, created_at FROM chat_messages ORDER BY id")
+        rows = cursor.fetchall()
+        
+        return [
+            {
+                "id": row[0],
+                "role": row[1],
+                "content": row[2],
+                "created_at": row[3]
             }
+            for row in rows
+        ]
     
-    def migrate_from_json(self, json_data_dir: str = "data"):
-        """Migrate data from JSON files to SQLite database."""
-        self._migrate_notes(os.path.join(json_data_dir, "notes.json"))
-        self._migrate_todos(os.path.join(json_data_dir, "todos.json"))
-        self._migrate_events(os.path.join(json_data_dir, "events.json"))
-        self._migrate_pomodoro_stats(os.path.join(json_data_dir, "pomodoro_stats.json"))
+    def iter_chat_messages(self, limit: Optional[int] = None,
+                           before_id: Optional[int] = None) -> Iterator[sqlite3.Row]:
+        """
+        Stream chat messages newest first using keyset pagination.
+        
+        Args:
+            limit: Maximum number of rows to yield (None for all)
+            before_id: Only messages older than this message ID
+        """
+        after = (before_id,) if before_id is not None else None
+        return self._iter_keyset("chat_messages", "id, role, content, created_at", ("id",),
+                                 limit=limit, after=after)
     
-    def _migrate_notes(self, json_file: str):
-        """Migrate notes from JSON."""
-        if not os.path.exists(json_file):
-            return
+    def clear_chat_messages(self) -> int:
+        """Delete the whole chat history and return how many messages were removed."""
+        with self.transaction() as conn:
+            cursor = conn.execute("DELETE FROM chat_messages")
+            return cursor.rowcount
+    
+    def get_chat_summary(self) -> Optional[Dict]:
+        """
+        Get the rolling summary of the older chat messages.
         
-        try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                notes = json.load(f)
-                
-                with sqlite3.connect(self.db_path) as conn:
-                    cursor = conn.cursor()
-                    for note in notes:
-                        cursor.execute(
-                            "INSERT INTO notes (title, content) VALUES (?, ?)",
-                            (note.get('title', ''), note.get('content', ''))
-                        )
-                    conn.commit()
-        except Exception as e:
-            print(f"Error migrating notes: {e}")
-    
-    def _migrate_todos(self, json_file: str):
-        """Migrate todos from JSON."""
-        if not os.path.exists(json_file):
-            return
+        Returns:
+            {"covered_until", "summary"} where covered_until is the ID of the
+            newest message folded into the summary, or None if there is none
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT covered_until, summary FROM chat_summary ORDER BY covered_until DESC LIMIT 1"
+        )
+        row = cursor.fetchone()
         
-        try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                todos = json.load(f)
-                
-                with sqlite3.connect(self.db_path) as conn:
-                    cursor = conn.cursor()
-                    for todo in todos:
-                        cursor.execute(
-                            "INSERT INTO todos (task, completed, priority, due_date) VALUES (?, ?, ?, ?)",
-                            (todo.get('task', ''), 1 if todo.get('completed', False) else 0, 
-                             todo.get('priority', 'medium'), todo.get('due_date'))
-                        )
-                    conn.commit()
-        except Exception as e:
-            print(f"Error migrating todos: {e}")
-    
-    def _migrate_events(self, json_file: str):
-        """Migrate events from JSON."""
-        if not os.path.exists(json_file):
-            return
+        if row is None:
+            return None
+        return {"covered_until": row[0], "summary": row[1]}
+    
+    def save_chat_summary(self, covered_until: int, summary: str) -> bool:
+        """
+        Replace the rolling chat summary.
         
-        try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                events = json.load(f)
-                
-                with sqlite3.connect(self.db_path) as conn:
-                    cursor = conn.cursor()
-                    for event in events:
-                        cursor.execute(
-                            "INSERT INTO events (title, description, event_date, event_time) VALUES (?, ?, ?, ?)",
-                            (event.get('title', ''), event.get('description', ''),
-                             event.get('date', ''), event.get('time', ''))
-                        )
-                    conn.commit()
-        except Exception as e:
-            print(f"Error migrating events: {e}")
-    
-    def _migrate_pomodoro_stats(self, json_file: str):
+        Nothing is saved if the newest covered message was deleted while the
+        summary was being written (e.g. the chat was cleared).
+        """
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM chat_summary")
+            cursor = conn.execute(
+                """
+                INSERT INTO chat_summary (covered_until, summary)
+                SELECT ?, ? WHERE EXISTS (SELECT 1 FROM chat_messages WHERE id = ?)
+                """,
+                (covered_until, summary, covered_until)
+            )
+            return cursor.rowcount > 0
+    
+    def get_weather_locations(self) -> List[Dict]:
+        """Get the locations of the weather dashboard in the order they were added."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, name FROM weather_locations ORDER BY id")
+        return [{"id": row[0], "name": row[1]} for row in cursor.fetchall()]
+    
+    def add_weather_location(self, name: str, name_key: str) -> Optional[int]:
+        """
+        Add a dashboard location and return its ID.
+        
+        Args:
+            name: Location as entered, e.g. "София,BG"
+            name_key: Normalized name; None is returned if it is already saved
+        """
+        with self.transaction() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO weather_locations (name, name_key) VALUES (?, ?)",
+                (name, name_key)
+            )
+            return cursor.lastrowid if cursor.rowcount > 0 else None
+    
+    def delete_weather_location(self, location_id: int) -> bool:
+        """Remove a dashboard location."""
+        with self.transaction() as conn:
+            cursor = conn.execute("DELETE FROM weather_locations WHERE id=?", (location_id,))
+            return cursor.rowcount > 0
+    
+    def get_embedding_queue(self, limit: int) -> List[Dict]:
+        """Get the records waiting to be (re-)embedded, oldest change first."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT id, source, record_id FROM embedding_queue ORDER BY id LIMIT ?", (limit,)
+        )
+        return [{"id": row[0], "source": row[1], "record_id": row[2]} for row in cursor.fetchall()]
+    
+    def count_embedding_queue(self) -> int:
+        """Return how many records are waiting to be (re-)embedded."""
+        conn = self._get_connection()
+        return conn.execute("SELECT COUNT(*) FROM embedding_queue").fetchone()[0]
+    
+    def get_embedding_record(self, source: str, record_id: int) -> Optional[Dict]:
+        """
+        Get the indexed columns of a note, todo or event.
+        
+        Args:
+            source: "note", "todo" or "event" (see EMBEDDING_SOURCES)
+            record_id: ID of the record
+        
+        Returns:
+            Column name to value, or None if the record was deleted
+        """
+        table, columns = EMBEDDING_SOURCES[source]
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT {columns} FROM {table} WHERE id=?", (record_id,))
+        row = cursor.fetchone()
+        
+        if row is None:
+            return None
+        return {description[0]: value for description, value in zip(cursor.description, row)}
+    
+    def get_embedding_rows(self) -> List[int]:
+        """Get the vector rows used by indexed chunks."""
+        conn = self._get_connection()
+        return [row[0] for row in conn.execute("SELECT row FROM embedding_chunks")]
+    
+    def get_embedding_chunks(self, rows: Iterable[int]) -> Dict[int, Dict]:
+        """Get the chunks stored at the given vector rows, keyed by row."""
+        rows = list(rows)
+        if not rows:
+            return {}
+        
+        conn = self._get_connection()
+        placeholders = ", ".join("?" for _ in rows)
+        cursor = conn.execute(
+            f"SELECT row, source, record_id, content FROM embedding_chunks WHERE row IN ({placeholders})",
+            rows
+        )
+        return {
+            row[0]: {"source": row[1], "record_id": row[2], "content": row[3]}
+            for row in cursor.fetchall()
+        }
+    
+    def save_embedding_chunks(self, updates: Iterable[tuple]) -> List[int]:
+        """
+        Replace the chunks of re-embedded records and take them off the queue.
+        
+        Args:
+            updates: (queue_id, source, record_id, chunks) tuples, where
+                     chunks is a list of (row, content) pairs (empty for a
+                     deleted record)
+        
+        Returns:
+            The vector rows of the replaced chunks, which are free again
+        """
+        freed = []
+        with self.transaction() as conn:
+            for queue_id, source, record_id, chunks in updates:
+                freed.extend(row[0] for row in conn.execute(
+                    "SELECT row FROM embedding_chunks WHERE source=? AND record_id=?",
+                    (source, record_id)
+                ))
+                conn.execute(
+                    "DELETE FROM embedding_chunks WHERE source=? AND record_id=?",
+                    (source, record_id)
+                )
+                conn.executemany(
+                    "INSERT INTO embedding_chunks (row, source, record_id, content) VALUES (?, ?, ?, ?)",
+                    ((row, source, record_id, content) for row, content in chunks)
+                )
+                conn.execute("DELETE FROM embedding_queue WHERE id=?", (queue_id,))
+        return freed
+    
+    def get_embedding_model(self) -> Optional[str]:
+        """Get the model the indexed chunks were embedded with."""
+        conn = self._get_connection()
+        row = conn.execute("SELECT name FROM embedding_model WHERE id = 1").fetchone()
+        return row[0] if row else None
+    
+    def reset_embeddings(self, model: str):
+        """
+        Drop every indexed chunk and queue all records for embedding.
+        
+        Args:
+            model: Model the records will be embedded with from now on
+        """
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM embedding_chunks")
+            conn.execute("INSERT OR REPLACE INTO embedding_model (id, name) VALUES (1, ?)", (model,))
+            for source, (table, _) in EMBEDDING_SOURCES.items():
+                conn.execute(
+                    f"INSERT INTO embedding_queue (source, record_id) SELECT ?, id FROM {table}",
+                    (source,)
+                )
+    
+    def _iter_keyset(self, table: str, columns: str, key_columns: tuple,
+                     where: str = "", params: tuple = (), limit: Optional[int] = None,
+                     after: Optional[tuple] = None, descending: bool = True) -> Iterator[sqlite3.Row]:
+        """
+        Yield rows in key order (descending unless told otherwise), PAGE_SIZE
+        rows per query.
+        
+        Each page continues strictly after the key of the previous page's
+        last row, so deep pages cost the same as the first one (no OFFSET).
+        Pages are fetched completely before they are yielded, so no read
+        transaction stays open while the caller consumes rows.
+        """
+        keys = ", ".join(key_columns)
+        placeholders = ", ".join("?" for _ in key_columns)
+        direction, comparison = ("DESC", "<") if descending else ("ASC", ">")
+        order_by = ", ".join(f"{column} {direction}" for column in key_columns)
+        
+        cursor = self._get_connection().cursor()
+        cursor.row_factory = sqlite3.Row
+        remaining = limit
+        while remaining is None or remaining > 0:
+            page_size = PAGE_SIZE if remaining is None else min(PAGE_SIZE, remaining)
+            
+            conditions = [where] if where else []
+            args = list(params)
+            if after is not None:
+                conditions.append(f"({keys}) {comparison} ({placeholders})")
+                args.extend(after)
+            where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+            
+            cursor.execute(
+                f"SELECT {columns} FROM {table} {where_clause} ORDER BY {order_by} LIMIT ?",
+                (*args, page_size)
+            )
+            rows = cursor.fetchall()
+            yield from rows
+            
+            if len(rows) < page_size:
+                return
+            after = tuple(rows[-1][column] for column in key_columns)
+            if remaining is not None:
+                remaining -= len(rows)
+    
+    def migrate_from_json(self, json_data_dir: str = "data",
+                          progress_callback: Optional[Callable[[str, int, float], None]] = None,
+                          force: bool = False) -> Dict[str, int]:
+        """
+        Migrate data from JSON files to SQLite database.
+        
+        Each file is streamed and imported in one transaction together with a
+        marker for its file name, so re-running the migration skips files that
+        were already imported, even if they changed since (a restored backup,
+        an older app version writing them): importing them again would
+        duplicate every row.
+        
+        Args:
+            json_data_dir: Directory with the legacy JSON files
+            progress_callback: Optional callable(source, rows_imported, fraction_done)
+            force: Import the files even if they were imported before; their
+                   rows are added to the existing ones
+        
+        Returns:
+            Number of imported rows per file name (skipped files are omitted)
+        
+        Raises:
+            JSONMigrationError if a file failed to import; its rows were rolled
+            back, so the next call tries it again
+        """
+        results, errors = {}, {}
+        migrations = [
+            ("notes.json", self._migrate_notes),
+            ("todos.json", self._migrate_todos),
+            ("events.json", self._migrate_events),
+            ("chat_history.json", self._migrate_chat_history),
+            ("pomodoro_stats.json", self._migrate_pomodoro_stats),
+        ]
+        for file_name, migrate in migrations:
+            try:
+                imported = migrate(os.path.join(json_data_dir, file_name), progress_callback, force)
+            except Exception as e:
+                log_error(logger, e, f"Error migrating {file_name}")
+                errors[file_name] = e
+                continue
+            if imported is not None:
+                results[file_name] = imported
+        
+        if errors:
+            raise JSONMigrationError(errors, results)
+        return results
+    
+    def _migrate_notes(self, json_file: str, progress_callback=None, force: bool = False) -> Optional[int]:
+        """Migrate notes from JSON."""
+        return self._migrate_json_file(
+            json_file,
+            "INSERT INTO notes (title, content, created_at, updated_at) "
+            "VALUES (?, ?, COALESCE(?, CURRENT_TIMESTAMP), COALESCE(?, CURRENT_TIMESTAMP))",
+            lambda note: (note.get('title', ''), note.get('content', ''),
+                          _to_utc_timestamp(note.get('created')),
+                          _to_utc_timestamp(note.get('modified') or note.get('created'))),
+            progress_callback=progress_callback, force=force
+        )
+    
+    def _migrate_todos(self, json_file: str, progress_callback=None, force: bool = False) -> Optional[int]:
+        """Migrate todos from JSON."""
+        return self._migrate_json_file(
+            json_file,
+            "INSERT INTO todos (task, completed, priority, due_date, created_at) "
+            "VALUES (?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))",
+            lambda todo: (todo.get('task') or todo.get('text', ''),
+                          1 if todo.get('completed', False) else 0,
+                          str(todo.get('priority') or 'medium').lower(), todo.get('due_date'),
+                          _to_utc_timestamp(todo.get('created'))),
+            progress_callback=progress_callback, force=force
+        )
+    
+    def _migrate_events(self, json_file: str, progress_callback=None, force: bool = False) -> Optional[int]:
+        """Migrate events from JSON."""
+        return self._migrate_json_file(
+            json_file,
+            "INSERT INTO events (title, description, event_date, event_time, created_at) "
+            "VALUES (?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))",
+            lambda event: (event.get('title', ''), event.get('description', ''),
+                           event.get('date', ''), event.get('time', ''),
+                           _to_utc_timestamp(event.get('created'))),
+            progress_callback=progress_callback, force=force
+        )
+    
+    def _migrate_chat_history(self, json_file: str, progress_callback=None, force: bool = False) -> Optional[int]:
+        """Migrate chat history from JSON."""
+        return self._migrate_json_file(
+            json_file,
+            "INSERT INTO chat_messages (role, content, created_at) "
+            "VALUES (?, ?, COALESCE(?, CURRENT_TIMESTAMP))",
+            lambda message: (message.get('role', 'user'), message.get('content', ''),
+                             _to_utc_timestamp(message.get('time'))),
+            progress_callback=progress_callback, force=force
+        )
+    
+    def _migrate_pomodoro_stats(self, json_file: str, progress_callback=None, force: bool = False) -> Optional[int]:
         """Migrate pomodoro stats from JSON."""
+        return self._migrate_json_file(
+            json_file,
+            "INSERT INTO pomodoro_sessions (duration, completed_at) "
+            "VALUES (?, COALESCE(?, CURRENT_TIMESTAMP))",
+            lambda session: (session.get('duration', 0),
+                             _to_utc_timestamp(f"{session.get('date', '')}T{session.get('time', '')}")),
+            key="sessions",
+            progress_callback=progress_callback, force=force
+        )
+    
+    def _migrate_json_file(self, json_file: str, insert_sql: str, to_row: Callable[[Dict], tuple],
+                           key: Optional[str] = None, progress_callback=None,
+                           force: bool = False) -> Optional[int]:
+        """
+        Stream one JSON array into a table.
+        
+        Rows are inserted with executemany in chunks of MIGRATION_CHUNK_SIZE
+        inside a single transaction, which also records the file's name, size
+        and modification time. Returns the number of imported rows, or None if
+        the file is missing or was already imported (unless force is set).
+        Errors propagate after the transaction is rolled back.
+        """
         if not os.path.exists(json_file):
-            return
+            return None
         
-        try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                stats = json.load(f)
-                
-                with sqlite3.connect(self.db_path) as conn:
-                    cursor = conn.cursor()
-                    for session in stats.get('sessions', []):
-                        cursor.execute(
-                            "INSERT INTO pomodoro_sessions (duration) VALUES (?)",
-                            (session.get('duration', 0),)
-                        )
-                    conn.commit()
-        except Exception as e:
-            print(f"Error migrating pomodoro stats: {e}") 
\ No newline at end of file
+        source = os.path.basename(json_file)
+        stat = os.stat(json_file)
+        
+        # Runs on every start, so an imported file is skipped without reading it
+        conn = self._get_connection()
+        marker = conn.execute(
+            "SELECT file_size, file_mtime_ns FROM json_migrations WHERE source=?", (source,)
+        ).fetchone()
+        if marker and not force:
+            if marker != (stat.st_size, stat.st_mtime_ns):
+                logger.warning(f"{source} changed after it was imported; not importing it again")
+            return None
+        
+        total_bytes = stat.st_size or 1
+        imported = 0
+        with self.transaction() as conn:
+            chunk = []
+            for item, bytes_read in iter_json_array(json_file, key=key):
+                chunk.append(to_row(item))
+                if len(chunk) >= MIGRATION_CHUNK_SIZE:
+                    conn.executemany(insert_sql, chunk)
+                    imported += len(chunk)
+                    chunk = []
+                    if progress_callback:
+                        progress_callback(source, imported, min(bytes_read / total_bytes, 1.0))
+            if chunk:
+                conn.executemany(insert_sql, chunk)
+                imported += len(chunk)
+            
+            conn.execute(
+                "INSERT OR REPLACE INTO json_migrations (source, file_size, file_mtime_ns, row_count) "
+                "VALUES (?, ?, ?, ?)",
+                (source, stat.st_size, stat.st_mtime_ns, imported)
+            )
+        
+        if progress_callback:
+            progress_callback(source, imported, 1.0)
+        return imported
+
+
+def _fts_prefix_query(text: str) -> str:
+    """Turn free text into an FTS5 query where every word is a quoted prefix term."""
+    words = FTS_WORD.findall(text)
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def _to_utc_timestamp(value: Optional[str]) -> Optional[str]:
+    """Convert a local ISO timestamp from the JSON files to SQLite's UTC format."""
+    if not value:
+        return None
+    try:
+        local_time = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    return local_time.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
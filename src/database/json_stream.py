@@ -0,0 +1,129 @@
+"""
+Incremental JSON reader for the Personal Assistant data files.
+
+Yields the items of a (possibly very large) JSON array one at a time
+without loading the whole document into memory.
+"""
+
+import codecs
+import json
+from typing import Any, Iterator, Optional, Tuple
+
+# Bytes read from disk per refill of the parse buffer
+READ_CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = " \t\n\r"
+
+
+class _StreamReader:
+    """Minimal pull parser over a binary file, built on json.JSONDecoder.raw_decode."""
+
+    def __init__(self, f, chunk_size: int):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.bytes_read = 0
+        self.eof = False
+        self._decoder = json.JSONDecoder()
+        self._text_decoder = codecs.getincrementaldecoder("utf-8-sig")()
+
+    def fill(self) -> bool:
+        """Append the next chunk to the buffer, dropping what was consumed."""
+        if self.eof:
+            return False
+
+        chunk = self.f.read(self.chunk_size)
+        self.bytes_read += len(chunk)
+        if chunk:
+            text = self._text_decoder.decode(chunk)
+        else:
+            self.eof = True
+            text = self._text_decoder.decode(b"", final=True)
+
+        self.buffer = self.buffer[self.pos:] + text
+        self.pos = 0
+        return bool(chunk) or bool(text)
+
+    def peek(self) -> str:
+        """Return the next non-whitespace character, or "" at end of file."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char: str):
+        """Consume the given structural character."""
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected '{char}' but found '{found or 'EOF'}'")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                obj, end = self._decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+
+            # A number at the very end of the buffer may continue in the next chunk
+            if end == len(self.buffer) and not self.eof:
+                self.fill()
+                continue
+
+            self.pos = end
+            return obj
+
+
+def iter_json_array(path: str, key: Optional[str] = None,
+                    chunk_size: int = READ_CHUNK_SIZE) -> Iterator[Tuple[Any, int]]:
+    """
+    Iterate over the items of a JSON array stored in a file.
+
+    Args:
+        path: Path to the JSON file
+        key: When given, the file holds an object and the array is read
+             from this top-level key (e.g. "sessions")
+        chunk_size: Number of bytes read per refill
+
+    Yields:
+        Tuples of (item, bytes_read_so_far)
+    """
+    with open(path, "rb") as f:
+        reader = _StreamReader(f, chunk_size)
+
+        if key is not None:
+            reader.expect("{")
+            while True:
+                if reader.peek() in ("}", ""):
+                    return
+                name = reader.value()
+                reader.expect(":")
+                if name == key:
+                    break
+                reader.value()
+                if reader.peek() == ",":
+                    reader.pos += 1
+
+        if reader.peek() != "[":
+            return
+        reader.pos += 1
+        if reader.peek() == "]":
+            return
+
+        while True:
+            yield reader.value(), reader.bytes_read
+
+            separator = reader.peek()
+            reader.pos += 1
+            if separator == "]":
+                return
+            if separator != ",":
+                raise ValueError(f"Expected ',' or ']' but found '{separator or 'EOF'}'")
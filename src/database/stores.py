@@ -0,0 +1,364 @@
+"""
+Per-widget storage on top of DatabaseManager.
+
+Each store translates between the dictionaries the widgets work with and
+the SQLite tables, so every user action becomes a single-row write
+instead of a rewrite of a whole JSON file.
+"""
+
+import unicodedata
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from src.database.db_manager import FTS_WORD, DatabaseManager
+
+# Maximum number of notes returned by a search
+SEARCH_LIMIT = 50
+
+# Words of note content shown around the matches of a search
+SNIPPET_WORDS = 12
+
+# Markers around matched words in note search snippets
+SNIPPET_MARKERS = ("«", "»")
+
+
+def to_local_iso(value: Optional[str]) -> str:
+    """Convert a SQLite UTC timestamp to a local ISO string for display."""
+    if not value:
+        return ""
+    try:
+        utc_time = datetime.strptime(value, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+    except ValueError:
+        return value
+    return utc_time.astimezone().replace(tzinfo=None).isoformat()
+
+
+def _fold(text: str) -> str:
+    """Lowercase text and drop accents the way the notes_fts tokenizer does."""
+    chars = []
+    for char in unicodedata.normalize("NFD", text.casefold()):
+        # remove_diacritics only applies to Latin letters (й and ё stay as they are)
+        if unicodedata.combining(char) and chars and chars[-1] < "\u0250":
+            continue
+        chars.append(char)
+    return unicodedata.normalize("NFC", "".join(chars))
+
+
+def _fold_words(text: str) -> List[str]:
+    """Split text into lowercase words the way the notes_fts tokenizer does."""
+    return FTS_WORD.findall(_fold(text))
+
+
+def _snippet(content: str, query: str, size: int = SNIPPET_WORDS) -> str:
+    """
+    Return the size words of the content that match the most query words.
+    
+    Matched words are put between SNIPPET_MARKERS and "…" marks cut-off
+    text, as FTS5's snippet() does. Fresh and narrowed search results both
+    get their snippet here, so they look the same for the same query.
+    """
+    prefixes = _fold_words(query)
+    words = list(FTS_WORD.finditer(content))
+    if not words:
+        return ""
+    
+    # Query words (by index) each content word matches; repeated words are folded once
+    matched = {}
+    found = []
+    for word in words:
+        text = word.group()
+        if text not in matched:
+            folded = _fold(text)
+            matched[text] = [i for i, prefix in enumerate(prefixes) if folded.startswith(prefix)]
+        found.append(matched[text])
+    
+    # Slide a window of size words; prefer the most different query words, then the most matches
+    counts = [0] * len(prefixes)
+    for hits in found[:size]:
+        for i in hits:
+            counts[i] += 1
+    best_start = 0
+    best_score = score = (sum(1 for count in counts if count), sum(1 for hits in found[:size] if hits))
+    for start in range(1, len(words) - size + 1):
+        for i in found[start - 1]:
+            counts[i] -= 1
+        for i in found[start + size - 1]:
+            counts[i] += 1
+        score = (sum(1 for count in counts if count),
+                 score[1] - bool(found[start - 1]) + bool(found[start + size - 1]))
+        if score > best_score:
+            best_start, best_score = start, score
+    
+    end = min(best_start + size, len(words))
+    parts = ["…"] if best_start > 0 else []
+    position = words[best_start].start()
+    for word, hits in zip(words[best_start:end], found[best_start:end]):
+        parts.append(content[position:word.start()])
+        parts.append(f"{SNIPPET_MARKERS[0]}{word.group()}{SNIPPET_MARKERS[1]}" if hits else word.group())
+        position = word.end()
+    if end < len(words):
+        parts.append("…")
+    return "".join(parts)
+
+
+class NotesStore:
+    def __init__(self, db: DatabaseManager):
+        self.db = db
+
+    def load_page(self, limit: int, after: Optional[tuple] = None) -> Tuple[List[Dict], Optional[tuple]]:
+        """
+        Return one page of note summaries (without content), newest first.
+        
+        Returns:
+            Tuple of (notes, cursor for the next page or None if this was the last)
+        """
+        rows = list(self.db.iter_notes(limit=limit + 1, after=after))
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = (rows[-1]['updated_at'], rows[-1]['id'])
+        return [self._to_summary(row) for row in rows], next_cursor
+
+    def search(self, query: str, limit: int = SEARCH_LIMIT) -> List[Dict]:
+        """Return the best matching notes, each with a highlighted snippet."""
+        return [
+            dict(self._to_summary(row), content=row['content'], snippet=_snippet(row['content'], query))
+            for row in self.db.search_notes(query, limit)
+        ]
+
+    @classmethod
+    def narrow(cls, results: List[Dict], query: str) -> List[Dict]:
+        """
+        Filter the results of a search for a shorter query down to the ones
+        matching query, without the database, with snippets for query.
+        """
+        return [
+            dict(note, snippet=_snippet(note['content'], query))
+            for note in results if cls.matches(note, query)
+        ]
+
+    @staticmethod
+    def matches(note: Dict, query: str) -> bool:
+        """
+        Check a note returned by search() against a query without the database.
+        
+        Follows the full-text index rules: every word of the query must be
+        the prefix of a word in the title or content, ignoring case and
+        accents on Latin letters.
+        """
+        words = set(_fold_words(f"{note['title']} {note['content']}"))
+        return all(
+            any(word.startswith(prefix) for word in words)
+            for prefix in _fold_words(query)
+        )
+
+    def get(self, note_id: int) -> Optional[Dict]:
+        """Return a single note with its content."""
+        row = self.db.get_note(note_id)
+        return self._to_note(row) if row else None
+
+    def save(self, note_id: Optional[int], title: str, content: str) -> int:
+        """Create or update a note and return its ID."""
+        if note_id is None:
+            return self.db.add_note(title, content)
+        self.db.update_note(note_id, title, content)
+        return note_id
+
+    def delete(self, note_id: int) -> bool:
+        return self.db.delete_note(note_id)
+
+    @staticmethod
+    def _to_summary(row) -> Dict:
+        return {
+            'id': row['id'],
+            'title': row['title'],
+            'modified': to_local_iso(row['updated_at'])
+        }
+
+    @staticmethod
+    def _to_note(row) -> Dict:
+        return {
+            'id': row['id'],
+            'title': row['title'],
+            'content': row['content'],
+            'created': to_local_iso(row['created_at']),
+            'modified': to_local_iso(row['updated_at'])
+        }
+
+
+class TodoStore:
+    def __init__(self, db: DatabaseManager):
+        self.db = db
+
+    def load_page(self, limit: int, after: Optional[tuple] = None,
+                  completed: Optional[bool] = None) -> Tuple[List[Dict], Optional[tuple]]:
+        """
+        Return one page of todos in list order: active first, then by priority and age.
+        
+        Args:
+            completed: Only active (False) or completed (True) todos
+        
+        Returns:
+            Tuple of (todos, cursor for the next page or None if this was the last)
+        """
+        rows = list(self.db.iter_todos(limit=limit + 1, after=after, completed=completed))
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = (last['completed'], last['priority_rank'], last['created_at'], last['id'])
+        return [self._to_todo(row) for row in rows], next_cursor
+
+    def counts(self) -> Tuple[int, int]:
+        """Return the number of (active, completed) todos."""
+        return self.db.count_todos()
+
+    def add(self, text: str, priority: str) -> int:
+        """Add a todo with a display priority ("Low", "Medium", "High")."""
+        return self.db.add_todo(text, priority.lower())
+
+    def toggle(self, todo_id: int) -> bool:
+        return self.db.toggle_todo(todo_id)
+
+    def delete(self, todo_id: int) -> bool:
+        return self.db.delete_todo(todo_id)
+
+    def delete_completed(self) -> int:
+        return self.db.delete_completed_todos()
+
+    @staticmethod
+    def _to_todo(row: Dict) -> Dict:
+        return {
+            'id': row['id'],
+            'text': row['task'],
+            'completed': bool(row['completed']),
+            'created': to_local_iso(row['created_at']),
+            'priority': (row['priority'] or 'medium').capitalize()
+        }
+
+
+class EventStore:
+    def __init__(self, db: DatabaseManager):
+        self.db = db
+
+    def load_day(self, date: str) -> List[Dict]:
+        """Return the events on one date (YYYY-MM-DD), ordered by time."""
+        return self.load_range(date, date)
+
+    def load_range(self, start_date: str, end_date: str) -> List[Dict]:
+        """Return the events between two dates inclusive."""
+        return [self._to_event(row) for row in self.db.get_events_between(start_date, end_date)]
+
+    def event_dates(self, start_date: str, end_date: str) -> List[str]:
+        """Return the dates between two dates inclusive that have at least one event."""
+        return self.db.get_event_dates(start_date, end_date)
+
+    def save(self, event_id: Optional[int], title: str, description: str,
+             date: str, time: str) -> int:
+        """Create or update an event and return its ID."""
+        if event_id is None:
+            return self.db.add_event(title, description, date, time)
+        self.db.update_event(event_id, title, description, date, time)
+        return event_id
+
+    def delete(self, event_id: int) -> bool:
+        return self.db.delete_event(event_id)
+
+    @staticmethod
+    def _to_event(row: Dict) -> Dict:
+        return {
+            'id': row['id'],
+            'title': row['title'],
+            'description': row['description'] or '',
+            'date': row['event_date'],
+            'time': row['event_time'] or '',
+            'created': to_local_iso(row['created_at'])
+        }
+
+
+class ChatStore:
+    def __init__(self, db: DatabaseManager):
+        self.db = db
+
+    def load_page(self, limit: int, before_id: Optional[int] = None) -> Tuple[List[Dict], bool]:
+        """
+        Return the newest messages older than before_id, in chronological order.
+        
+        Returns:
+            Tuple of (messages, whether even older messages exist)
+        """
+        rows = list(self.db.iter_chat_messages(limit=limit + 1, before_id=before_id))
+        has_more = len(rows) > limit
+        return [self._to_message(row) for row in reversed(rows[:limit])], has_more
+
+    def append(self, role: str, content: str) -> int:
+        return self.db.add_chat_message(role, content)
+
+    def clear(self) -> int:
+        return self.db.clear_chat_messages()
+
+    def get_summary(self) -> Optional[Dict]:
+        """Return the cached summary of the older messages, if it is still valid."""
+        return self.db.get_chat_summary()
+
+    def save_summary(self, covered_until: int, summary: str) -> bool:
+        """Store a summary of every message up to and including covered_until."""
+        return self.db.save_chat_summary(covered_until, summary)
+
+    @staticmethod
+    def _to_message(row) -> Dict:
+        return {
+            'id': row['id'],
+            'role': row['role'],
+            'content': row['content'],
+            'time': to_local_iso(row['created_at'])
+        }
+
+
+class PomodoroStore:
+    def __init__(self, db: DatabaseManager):
+        self.db = db
+
+    def get_stats(self) -> Dict:
+        """Return the completed pomodoro count and total focus time in seconds."""
+        return self.db.get_pomodoro_stats()
+
+    def add_session(self, duration: int) -> int:
+        """Record a completed pomodoro of the given length in seconds."""
+        return self.db.add_pomodoro_session(duration)
+
+    def get_focus_totals(self, period: str = "day", since: Optional[str] = None) -> List[Dict]:
+        """Return focus time per local day, week or month."""
+        return self.db.get_focus_totals(period, since)
+
+    def get_today_focus_time(self) -> int:
+        """Return today's focus time in seconds."""
+        today = datetime.now().strftime("%Y-%m-%d")
+        totals = self.db.get_focus_totals("day", since=today)
+        return totals[0]['focus_time'] if totals else 0
+
+    def get_streak(self) -> Dict:
+        """Return the current and longest streak of focus days."""
+        return self.db.get_focus_streak()
+
+    def get_hourly_histogram(self) -> List[int]:
+        """Return completed pomodoros per hour of the day."""
+        return self.db.get_focus_by_hour()
+
+
+class WeatherLocationStore:
+    def __init__(self, db: DatabaseManager):
+        self.db = db
+
+    def load(self) -> List[Dict]:
+        """Return the saved dashboard locations as {'id', 'name'} dicts."""
+        return self.db.get_weather_locations()
+
+    def add(self, name: str) -> Optional[int]:
+        """Save a location; returns None if it is already saved."""
+        # SQLite's NOCASE only folds ASCII, so "софия,bg" is matched here
+        name = " ".join(name.split())
+        return self.db.add_weather_location(name, name.casefold())
+
+    def delete(self, location_id: int) -> bool:
+        return self.db.delete_weather_location(location_id)
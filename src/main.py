@@ -3,24 +3,53 @@ import customtkinter as ctk
 from dotenv import load_dotenv
 import datetime
 import json
-import pyttsx3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-# Local imports
-from src.components.weather_widget import WeatherWidget
-from src.components.notes_widget import NotesWidget
-from src.components.todo_widget import TodoWidget
-from src.components.calendar_widget import CalendarWidget
-from src.components.chat_widget import ChatWidget
-from src.components.pomodoro_widget import PomodoroWidget
+# Local imports; the widget modules (and tkcalendar, pyttsx3) are imported
+# when their frame is first built
+import config
 from src.services.llm_service import LLMService
+from src.utils.logger import setup_logger
 from src.utils.time_utils import get_greeting
-from src.database.db_manager import DatabaseManager
+from src.database.db_manager import DatabaseManager, JSONMigrationError
+from src.database.stores import ChatStore
 
 # Load environment variables
 load_dotenv()
 
+logger = setup_logger()
+
+# Sidebar entries and the methods building their frames, in sidebar order.
+# A frame is built the first time it is shown, or while the app is idle.
+FRAME_BUILDERS = {
+    "Начало": "init_home_frame",
+    "Чат": "init_chat_frame",
+    "Бележки": "init_notes_frame",
+    "Задачи": "init_todo_frame",
+    "Календар": "init_calendar_frame",
+    "Pomodoro": "init_pomodoro_frame",
+    "Настройки": "init_settings_frame",
+}
+
+# Names of the LLM timings shown in the diagnostics (see llm_metrics.TIMINGS)
+DIAGNOSTIC_LABELS = {
+    "queue_wait": "Изчакване в опашката",
+    "prepare_time": "Подготовка на заявката",
+    "first_token": "До първия токен",
+    "total": "Общо време",
+    "load_time": "Зареждане на модела",
+    "prompt_time": "Обработка на промпта",
+    "generation_time": "Генериране",
+    "network_time": "Мрежа и клиент",
+    "tokens_per_sec": "Токени в секунда",
+    "ui_delay": "Забавяне на екрана",
+}
+
 class AssistantApp(ctk.CTk):
     def __init__(self):
+        started_at = time.perf_counter()
         super().__init__()
         
         # Configure the main window
@@ -31,17 +60,31 @@ class AssistantApp(ctk.CTk):
         ctk.set_appearance_mode("dark")  # Options: "dark", "light"
         ctk.set_default_color_theme("blue")
         
-        # Initialize LLM service
-        self.llm = LLMService()
-        
-        # Setup text-to-speech engine
-        self.tts_engine = pyttsx3.init()
+        # Initialize database and import the legacy JSON files once
+        self.db = DatabaseManager()
+        try:
+            self.db.migrate_from_json()
+        except JSONMigrationError as e:
+            # Already logged; the failed files are tried again on the next start
+            print(f"Грешка при пренасяне на старите данни: {e}")
+        
+        # Initialize LLM service, optionally with the user's records as context
+        index = None
+        if config.RAG_ENABLED:
+            from src.services.retrieval import SemanticIndex
+            index = SemanticIndex(self.db)
+        self.llm = LLMService(summary_store=ChatStore(self.db), index=index)
+        self.llm.warm_up()
+        
+        # Text-to-speech runs on its own thread; the engine is created there on first use
+        self.tts_engine = None
+        self.tts_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts")
         
         # Create sidebar and main content area
         self.create_layout()
         
-        # Greet the user
-        self.greet_user()
+        # Once the window is drawn: log the startup time, greet the user and build the other frames
+        self.after_idle(lambda: self.on_first_paint(started_at))
         
     def create_layout(self):
         # Create sidebar frame
@@ -55,12 +98,8 @@ class AssistantApp(ctk.CTk):
         self.logo_label.pack(pady=20)
         
         # Sidebar buttons
-        sidebar_options = [
-            "Начало", "Чат", "Бележки", "Задачи", "Календар", "Pomodoro", "Настройки"
-        ]
-        
         self.sidebar_buttons = []
-        for option in sidebar_options:
+        for option in FRAME_BUILDERS:
             button = ctk.CTkButton(self.sidebar, text=option, 
                                   command=lambda o=option: self.show_frame(o))
             button.pack(pady=10, padx=20, fill="x")
@@ -76,31 +115,79 @@ class AssistantApp(ctk.CTk):
         self.main_frame = ctk.CTkFrame(self, corner_radius=0)
         self.main_frame.pack(side="right", fill="both", expand=True)
         
-        # Create frames for each section
+        # Frames of the sections built so far
         self.frames = {}
-        for option in sidebar_options:
-            frame = ctk.CTkFrame(self.main_frame)
-            self.frames[option] = frame
-            
-        # Initialize widgets in each frame
-        self.init_home_frame()
-        self.init_chat_frame()
-        self.init_notes_frame()
-        self.init_todo_frame()
-        self.init_calendar_frame()
-        self.init_pomodoro_frame()
-        self.init_settings_frame()
         
         # Show default frame
         self.show_frame("Начало")
         
     def show_frame(self, frame_name):
+        try:
+            frame = self.build_frame(frame_name)
+        except Exception as e:
+            # The current frame stays; the next click tries again
+            print(f"Грешка при зареждане на {frame_name}: {e}")
+            return
+        
         # Hide all frames
-        for frame in self.frames.values():
-            frame.pack_forget()
+        for other in self.frames.values():
+            other.pack_forget()
         
         # Show selected frame
-        self.frames[frame_name].pack(fill="both", expand=True, padx=20, pady=20)
+        frame.pack(fill="both", expand=True, padx=20, pady=20)
+        
+        if frame_name == "Настройки":
+            self.refresh_diagnostics()
+    
+    def build_frame(self, frame_name):
+        """
+        Return the frame of a section, building it on first use.
+        
+        Args:
+            frame_name: Sidebar entry (key of FRAME_BUILDERS)
+        
+        Returns:
+            The section's CTkFrame
+        
+        Raises:
+            Whatever the builder raised, after the partial frame is destroyed
+        """
+        frame = self.frames.get(frame_name)
+        if frame is None:
+            started_at = time.perf_counter()
+            frame = ctk.CTkFrame(self.main_frame)
+            self.frames[frame_name] = frame
+            try:
+                getattr(self, FRAME_BUILDERS[frame_name])()
+            except Exception:
+                # A half-built frame is never shown; the next call builds it again
+                self.frames.pop(frame_name, None)
+                frame.destroy()
+                raise
+            logger.debug(f"Frame {frame_name} built in {(time.perf_counter() - started_at) * 1000:.0f} ms")
+        return frame
+    
+    def on_first_paint(self, started_at):
+        logger.info(f"Window shown {(time.perf_counter() - started_at) * 1000:.0f} ms after start")
+        self.greet_user()
+        if config.PREBUILD_FRAMES:
+            self.after(config.PREBUILD_DELAY, self.prebuild_next_frame)
+    
+    def prebuild_next_frame(self):
+        """Build one frame that has not been shown yet, then yield to the event loop"""
+        pending = [name for name in FRAME_BUILDERS if name not in self.frames]
+        if not pending:
+            return
+        
+        try:
+            self.build_frame(pending[0])
+        except Exception as e:
+            # Showing the frame will try again and report the error there
+            print(f"Грешка при подготовка на {pending[0]}: {e}")
+            return
+        
+        # Wait for the pending events (clicks, typing) before the next frame
+        self.after(config.PREBUILD_DELAY, lambda: self.after_idle(self.prebuild_next_frame))
     
     def init_home_frame(self):
         frame = self.frames["Начало"]
@@ -117,9 +204,21 @@ class AssistantApp(ctk.CTk):
                                          font=ctk.CTkFont(size=16))
         self.datetime_label.pack(pady=10)
         
-        # Weather widget
-        self.weather_widget = WeatherWidget(frame)
-        self.weather_widget.pack(pady=20, fill="x")
+        # Weather widget and the saved locations, sharing one cache, worker pool and icon cache
+        from src.components.weather_widget import WeatherWidget
+        from src.components.weather_dashboard import WeatherDashboard
+        from src.database.stores import WeatherLocationStore
+        from src.services.weather_icons import IconCache
+        from src.services.weather_service import WeatherService
+        
+        self.weather_service = WeatherService()
+        self.weather_icons = IconCache(self.weather_service)
+        self.weather_widget = WeatherWidget(frame, self.weather_service, self.weather_icons)
+        self.weather_widget.pack(pady=(20, 10), fill="x")
+        
+        self.weather_dashboard = WeatherDashboard(frame, self.weather_service,
+                                                  WeatherLocationStore(self.db), self.weather_icons)
+        self.weather_dashboard.pack(pady=(0, 20), fill="x")
         
         # Quote of the day
         self.quote_frame = ctk.CTkFrame(frame)
@@ -136,28 +235,42 @@ class AssistantApp(ctk.CTk):
         self.quote_author.pack(pady=5)
     
     def init_chat_frame(self):
+        from src.components.chat_widget import ChatWidget
+        
         frame = self.frames["Чат"]
-        self.chat_widget = ChatWidget(frame, self.llm)
+        self.chat_widget = ChatWidget(frame, self.llm, ChatStore(self.db))
         self.chat_widget.pack(fill="both", expand=True)
     
     def init_notes_frame(self):
+        from src.components.notes_widget import NotesWidget
+        from src.database.stores import NotesStore
+        
         frame = self.frames["Бележки"]
-        self.notes_widget = NotesWidget(frame)
+        self.notes_widget = NotesWidget(frame, NotesStore(self.db))
         self.notes_widget.pack(fill="both", expand=True)
     
     def init_todo_frame(self):
+        from src.components.todo_widget import TodoWidget
+        from src.database.stores import TodoStore
+        
         frame = self.frames["Задачи"]
-        self.todo_widget = TodoWidget(frame)
+        self.todo_widget = TodoWidget(frame, TodoStore(self.db))
         self.todo_widget.pack(fill="both", expand=True)
     
     def init_calendar_frame(self):
+        from src.components.calendar_widget import CalendarWidget
+        from src.database.stores import EventStore
+        
         frame = self.frames["Календар"]
-        self.calendar_widget = CalendarWidget(frame)
+        self.calendar_widget = CalendarWidget(frame, EventStore(self.db))
         self.calendar_widget.pack(fill="both", expand=True)
     
     def init_pomodoro_frame(self):
+        from src.components.pomodoro_widget import PomodoroWidget
+        from src.database.stores import PomodoroStore
+        
         frame = self.frames["Pomodoro"]
-        self.pomodoro_widget = PomodoroWidget(frame)
+        self.pomodoro_widget = PomodoroWidget(frame, PomodoroStore(self.db))
         self.pomodoro_widget.pack(fill="both", expand=True)
     
     def init_settings_frame(self):
@@ -174,13 +287,16 @@ class AssistantApp(ctk.CTk):
         llm_label = ctk.CTkLabel(llm_frame, text="LLM Модел:")
         llm_label.pack(side="left", padx=10)
         
-        llm_options = ["llama3.2", "mistral", "phi3", "openai"]
-        self.llm_var = ctk.StringVar(value=os.getenv("LLM_MODEL", "llama3.2"))
+        llm_options = self.llm.registry.model_choices()
+        self.llm_var = ctk.StringVar(value=self.llm.model)
+        
+        self.llm_dropdown = ctk.CTkOptionMenu(llm_frame, values=llm_options, 
+                                            variable=self.llm_var,
+                                            command=self.change_llm_model)
+        self.llm_dropdown.pack(side="left", padx=10)
         
-        llm_dropdown = ctk.CTkOptionMenu(llm_frame, values=llm_options, 
-                                       variable=self.llm_var,
-                                       command=self.change_llm_model)
-        llm_dropdown.pack(side="left", padx=10)
+        # Replace the default list with the installed models once the providers answer
+        threading.Thread(target=self.refresh_llm_models, daemon=True).start()
         
         # Weather API key
         api_frame = ctk.CTkFrame(frame)
@@ -209,6 +325,25 @@ class AssistantApp(ctk.CTk):
         
         openai_save = ctk.CTkButton(openai_frame, text="Запази", command=self.save_openai_key)
         openai_save.pack(side="left", padx=10)
+        
+        # Diagnostics: timings of the recent LLM calls and provider health
+        diagnostics_frame = ctk.CTkFrame(frame)
+        diagnostics_frame.pack(fill="both", expand=True, pady=10)
+        
+        diagnostics_header = ctk.CTkFrame(diagnostics_frame, fg_color="transparent")
+        diagnostics_header.pack(fill="x")
+        
+        diagnostics_label = ctk.CTkLabel(diagnostics_header, text="Диагностика",
+                                       font=ctk.CTkFont(size=16, weight="bold"))
+        diagnostics_label.pack(side="left", padx=10, pady=5)
+        
+        diagnostics_refresh = ctk.CTkButton(diagnostics_header, text="Обнови", width=80,
+                                          command=self.refresh_diagnostics)
+        diagnostics_refresh.pack(side="right", padx=10, pady=5)
+        
+        self.diagnostics_text = ctk.CTkTextbox(diagnostics_frame, height=280,
+                                             font=ctk.CTkFont(family="Courier", size=12))
+        self.diagnostics_text.pack(fill="both", expand=True, padx=10, pady=(0, 10))
     
     def toggle_theme(self):
         if self.theme_switch.get() == 1:
@@ -219,8 +354,58 @@ class AssistantApp(ctk.CTk):
     def greet_user(self):
         greeting = get_greeting()
         # TTS greeting
-        self.tts_engine.say(greeting)
-        self.tts_engine.runAndWait()
+        self.speak(greeting)
+    
+    def speak(self, text):
+        """Say text with the TTS engine without blocking the UI"""
+        self.tts_executor.submit(self._speak, text)
+    
+    def _speak(self, text):
+        # Runs on the TTS thread, which owns the engine
+        try:
+            if self.tts_engine is None:
+                import pyttsx3
+                self.tts_engine = pyttsx3.init()
+            self.tts_engine.say(text)
+            self.tts_engine.runAndWait()
+        except Exception as e:
+            print(f"Грешка при синтез на реч: {e}")
+    
+    def refresh_diagnostics(self):
+        summary = self.llm.metrics.summary()
+        lines = [
+            f"Заявки: {summary['calls']} (грешки: {summary['errors']}, от кеша: {summary['cached']}, "
+            f"спрени: {summary['cancelled']}, пренасочени: {summary['failovers']})",
+            "",
+            f"{'':<26}{'p50':>10}{'p95':>10}{'брой':>7}",
+        ]
+        for name, label in DIAGNOSTIC_LABELS.items():
+            timing = summary["timings"][name]
+            if not timing["count"]:
+                continue
+            if name == "tokens_per_sec":
+                p50, p95 = f"{timing['p50']:.1f}", f"{timing['p95']:.1f}"
+            else:
+                p50, p95 = f"{timing['p50'] * 1000:.0f} ms", f"{timing['p95'] * 1000:.0f} ms"
+            lines.append(f"{label:<26}{p50:>10}{p95:>10}{timing['count']:>7}")
+        
+        lines += ["", "Доставчици:"]
+        for name, stats in self.llm.registry.stats().items():
+            state = {True: "работи", False: "недостъпен", None: "непроверен"}[stats["healthy"]]
+            latency = f"{stats['latency_p50'] * 1000:.0f} ms" if stats["latency_p50"] is not None else "-"
+            lines.append(f"  {name:<8} {state:<11} заявки: {stats['requests']:<4} "
+                         f"грешки: {stats['error_rate']:.0%}  p50: {latency}")
+        
+        self.diagnostics_text.configure(state="normal")
+        self.diagnostics_text.delete("1.0", "end")
+        self.diagnostics_text.insert("1.0", "\n".join(lines))
+        self.diagnostics_text.configure(state="disabled")
+    
+    def refresh_llm_models(self):
+        """Check the LLM providers and list their models (runs in a background thread)"""
+        self.llm.registry.check_health()
+        choices = self.llm.registry.model_choices()
+        self.after(0, lambda: self.llm_dropdown.configure(values=choices))
     
     def change_llm_model(self, model_name):
         self.llm.change_model(model_name)
@@ -235,13 +420,14 @@ class AssistantApp(ctk.CTk):
         
         # Refresh weather data
         self.weather_widget.refresh_weather()
+        self.weather_dashboard.refresh()
         
     def save_openai_key(self):
         openai_key = self.openai_entry.get()
         os.environ["OPENAI_API_KEY"] = openai_key
         
-        # Update the LLM service with the new key
-        self.llm.openai_api_key = openai_key
+        # Update the OpenAI provider with the new key
+        self.llm.registry.get("openai").api_key = openai_key
 
 if __name__ == "__main__":
     app = AssistantApp()
@@ -0,0 +1,160 @@
+"""
+Token-budget context builder for the LLM requests.
+
+Fills a fixed token budget with the newest chat messages that fit, so the
+prompt size (and with it the model's prefill time) stays predictable
+whether the history holds many short messages or a few long ones. The
+start of the window only moves when it has to, so consecutive prompts
+share a prefix the server does not need to prefill again.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Tokens added per message for the role and chat template markup
+MESSAGE_OVERHEAD = 4
+
+# Messages whose token count is remembered
+TOKEN_CACHE_SIZE = 2048
+
+# Share of the history budget filled when the window has to move forward
+WINDOW_REFILL = 0.5
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Fast token estimate without a tokenizer.
+
+    Counts about four UTF-8 bytes per token, which is roughly four
+    characters of Latin text and two of Cyrillic, matching how BPE
+    tokenizers split both.
+    """
+    return (len(text.encode("utf-8")) + 3) // 4
+
+
+def get_tokenizer(model: str) -> Callable[[str], int]:
+    """Return a token counter for the model, falling back to estimate_tokens."""
+    if model == "openai" and tiktoken is not None:
+        encoding = tiktoken.get_encoding("cl100k_base")
+        return lambda text: len(encoding.encode(text))
+    return estimate_tokens
+
+
+class ContextBuilder:
+    def __init__(self, max_tokens: int, count_tokens: Optional[Callable[[str], int]] = None):
+        """
+        Args:
+            max_tokens: Token budget for the whole prompt (system prompt,
+                        history and the new message)
+            count_tokens: Tokenizer returning the token count of a text;
+                          defaults to estimate_tokens
+        """
+        self.max_tokens = max_tokens
+        self.count_tokens = count_tokens or estimate_tokens
+        self._token_cache = OrderedDict()  # content -> token count, least recently used first
+        self._cache_lock = threading.Lock()
+        self._window_start = None  # ID of the first history message sent last time
+
+    def build(self, user_message: str, chat_history: Optional[List[Dict]] = None,
+              system_prompt: Optional[str] = None, summary: Optional[str] = None,
+              reference: Optional[str] = None) -> List[Dict]:
+        """
+        Build the message list for a chat request.
+
+        The system prompt, the summary, the reference and the new message
+        are always included; the rest of the budget is filled with the
+        newest history (see split_history).
+
+        Args:
+            user_message: The user's new message
+            chat_history: Earlier messages, oldest first
+            system_prompt: Optional system message placed first; keep it
+                           constant so the server can reuse its prefill
+            summary: Optional summary of earlier turns, sent as a second
+                     system message so the first one never changes
+            reference: Optional material for this message only (e.g.
+                       retrieved records), sent as a system message right
+                       before it so the history prefix stays the same
+
+        Returns:
+            Messages in {"role", "content"} form, oldest first
+        """
+        _, recent = self.split_history(user_message, chat_history, system_prompt, summary, reference)
+
+        messages = []
+        for prompt in (system_prompt, summary):
+            if prompt:
+                messages.append({"role": "system", "content": prompt})
+        messages.extend({"role": msg.get("role", "user"), "content": msg["content"]} for msg in recent)
+        if reference:
+            messages.append({"role": "system", "content": reference})
+        messages.append({"role": "user", "content": user_message})
+        return messages
+
+    def split_history(self, user_message: str, chat_history: Optional[List[Dict]] = None,
+                      system_prompt: Optional[str] = None, summary: Optional[str] = None,
+                      reference: Optional[str] = None) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Split the history at the budget of a request built from the same arguments.
+
+        The window keeps starting at the same message for as long as
+        everything after it fits, so consecutive requests share their
+        prefix and the server only prefills the new turns. When the budget
+        runs out the window moves forward to WINDOW_REFILL of the budget,
+        leaving room for the next turns.
+
+        Returns:
+            Tuple of (older messages left out, newest messages that fit),
+            both oldest first and holding the original message dicts
+        """
+        budget = self.max_tokens - self.message_tokens(user_message)
+        for prompt in (system_prompt, summary, reference):
+            if prompt:
+                budget -= self.message_tokens(prompt)
+
+        # Skip empty messages and anything that is not part of the conversation
+        history = [msg for msg in chat_history or []
+                   if msg.get("role", "user") in ("user", "assistant")
+                   and msg.get("content", "").strip()]
+
+        # Earliest start (and the tokens used from there) that fits the budget
+        tokens = [self.message_tokens(msg["content"]) for msg in history]
+        start, used = len(history), 0
+        while start > 0 and used + tokens[start - 1] <= budget:
+            start -= 1
+            used += tokens[start]
+
+        anchor = next((i for i, msg in enumerate(history)
+                       if msg.get("id") is not None and msg.get("id") == self._window_start), None)
+        if anchor is not None and anchor >= start:
+            start = anchor
+        elif start > 0:
+            # Move the window forward, filling only part of the budget
+            while start < len(history) and used > budget * WINDOW_REFILL:
+                used -= tokens[start]
+                start += 1
+        self._window_start = history[start].get("id") if start < len(history) else None
+
+        return history[:start], history[start:]
+
+    def message_tokens(self, content: str) -> int:
+        """Token count of one message including its overhead, cached by content."""
+        with self._cache_lock:
+            tokens = self._token_cache.get(content)
+            if tokens is not None:
+                self._token_cache.move_to_end(content)
+                return tokens
+
+        tokens = self.count_tokens(content) + MESSAGE_OVERHEAD
+
+        with self._cache_lock:
+            self._token_cache[content] = tokens
+            while len(self._token_cache) > TOKEN_CACHE_SIZE:
+                self._token_cache.popitem(last=False)
+        return tokens
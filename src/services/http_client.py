@@ -0,0 +1,118 @@
+"""
+Shared HTTP client for the Personal Assistant services.
+
+Keeps one pooled requests.Session per host, so repeated calls to Ollama,
+OpenAI or OpenWeather reuse keep-alive connections instead of opening a
+new TCP/TLS connection every time. Responses with status 429 or 5xx and
+failed connections are retried with exponential backoff and jitter.
+"""
+
+import random
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+
+# Statuses worth retrying: rate limiting and temporary server errors
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Connections kept open per host (streaming replies and the weather
+# dashboard's parallel requests hold one each)
+POOL_SIZE = 10
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(url: str) -> requests.Session:
+    """Return the shared session for the host of the given URL."""
+    parts = urlsplit(url)
+    host = f"{parts.scheme}://{parts.netloc}"
+
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+            session.mount(host, adapter)
+            _sessions[host] = session
+        return session
+
+
+def request(method: str, url: str, timeout: float = config.API_TIMEOUT,
+            retries: int = config.HTTP_MAX_RETRIES, connect_timeout: float = config.CONNECT_TIMEOUT,
+            **kwargs) -> requests.Response:
+    """
+    Send a request through the pooled session for its host.
+
+    Args:
+        method: HTTP method ("GET", "POST", ...)
+        url: Full request URL
+        timeout: Read timeout in seconds
+        retries: Extra attempts after a 429/5xx response or a failed connection
+        connect_timeout: Seconds to wait for the connection to open
+        **kwargs: Passed on to requests.Session.request (json, headers, stream, ...)
+
+    Returns:
+        The response of the last attempt (which may still have an error status)
+    """
+    session = get_session(url)
+
+    for attempt in range(retries + 1):
+        try:
+            response = session.request(method, url,
+                                       timeout=(connect_timeout, timeout), **kwargs)
+        except requests.ConnectionError:
+            # Includes connect timeouts and keep-alive connections closed by the server
+            if attempt == retries:
+                raise
+            time.sleep(_backoff_delay(attempt))
+            continue
+
+        if response.status_code not in RETRY_STATUSES or attempt == retries:
+            return response
+
+        delay = _retry_after(response)
+        if delay is None:
+            delay = _backoff_delay(attempt)
+
+        # Hand the connection back to the pool before waiting
+        response.close()
+        time.sleep(delay)
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
+
+
+def close_all():
+    """Close every pooled session."""
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for session in sessions:
+        session.close()
+
+
+def _backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter: a random wait up to base * 2^attempt."""
+    ceiling = min(config.HTTP_BACKOFF_MAX, config.HTTP_BACKOFF_BASE * 2 ** attempt)
+    return random.uniform(0, ceiling)
+
+
+def _retry_after(response: requests.Response) -> Optional[float]:
+    """Return the wait requested by a Retry-After header given in seconds."""
+    value = response.headers.get("Retry-After")
+    try:
+        return min(max(float(value), 0.0), config.HTTP_BACKOFF_MAX)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,144 @@
+"""
+Measurements of LLM calls for the diagnostics in the settings.
+
+Every chat call leaves one record (queue wait, time to first token, total
+time, token counts and the server's own timings where the API reports
+them) in a fixed-size ring buffer, and is logged. Splitting the time this
+way shows whether a slow reply comes from the model (load, prefill,
+generation), the network and client (total minus the server's time) or
+the UI (delay between a piece arriving and being drawn).
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+import config
+from src.utils.logger import setup_logger
+
+logger = setup_logger()
+
+# Timings summarized by MetricsRecorder.summary(), in seconds unless noted
+TIMINGS = [
+    "queue_wait",      # waiting behind other requests
+    "prepare_time",    # building the prompt (history, summary, retrieval)
+    "first_token",     # request start to the first piece of the reply
+    "total",           # request start to the end of the reply
+    "load_time",       # model load (Ollama)
+    "prompt_time",     # prompt prefill (Ollama)
+    "generation_time", # token generation (Ollama)
+    "network_time",    # total minus the server's own time (Ollama)
+    "tokens_per_sec",  # completion tokens per second of generation
+    "ui_delay",        # piece received to piece drawn in the chat
+]
+
+
+def percentile(values: List[float], share: float) -> Optional[float]:
+    """Nearest-rank percentile of the values (share 0.5 for the median)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+class MetricsRecorder:
+    def __init__(self, size: int = config.LLM_METRICS_SIZE):
+        """
+        Args:
+            size: Number of calls (and UI delays) kept; older ones are dropped
+        """
+        self._calls = deque(maxlen=size)
+        self._ui_delays = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, call: Dict):
+        """
+        Store and log the measurements of one call.
+
+        Args:
+            call: Dict with any of the TIMINGS keys plus provider, model,
+                  prompt_tokens, completion_tokens, failovers, cached,
+                  cancelled and error
+        """
+        call = dict(call, time=time.time())
+        if call.get("tokens_per_sec") is None:
+            call["tokens_per_sec"] = _tokens_per_sec(call)
+        if call.get("server_time") is not None and call.get("total") is not None:
+            call["network_time"] = max(call["total"] - call["server_time"], 0.0)
+
+        with self._lock:
+            self._calls.append(call)
+
+        fields = " ".join(
+            f"{key}={_format(call[key])}"
+            for key in ("provider", "model", "queue_wait", "first_token", "total",
+                        "prompt_tokens", "completion_tokens", "tokens_per_sec", "failovers")
+            if call.get(key) is not None
+        )
+        if call.get("error"):
+            logger.error(f"LLM call failed: {fields} error={call['error']}")
+        else:
+            # Only the log file records every call
+            state = " cached" if call.get("cached") else " cancelled" if call.get("cancelled") else ""
+            logger.debug(f"LLM call{state}: {fields}")
+
+    def record_ui_delay(self, seconds: float):
+        """Store how long a received piece of a reply waited to be drawn"""
+        with self._lock:
+            self._ui_delays.append(seconds)
+
+    def summary(self) -> Dict:
+        """
+        Percentiles over the calls in the buffer.
+
+        Returns:
+            {"calls", "errors", "cached", "cancelled", "failovers",
+             "timings": {name: {"p50", "p95", "count"}}}
+        """
+        with self._lock:
+            calls = list(self._calls)
+            ui_delays = list(self._ui_delays)
+
+        timings = {}
+        for name in TIMINGS:
+            values = ui_delays if name == "ui_delay" else [
+                call[name] for call in calls if call.get(name) is not None
+            ]
+            timings[name] = {
+                "p50": percentile(values, 0.5),
+                "p95": percentile(values, 0.95),
+                "count": len(values),
+            }
+
+        return {
+            "calls": len(calls),
+            "errors": sum(1 for call in calls if call.get("error")),
+            "cached": sum(1 for call in calls if call.get("cached")),
+            "cancelled": sum(1 for call in calls if call.get("cancelled")),
+            "failovers": sum(call.get("failovers") or 0 for call in calls),
+            "timings": timings,
+        }
+
+    def recent(self, count: int = 10) -> List[Dict]:
+        """The newest calls, newest first"""
+        with self._lock:
+            return list(self._calls)[-count:][::-1]
+
+
+def _tokens_per_sec(call: Dict) -> Optional[float]:
+    """Generation speed from the server's timing, else from the streaming time"""
+    tokens = call.get("completion_tokens")
+    if not tokens:
+        return None
+    if call.get("generation_time"):
+        return tokens / call["generation_time"]
+    if call.get("total") is not None and call.get("first_token") is not None:
+        streaming = call["total"] - call["first_token"]
+        if streaming > 0:
+            return tokens / streaming
+    return None
+
+
+def _format(value) -> str:
+    return f"{value:.3f}" if isinstance(value, float) else str(value)
@@ -0,0 +1,542 @@
+"""
+LLM backends and the registry that routes chat requests between them.
+
+Every provider (Ollama, an OpenAI-compatible endpoint, a local stub) keeps
+rolling latency and error statistics. The registry sends a request to the
+provider of the selected model and, when it fails before answering (a
+timeout, a refused connection, a server error), fails over to the other
+providers, fastest first. A provider that failed is skipped until
+config.LLM_HEALTH_INTERVAL has passed. While another provider can take
+over, a request is sent once with a short connect timeout instead of being
+retried, so failing over takes seconds rather than the whole retry backoff.
+"""
+
+import json
+import statistics
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import config
+from src.services import http_client
+from src.services.context_builder import estimate_tokens, get_tokenizer
+from src.utils.logger import setup_logger
+
+logger = setup_logger()
+
+
+class ProviderStats:
+    """Rolling latency and error statistics of one provider"""
+
+    def __init__(self, window: int = config.LLM_STATS_WINDOW):
+        self.latencies = deque(maxlen=window)  # seconds until the first piece of a reply
+        self.outcomes = deque(maxlen=window)  # True for a successful request
+        self.healthy = None  # result of the last request or health check, None before any
+        self.retry_at = 0.0  # time.monotonic() before which the provider is skipped
+        self._lock = threading.Lock()
+
+    def record_success(self, latency: float):
+        with self._lock:
+            self.latencies.append(latency)
+            self.outcomes.append(True)
+            self.healthy = True
+            self.retry_at = 0.0
+
+    def record_failure(self):
+        with self._lock:
+            self.outcomes.append(False)
+            self.healthy = False
+            self.retry_at = time.monotonic() + config.LLM_HEALTH_INTERVAL
+
+    def record_check(self, healthy: bool):
+        """Record a health check, which does not count as a request"""
+        with self._lock:
+            self.healthy = healthy
+            self.retry_at = 0.0 if healthy else time.monotonic() + config.LLM_HEALTH_INTERVAL
+
+    def available(self) -> bool:
+        """False while a recently failed provider is being skipped"""
+        return time.monotonic() >= self.retry_at
+
+    def median_latency(self) -> Optional[float]:
+        with self._lock:
+            return statistics.median(self.latencies) if self.latencies else None
+
+    def snapshot(self) -> Dict:
+        """Return the statistics as plain values"""
+        with self._lock:
+            latencies = sorted(self.latencies)
+            failures = self.outcomes.count(False)
+            return {
+                "healthy": self.healthy,
+                "requests": len(self.outcomes),
+                "error_rate": failures / len(self.outcomes) if self.outcomes else 0.0,
+                "latency_p50": latencies[len(latencies) // 2] if latencies else None,
+                "latency_p95": latencies[int(len(latencies) * 0.95)] if latencies else None,
+            }
+
+
+class Provider:
+    """Base class of the LLM backends"""
+
+    name = ""
+
+    def __init__(self):
+        self.stats = ProviderStats()
+
+    def choices(self) -> List[Tuple[str, str]]:
+        """Return (label shown in the settings, model name) for every model offered"""
+        return []
+
+    def default_model(self) -> Optional[str]:
+        choices = self.choices()
+        return choices[0][1] if choices else None
+
+    def is_configured(self) -> bool:
+        """False if the provider cannot be used yet (e.g. a missing API key)"""
+        return True
+
+    def health_check(self) -> bool:
+        """Check that the backend answers; may refresh the model list"""
+        return True
+
+    def count_tokens(self, text: str) -> int:
+        return estimate_tokens(text)
+
+    def options(self, temperature: Optional[float] = None, max_tokens: Optional[int] = None) -> Dict:
+        """Generation options sent with a request, besides the model and messages"""
+        return {}
+
+    def chat(self, messages: List[Dict], model: str, temperature: Optional[float] = None,
+             max_tokens: Optional[int] = None, metrics: Optional[Dict] = None,
+             fail_fast: bool = False) -> str:
+        """
+        Return the full reply
+
+        Args:
+            messages: Chat messages in {"role", "content"} form
+            model: Model name
+            temperature, max_tokens: Generation options; None uses the defaults
+            metrics: Optional dict that receives the token counts and
+                     timings the server reports (see llm_metrics.TIMINGS)
+            fail_fast: Send the request once with config.FAILOVER_CONNECT_TIMEOUT,
+                       for when another provider can take over
+        """
+        return "".join(self.stream(messages, model, temperature, max_tokens, metrics, fail_fast))
+
+    def stream(self, messages: List[Dict], model: str, temperature: Optional[float] = None,
+               max_tokens: Optional[int] = None, metrics: Optional[Dict] = None,
+               fail_fast: bool = False) -> Iterator[str]:
+        """Yield the reply in pieces as they arrive; arguments as for chat()"""
+        raise NotImplementedError
+
+    def warm_up(self, model: str, messages: List[Dict]):
+        """Prepare the model for the first request"""
+
+    def request_options(self, fail_fast: bool) -> Dict:
+        """Retry and timeout arguments for http_client.request"""
+        if fail_fast:
+            return {"retries": 0, "connect_timeout": config.FAILOVER_CONNECT_TIMEOUT}
+        return {}
+
+
+class OllamaProvider(Provider):
+    name = "ollama"
+
+    def __init__(self, api_url: str = config.OLLAMA_API_URL):
+        super().__init__()
+        self.api_url = api_url
+        self._models = None  # installed models from /api/tags, None until listed
+
+    def choices(self):
+        models = self._models if self._models is not None else config.AVAILABLE_MODELS
+        return [(model, model) for model in models]
+
+    def default_model(self):
+        models = [model for _, model in self.choices()]
+        if config.DEFAULT_LLM_MODEL in models or not models:
+            return config.DEFAULT_LLM_MODEL
+        return models[0]
+
+    def health_check(self):
+        """List the installed models; the names drop the default ":latest" tag"""
+        response = http_client.get(f"{self.api_url}/tags", timeout=config.CONNECT_TIMEOUT, retries=0)
+        self._check_response(response)
+        models = [model["name"] for model in response.json().get("models", [])]
+        self._models = [name[:-len(":latest")] if name.endswith(":latest") else name
+                        for name in sorted(models)]
+        return True
+
+    def options(self, temperature=None, max_tokens=None):
+        """
+        num_ctx is the same in every request: a different value makes Ollama
+        reload the model and drop its cached prefill.
+        """
+        return {
+            "temperature": config.LLM_TEMPERATURE if temperature is None else temperature,
+            "num_predict": 1024 if max_tokens is None else max_tokens,
+            "num_ctx": config.OLLAMA_NUM_CTX,
+        }
+
+    def chat(self, messages, model, temperature=None, max_tokens=None, metrics=None, fail_fast=False):
+        payload = {
+            "model": model,
+            "messages": messages,
+            "stream": False,
+            "keep_alive": config.OLLAMA_KEEP_ALIVE,
+            "options": self.options(temperature, max_tokens)
+        }
+
+        response = http_client.post(f"{self.api_url}/chat", json=payload, timeout=config.API_TIMEOUT,
+                                    **self.request_options(fail_fast))
+
+        self._check_response(response)
+        result = response.json()
+        if metrics is not None:
+            _ollama_metrics(result, metrics)
+        return result.get("message", {}).get("content", "")
+
+    def stream(self, messages, model, temperature=None, max_tokens=None, metrics=None, fail_fast=False):
+        """The API sends one JSON object per line; the last one carries the timings"""
+        payload = {
+            "model": model,
+            "messages": messages,
+            "stream": True,
+            "keep_alive": config.OLLAMA_KEEP_ALIVE,
+            "options": self.options(temperature, max_tokens)
+        }
+
+        with http_client.post(f"{self.api_url}/chat", json=payload, stream=True,
+                              timeout=config.API_TIMEOUT, **self.request_options(fail_fast)) as response:
+            self._check_response(response)
+
+            for line in response.iter_lines(chunk_size=None):
+                if not line:
+                    continue
+
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    raise Exception(f"API Error: {chunk['error']}")
+
+                delta = chunk.get("message", {}).get("content", "")
+                if delta:
+                    yield delta
+
+                if chunk.get("done"):
+                    if metrics is not None:
+                        _ollama_metrics(chunk, metrics)
+                    break
+
+    def warm_up(self, model, messages):
+        """Load the model and prefill the messages with a one-token request"""
+        self.chat(messages, model, max_tokens=1)
+
+    def _check_response(self, response):
+        """Raise an exception with the API error message on a failed request"""
+        if response.status_code == 200:
+            return
+
+        error_msg = f"API Error: Status code {response.status_code}"
+        try:
+            error_detail = response.json()
+            error_msg += f" - {error_detail.get('error', '')}"
+        except ValueError:
+            pass
+
+        raise Exception(error_msg)
+
+
+class OpenAIProvider(Provider):
+    """OpenAI or any server with the same chat completions API"""
+
+    name = "openai"
+
+    def __init__(self, api_url: str = config.OPENAI_API_URL, api_key: str = config.OPENAI_API_KEY,
+                 model: str = config.OPENAI_MODEL):
+        super().__init__()
+        self.api_url = api_url.rstrip("/")
+        self.api_key = api_key
+        self.model = model
+        self._count_tokens = get_tokenizer("openai")
+
+    def choices(self):
+        # "openai" is also what LLM_MODEL in .env has always used
+        return [("openai", self.model)]
+
+    def is_configured(self):
+        # Self-hosted compatible servers usually need no key
+        return bool(self.api_key) or "api.openai.com" not in self.api_url
+
+    def health_check(self):
+        if not self.is_configured():
+            return False
+        response = http_client.get(f"{self.api_url}/models", headers=self._headers(),
+                                   timeout=config.CONNECT_TIMEOUT, retries=0)
+        self._check_response(response)
+        return True
+
+    def count_tokens(self, text):
+        return self._count_tokens(text)
+
+    def options(self, temperature=None, max_tokens=None):
+        return {"max_tokens": 1000 if max_tokens is None else max_tokens}
+
+    def chat(self, messages, model, temperature=None, max_tokens=None, metrics=None, fail_fast=False):
+        payload = self._payload(messages, model, temperature, max_tokens)
+
+        response = http_client.post(f"{self.api_url}/chat/completions", headers=self._headers(),
+                                    json=payload, timeout=config.API_TIMEOUT,
+                                    **self.request_options(fail_fast))
+
+        self._check_response(response)
+        result = response.json()
+        if metrics is not None:
+            _openai_metrics(result, metrics)
+        return result["choices"][0]["message"]["content"]
+
+    def stream(self, messages, model, temperature=None, max_tokens=None, metrics=None, fail_fast=False):
+        """The API sends server-sent events; the token usage comes in a last event without choices"""
+        payload = self._payload(messages, model, temperature, max_tokens)
+        payload["stream"] = True
+        payload["stream_options"] = {"include_usage": True}
+
+        with http_client.post(f"{self.api_url}/chat/completions", headers=self._headers(),
+                              json=payload, stream=True, timeout=config.API_TIMEOUT,
+                              **self.request_options(fail_fast)) as response:
+            self._check_response(response)
+
+            for line in response.iter_lines(chunk_size=None):
+                # Events look like "data: {...}"; blank lines and comments separate them
+                if not line.startswith(b"data:"):
+                    continue
+
+                data = line[len(b"data:"):].strip()
+                if data == b"[DONE]":
+                    break
+
+                event = json.loads(data)
+                if metrics is not None:
+                    _openai_metrics(event, metrics)
+
+                choices = event.get("choices") or [{}]
+                delta = choices[0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+
+    def _payload(self, messages, model, temperature, max_tokens):
+        payload = {
+            "model": model,
+            "messages": messages,
+            "temperature": config.LLM_TEMPERATURE if temperature is None else temperature,
+        }
+        payload.update(self.options(temperature, max_tokens))
+        return payload
+
+    def _headers(self):
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
+
+    def _check_response(self, response):
+        """Raise an exception with the API error message on a failed request"""
+        if response.status_code == 200:
+            return
+
+        error_msg = f"OpenAI API Error: Status code {response.status_code}"
+        try:
+            error_detail = response.json()
+            error_msg += f" - {error_detail.get('error', {}).get('message', '')}"
+        except ValueError:
+            pass
+
+        raise Exception(error_msg)
+
+
+class StubProvider(Provider):
+    """Offline provider that repeats the user's message, for tests and demos"""
+
+    name = "stub"
+
+    def __init__(self, delay: float = 0.0):
+        """
+        Args:
+            delay: Seconds to wait before each word of the reply
+        """
+        super().__init__()
+        self.delay = delay
+
+    def choices(self):
+        return [("stub", "stub")]
+
+    def stream(self, messages, model, temperature=None, max_tokens=None, metrics=None, fail_fast=False):
+        question = next((msg["content"] for msg in reversed(messages) if msg["role"] == "user"), "")
+        for i, word in enumerate(f"Тестов отговор: {question}".split(" ")):
+            if self.delay:
+                time.sleep(self.delay)
+            yield word if i == 0 else " " + word
+
+
+class ProviderRegistry:
+    def __init__(self, providers: List[Provider], failover: Optional[List[str]] = None):
+        """
+        Args:
+            providers: Available providers, in the order their models are listed
+            failover: Names of the providers tried when the selected one
+                      fails; defaults to all of them
+        """
+        self.providers = OrderedDict((provider.name, provider) for provider in providers)
+        self.failover = failover if failover is not None else list(self.providers)
+
+    @classmethod
+    def from_config(cls) -> "ProviderRegistry":
+        """Create the registry described by config.py"""
+        providers = [OllamaProvider(), OpenAIProvider()]
+        if config.LLM_STUB_ENABLED:
+            providers.append(StubProvider())
+        return cls(providers, config.LLM_FAILOVER)
+
+    def get(self, name: str) -> Optional[Provider]:
+        return self.providers.get(name)
+
+    def model_choices(self) -> List[str]:
+        """Labels for the model dropdown, from the last known model lists"""
+        return [label for provider in self.providers.values() for label, _ in provider.choices()]
+
+    def resolve(self, choice: str) -> Tuple[Provider, str]:
+        """
+        Find the provider and model behind a dropdown label
+
+        Unknown labels are taken as Ollama model names, so an LLM_MODEL
+        that is not installed (yet) still goes to Ollama.
+        """
+        for provider in self.providers.values():
+            for label, model in provider.choices():
+                if label == choice:
+                    return provider, model
+        return self.providers.get("ollama", next(iter(self.providers.values()))), choice
+
+    def candidates(self, choice: str) -> List[Tuple[Provider, str]]:
+        """
+        Providers to try for a request, in order
+
+        The selected provider comes first, then the failover providers
+        that are configured, ordered by their median latency. Providers
+        that failed recently go last.
+        """
+        primary, model = self.resolve(choice)
+        fallbacks = [self.providers[name] for name in self.failover
+                     if name in self.providers and name != primary.name
+                     and self.providers[name].is_configured()
+                     and self.providers[name].default_model()]
+        fallbacks.sort(key=lambda provider: provider.stats.median_latency() or float("inf"))
+
+        routes = [(primary, model)] + [(provider, provider.default_model()) for provider in fallbacks]
+        return sorted(routes, key=lambda route: not route[0].stats.available())
+
+    def stream(self, choice: str, messages: List[Dict], temperature: Optional[float] = None,
+               max_tokens: Optional[int] = None,
+               metrics: Optional[Dict] = None) -> Iterator[Tuple[Provider, str]]:
+        """
+        Stream a reply, failing over to the next provider if one fails before answering
+
+        Args:
+            metrics: Optional dict that receives the provider and model that
+                     answered, the number of failovers and the server's
+                     token counts and timings
+
+        Yields:
+            (provider that answers, piece of the reply)
+        """
+        last_error = None
+        routes = self.candidates(choice)
+        for failovers, (provider, model) in enumerate(routes):
+            if metrics is not None:
+                metrics.update(provider=provider.name, model=model, failovers=failovers)
+            start = time.monotonic()
+            answered = False
+            # Only the last provider retries; the others hand over to the next one at once
+            fail_fast = failovers < len(routes) - 1
+            try:
+                for delta in provider.stream(messages, model, temperature, max_tokens, metrics, fail_fast):
+                    if not answered:
+                        answered = True
+                        provider.stats.record_success(time.monotonic() - start)
+                    yield provider, delta
+
+                if not answered:
+                    provider.stats.record_success(time.monotonic() - start)
+                return
+            except Exception as e:
+                provider.stats.record_failure()
+                if answered:
+                    # Part of the reply is already shown; another model cannot continue it
+                    raise
+                logger.warning(f"Error calling {provider.name}: {str(e)}")
+                last_error = e
+
+        raise last_error or Exception("No LLM provider available")
+
+    def chat(self, choice: str, messages: List[Dict], temperature: Optional[float] = None,
+             max_tokens: Optional[int] = None,
+             metrics: Optional[Dict] = None) -> Tuple[Provider, str]:
+        """Like stream(), returning (provider that answered, full reply)"""
+        last_error = None
+        routes = self.candidates(choice)
+        for failovers, (provider, model) in enumerate(routes):
+            if metrics is not None:
+                metrics.update(provider=provider.name, model=model, failovers=failovers)
+            start = time.monotonic()
+            fail_fast = failovers < len(routes) - 1
+            try:
+                reply = provider.chat(messages, model, temperature, max_tokens, metrics, fail_fast)
+            except Exception as e:
+                provider.stats.record_failure()
+                logger.warning(f"Error calling {provider.name}: {str(e)}")
+                last_error = e
+                continue
+
+            provider.stats.record_success(time.monotonic() - start)
+            return provider, reply
+
+        raise last_error or Exception("No LLM provider available")
+
+    def check_health(self) -> Dict[str, bool]:
+        """Check every configured provider and refresh the model lists (blocking)"""
+        results = {}
+        for name, provider in self.providers.items():
+            if not provider.is_configured():
+                continue
+
+            try:
+                healthy = provider.health_check()
+            except Exception as e:
+                logger.warning(f"Error checking {name}: {str(e)}")
+                healthy = False
+
+            provider.stats.record_check(healthy)
+            results[name] = healthy
+        return results
+
+    def stats(self) -> Dict[str, Dict]:
+        """Statistics of every provider, keyed by name"""
+        return {name: provider.stats.snapshot() for name, provider in self.providers.items()}
+
+
+def _ollama_metrics(result: Dict, metrics: Dict):
+    """Copy the token counts and timings (in nanoseconds) of a finished Ollama reply"""
+    metrics["prompt_tokens"] = result.get("prompt_eval_count")
+    metrics["completion_tokens"] = result.get("eval_count")
+    for key, field in (("load_time", "load_duration"), ("prompt_time", "prompt_eval_duration"),
+                       ("generation_time", "eval_duration"), ("server_time", "total_duration")):
+        if result.get(field) is not None:
+            metrics[key] = result[field] / 1e9
+
+
+def _openai_metrics(result: Dict, metrics: Dict):
+    """Copy the token usage of an OpenAI reply, if it has one"""
+    usage = result.get("usage")
+    if usage:
+        metrics["prompt_tokens"] = usage.get("prompt_tokens")
+        metrics["completion_tokens"] = usage.get("completion_tokens")
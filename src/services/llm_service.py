@@ -1,167 +1,482 @@
 import os
-import json
-import requests
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
+import config
+from src.services.context_builder import ContextBuilder
+from src.services.llm_metrics import MetricsRecorder
+from src.services.llm_providers import ProviderRegistry
+from src.utils.logger import setup_logger
+from src.services.response_cache import ResponseCache, make_key
+
 # Load environment variables
 load_dotenv()
 
+logger = setup_logger()
+
+# Sent first and unchanged in every chat request, so Ollama can reuse its prefill
+SYSTEM_PROMPT = "Ти си полезен български асистент."
+
+SUMMARY_INTRO = "Резюме на по-ранната част от разговора:"
+
+SUMMARY_SYSTEM_PROMPT = (
+    "Обобщи разговора между потребителя и асистента кратко и на български. "
+    "Запази фактите, решенията, имената и отворените въпроси."
+)
+
+RETRIEVAL_INTRO = "Записи на потребителя, които може да са свързани със съобщението:"
+
+class LLMRequest:
+    """A queued chat request; cancel() stops it whether it is waiting or running"""
+    
+    def __init__(self, user_message, chat_history, on_delta, on_done):
+        self.user_message = user_message
+        self.chat_history = chat_history
+        self.on_delta = on_delta
+        self.on_done = on_done
+        self.cancelled = False
+        self.submitted_at = time.perf_counter()
+        self._cancel_event = None  # Created on the event loop when queued
+        self._loop = None
+    
+    def cancel(self):
+        """Cancel the request (safe to call from any thread)"""
+        self.cancelled = True
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._cancel_event.set)
+
+
 class LLMService:
-    def __init__(self):
-        self.api_url = os.getenv("OLLAMA_API_URL", "http://localhost:11434/api")
-        self.model = os.getenv("LLM_MODEL", "llama3.2")
-        self.openai_api_key = os.getenv("OPENAI_API_KEY", "")
+    def __init__(self, summary_store=None, index=None, registry=None):
+        self.model = os.getenv("LLM_MODEL", "llama3.2")  # label from registry.model_choices()
+        
+        # Backends the requests are routed to, with failover between them
+        self.registry = registry or ProviderRegistry.from_config()
+        
+        # Prompt builders per provider; each keeps token counts of the messages it has seen
+        self._contexts = {}
+        
+        # Timings and token counts of the recent calls, for the diagnostics
+        self.metrics = MetricsRecorder()
+        
+        # Optional rolling summary of the turns that no longer fit the prompt
+        self.summary_store = summary_store
+        self.summarize = config.LLM_SUMMARY_ENABLED and summary_store is not None
+        self._pending_summary = None
+        
+        # Optional semantic index of the user's notes, todos and events
+        self.index = index
+        self._index_failed = False
+        
+        # Cache of complete replies to repeated prompts (see config.LLM_CACHE_MODE)
+        self.cache = None
+        if config.LLM_CACHE_MODE != "off":
+            self.cache = ResponseCache(config.LLM_CACHE_PATH, config.LLM_CACHE_MAX_ENTRIES,
+                                       config.LLM_CACHE_TTL)
+        
+        # Background event loop that runs queued requests one at a time
+        self._loop = None
+        self._queue = None
+        self._executor = None
+        self._loop_lock = threading.Lock()
     
-    def get_response(self, user_message, chat_history=None):
+    def submit(self, user_message, chat_history=None, on_delta=None, on_done=None):
         """
-        Get a response from the LLM model via Ollama or OpenAI API
+        Queue a chat request behind the ones already waiting
+        
+        Requests are generated one at a time in the order they were
+        submitted, so replies never overlap or arrive out of order. The
+        callbacks run on the service's event loop thread; UI code has to
+        hand their results over to the Tk thread.
+        
+        Args:
+            user_message: The user's message
+            chat_history: Optional chat history for context, read when the request starts
+            on_delta: Called with each piece of the response as it arrives
+            on_done: Called once with (full_text, cancelled) when the request ends
+            
+        Returns:
+            An LLMRequest that can be cancelled, or None if the queue is full
+        """
+        loop = self._ensure_loop()
+        request = LLMRequest(user_message, chat_history,
+                             on_delta or (lambda delta: None),
+                             on_done or (lambda text, cancelled: None))
+        request._loop = loop
+        
+        accepted = asyncio.run_coroutine_threadsafe(self._enqueue(request), loop)
+        return request if accepted.result() else None
+    
+    def close(self):
+        """Stop the background event loop"""
+        with self._loop_lock:
+            if self._loop is None:
+                return
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._executor.shutdown(wait=False)
+            self._loop = None
+    
+    def _ensure_loop(self):
+        """Start the background event loop on first use"""
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                # A single thread does the blocking HTTP reads, so only one
+                # generation ever runs against the server at a time
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm-io")
+                threading.Thread(target=self._run_loop, args=(self._loop,), daemon=True).start()
+            return self._loop
+    
+    def _run_loop(self, loop):
+        asyncio.set_event_loop(loop)
+        self._queue = asyncio.Queue(maxsize=config.LLM_QUEUE_SIZE)
+        task = loop.create_task(self._process_requests(self._queue))
+        loop.run_forever()
+        
+        # Stopped by close()
+        task.cancel()
+        loop.run_until_complete(asyncio.gather(task, return_exceptions=True))
+        loop.close()
+    
+    async def _enqueue(self, request):
+        request._cancel_event = asyncio.Event()
+        if request.cancelled:
+            request._cancel_event.set()
+        try:
+            self._queue.put_nowait(request)
+            return True
+        except asyncio.QueueFull:
+            return False
+    
+    async def _process_requests(self, queue):
+        """Run the queued requests one after another and background work in between"""
+        loop = asyncio.get_running_loop()
+        while True:
+            # Background work runs in small steps while no request is waiting
+            if queue.empty():
+                job = self._next_background_job()
+                if job is not None:
+                    await loop.run_in_executor(self._executor, job)
+                    continue
+            
+            request = await queue.get()
+            text = ""
+            try:
+                if not request.cancelled:
+                    text = await self._run_request(request)
+            except Exception as e:
+                logger.error(f"Error calling LLM: {str(e)}")
+            finally:
+                request.on_done(text, request.cancelled)
+    
+    def _next_background_job(self):
+        """Return the next step of idle-time work, or None if there is nothing to do"""
+        if self._pending_summary is not None:
+            # Fold older turns into the summary
+            pending, self._pending_summary = self._pending_summary, None
+            return lambda: self._update_summary(*pending)
+        
+        if self.index is not None and not self._index_failed and self.index.pending():
+            return self._sync_index
+        return None
+    
+    def _sync_index(self):
+        """Embed the next batch of changed records"""
+        try:
+            self.index.sync(config.RAG_SYNC_BATCH)
+        except Exception as e:
+            logger.warning(f"Error indexing records: {str(e)}")
+            # Tried again with the next message instead of over and over
+            self._index_failed = True
+    
+    async def _run_request(self, request):
+        """Stream one response, stopping as soon as the request is cancelled"""
+        loop = asyncio.get_running_loop()
+        pieces = []
+        metrics = {"queue_wait": time.perf_counter() - request.submitted_at}
+        stream = self.stream_response(request.user_message, request.chat_history, metrics)
+        cancelled = asyncio.ensure_future(request._cancel_event.wait())
+        
+        try:
+            while True:
+                next_piece = loop.run_in_executor(self._executor, next, stream, None)
+                await asyncio.wait({next_piece, cancelled}, return_when=asyncio.FIRST_COMPLETED)
+                if cancelled.done():
+                    break
+                
+                delta = next_piece.result()
+                if delta is None:
+                    break
+                
+                pieces.append(delta)
+                request.on_delta(delta)
+        finally:
+            cancelled.cancel()
+            # Closing the generator closes the HTTP response, which stops the
+            # generation on the server; it runs after any read still in progress
+            loop.run_in_executor(self._executor, stream.close)
+        
+        return "".join(pieces)
+    
+    def get_response(self, user_message, chat_history=None, metrics=None):
+        """
+        Get a response from the selected model, failing over to another provider if needed
         
         Args:
             user_message: The user's message
             chat_history: Optional chat history for context
+            metrics: Optional measurements taken before the call (e.g.
+                     queue_wait); completed and added to self.metrics
             
         Returns:
             The model's response
         """
+        call = metrics if metrics is not None else {}
+        start = time.perf_counter()
         try:
-            if self.model == "openai":
-                # Use OpenAI API
-                if not self.openai_api_key:
-                    return "OpenAI API ключ не е намерен. Моля, добавете го в настройките."
-                
-                messages = self._format_messages_openai(user_message, chat_history)
-                response = self._call_openai_api(messages)
-            else:
-                # Use Ollama API
-                messages = self._format_messages_ollama(user_message, chat_history)
-                response = self._call_ollama_api(messages)
+            provider, model = self.registry.resolve(self.model)
+            if not provider.is_configured():
+                return "OpenAI API ключ не е намерен. Моля, добавете го в настройките."
+            
+            messages = self._build_messages(user_message, chat_history, provider)
+            call["prepare_time"] = time.perf_counter() - start
+            
+            cache_key = self._cache_key(provider, model, messages)
+            if cache_key is not None:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    call.update(provider=provider.name, model=model, cached=True)
+                    return cached
+            
+            answered_by, response = self.registry.chat(self.model, messages, metrics=call)
+            
+            # A failover reply is not stored as the selected model's answer
+            if cache_key is not None and response and answered_by is provider:
+                self.cache.put(cache_key, response)
             
             return response
         
         except Exception as e:
-            print(f"Error calling LLM: {str(e)}")
+            call["error"] = str(e)
             return f"Извинявам се, но възникна грешка при комуникацията с езиковия модел. Моля, опитайте отново по-късно. Грешка: {str(e)}"
+        
+        finally:
+            call["total"] = time.perf_counter() - start
+            self.metrics.record(call)
     
-    def _format_messages_ollama(self, user_message, chat_history=None):
-        """Format the message history for Ollama API"""
-        messages = []
+    def stream_response(self, user_message, chat_history=None, metrics=None):
+        """
+        Stream a response from the selected model, failing over to another provider if needed
         
-        # If chat history is provided, include relevant context
-        if chat_history:
-            # Only include the last few messages to avoid token limits
-            recent_history = chat_history[-5:] if len(chat_history) > 5 else chat_history
+        Args:
+            user_message: The user's message
+            chat_history: Optional chat history for context
+            metrics: Optional measurements taken before the call (e.g.
+                     queue_wait); completed and added to self.metrics
             
-            for msg in recent_history:
-                role = msg.get("role", "user")
-                content = msg.get("content", "")
-                
-                # Skip empty messages
-                if not content.strip():
-                    continue
-                
-                # Map roles to Ollama format
-                if role == "user":
-                    messages.append({"role": "user", "content": content})
-                elif role == "assistant":
-                    messages.append({"role": "assistant", "content": content})
+        Yields:
+            Pieces of the model's response as they arrive
+        """
+        call = metrics if metrics is not None else {}
+        start = time.perf_counter()
+        finished = False
+        try:
+            provider, model = self.registry.resolve(self.model)
+            if not provider.is_configured():
+                yield "OpenAI API ключ не е намерен. Моля, добавете го в настройките."
+                finished = True
+                return
+            
+            messages = self._build_messages(user_message, chat_history, provider)
+            call["prepare_time"] = time.perf_counter() - start
+            
+            cache_key = self._cache_key(provider, model, messages)
+            if cache_key is not None:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    call.update(provider=provider.name, model=model, cached=True,
+                                first_token=time.perf_counter() - start)
+                    yield cached
+                    finished = True
+                    return
+            
+            pieces = []
+            answered_by = provider
+            for answered_by, delta in self.registry.stream(self.model, messages, metrics=call):
+                if not pieces:
+                    call["first_token"] = time.perf_counter() - start
+                pieces.append(delta)
+                yield delta
+            finished = True
+            
+            # Only complete replies of the selected model are cached; a
+            # cancelled stream never gets here
+            if cache_key is not None and pieces and answered_by is provider:
+                self.cache.put(cache_key, "".join(pieces))
         
-        # Add the current message
-        messages.append({"role": "user", "content": user_message})
+        except Exception as e:
+            call["error"] = str(e)
+            finished = True
+            yield f"Извинявам се, но възникна грешка при комуникацията с езиковия модел. Моля, опитайте отново по-късно. Грешка: {str(e)}"
         
-        return messages
+        finally:
+            # Also runs when the stream is closed early (cancelled)
+            call["total"] = time.perf_counter() - start
+            call["cancelled"] = not finished
+            self.metrics.record(call)
     
-    def _format_messages_openai(self, user_message, chat_history=None):
-        """Format the message history for OpenAI API"""
-        messages = []
+    def _cache_key(self, provider, model, messages):
+        """Return the response cache key for a chat request, or None if it is not cacheable"""
+        if self.cache is None:
+            return None
+        if config.LLM_CACHE_MODE == "deterministic" and config.LLM_TEMPERATURE != 0:
+            return None
         
-        # System message
-        messages.append({"role": "system", "content": "Ти си полезен български асистент."})
+        return make_key(model, messages, config.LLM_TEMPERATURE, provider.options())
+    
+    def cache_stats(self):
+        """Return the response cache hit/miss counters, or None when the cache is off"""
+        return self.cache.stats() if self.cache is not None else None
+    
+    def _context_for(self, provider):
+        """Return the prompt builder that counts tokens the way the provider does"""
+        builder = self._contexts.get(provider.name)
+        if builder is None:
+            builder = ContextBuilder(config.LLM_CONTEXT_TOKENS, provider.count_tokens)
+            self._contexts[provider.name] = builder
+        return builder
+    
+    def _build_messages(self, user_message, chat_history, provider):
+        """Build the request messages within the configured token budget"""
+        builder = self._context_for(provider)
+        reference = self._retrieve(user_message, builder)
         
-        # If chat history is provided, include relevant context
-        if chat_history:
-            # Only include the last few messages to avoid token limits
-            recent_history = chat_history[-5:] if len(chat_history) > 5 else chat_history
-            
-            for msg in recent_history:
-                role = msg.get("role", "user")
-                content = msg.get("content", "")
-                
-                # Skip empty messages
-                if not content.strip():
-                    continue
-                
-                # Add messages with appropriate roles
-                if role in ["user", "assistant"]:
-                    messages.append({"role": role, "content": content})
-        
-        # Add the current message
-        messages.append({"role": "user", "content": user_message})
-        
-        return messages
-    
-    def _call_ollama_api(self, messages):
-        """Call the Ollama API with the formatted messages"""
-        url = f"{self.api_url}/chat"
-        
-        payload = {
-            "model": self.model,
-            "messages": messages,
-            "stream": False,
-            "options": {
-                "temperature": 0.7,
-                "num_predict": 1024,
-            }
-        }
-        
-        response = requests.post(url, json=payload, timeout=30)
-        
-        if response.status_code == 200:
-            result = response.json()
-            return result.get("message", {}).get("content", "")
-        else:
-            # Handle error
-            error_msg = f"API Error: Status code {response.status_code}"
-            try:
-                error_detail = response.json()
-                error_msg += f" - {error_detail.get('error', '')}"
-            except:
-                pass
-            
-            raise Exception(error_msg)
-    
-    def _call_openai_api(self, messages):
-        """Call the OpenAI API with the formatted messages"""
-        url = "https://api.openai.com/v1/chat/completions"
-        
-        headers = {
-            "Authorization": f"Bearer {self.openai_api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "model": "gpt-3.5-turbo",
-            "messages": messages,
-            "temperature": 0.7,
-            "max_tokens": 1000
-        }
-        
-        response = requests.post(url, headers=headers, json=payload, timeout=30)
-        
-        if response.status_code == 200:
-            result = response.json()
-            return result["choices"][0]["message"]["content"]
-        else:
-            # Handle error
-            error_msg = f"OpenAI API Error: Status code {response.status_code}"
-            try:
-                error_detail = response.json()
-                error_msg += f" - {error_detail.get('error', {}).get('message', '')}"
-            except:
-                pass
+        if not self.summarize:
+            return builder.build(user_message, chat_history, SYSTEM_PROMPT, reference=reference)
+        
+        # Messages already folded into the summary are replaced by it
+        covered_until, summary, summary_prompt = 0, None, None
+        cached = self.summary_store.get_summary()
+        if cached:
+            covered_until, summary = cached["covered_until"], cached["summary"]
+            summary_prompt = f"{SUMMARY_INTRO}\n{summary}"
+        
+        recent = [msg for msg in chat_history or []
+                  if msg.get("id") is None or msg["id"] > covered_until]
+        
+        # Turns that no longer fit are summarized in the background
+        older, _ = builder.split_history(user_message, recent, SYSTEM_PROMPT, summary_prompt, reference)
+        older = [msg for msg in older if msg.get("id") is not None]
+        if older:
+            self._pending_summary = (summary, older)
+        
+        return builder.build(user_message, recent, SYSTEM_PROMPT, summary_prompt, reference)
+    
+    def _retrieve(self, user_message, builder):
+        """
+        Find the user's records related to the message
+        
+        Returns:
+            A system message with the best matching chunks that fit
+            config.RAG_CONTEXT_TOKENS, or None
+        """
+        if self.index is None:
+            return None
+        
+        # A failed background sync is tried again once the reply is done;
+        # records not indexed yet are simply not found this time
+        self._index_failed = False
+        try:
+            matches = self.index.search(user_message)
+        except Exception as e:
+            logger.warning(f"Error searching records: {str(e)}")
+            self._index_failed = True
+            return None
+        
+        chunks = []
+        budget = config.RAG_CONTEXT_TOKENS - builder.message_tokens(RETRIEVAL_INTRO)
+        for match in matches:
+            budget -= builder.count_tokens(match["content"]) + 1
+            if budget < 0:
+                break
+            chunks.append(match["content"])
+        
+        if not chunks:
+            return None
+        return RETRIEVAL_INTRO + "\n\n" + "\n\n".join(chunks)
+    
+    def _update_summary(self, summary, older):
+        """Fold the oldest messages that fit one request into the summary"""
+        # Summaries stay on the local model
+        provider, model = self.registry.resolve(self.model)
+        if provider.name != "ollama":
+            provider, model = self.registry.resolve(config.DEFAULT_LLM_MODEL)
+        if provider.name != "ollama":
+            return
+        builder = self._context_for(provider)
+        
+        # Oldest first, as many messages as the context budget allows
+        budget = config.LLM_CONTEXT_TOKENS - builder.message_tokens(summary or "")
+        chunk = []
+        for msg in older:
+            budget -= builder.message_tokens(msg["content"])
+            if budget < 0 and chunk:
+                break
+            chunk.append(msg)
+        
+        transcript = "\n".join(
+            f"{'Потребител' if msg['role'] == 'user' else 'Асистент'}: {msg['content']}"
+            for msg in chunk
+        )
+        prompt = f"Досегашно резюме:\n{summary}\n\nНови съобщения:\n{transcript}" if summary else transcript
+        
+        try:
+            new_summary = provider.chat(
+                [
+                    {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                model,
+                temperature=0.2,
+                max_tokens=config.LLM_SUMMARY_TOKENS
+            ).strip()
+            if not new_summary:
+                return
             
-            raise Exception(error_msg)
+            if not self.summary_store.save_summary(chunk[-1]["id"], new_summary):
+                return
+        except Exception as e:
+            logger.warning(f"Error summarizing chat: {str(e)}")
+            return
+        
+        # Continue with the rest on the next idle moment
+        if len(chunk) < len(older):
+            self._pending_summary = (new_summary, older[len(chunk):])
+    
+    def warm_up(self):
+        """
+        Load the selected model in the background
+        
+        Runs on the request I/O thread, so a message sent right away simply
+        waits for the load instead of starting a second one.
+        """
+        # Starting the loop also starts indexing changed records
+        self._ensure_loop()
+        provider, model = self.registry.resolve(self.model)
+        self._executor.submit(self._preload_model, provider, model)
+    
+    def _preload_model(self, provider, model):
+        """Load the model and prefill the system prompt"""
+        try:
+            provider.warm_up(model, [{"role": "system", "content": SYSTEM_PROMPT}])
+        except Exception as e:
+            logger.warning(f"Error loading model {model}: {str(e)}")
     
     def change_model(self, model_name):
-        """Change the LLM model"""
+        """Change the LLM model (a label from registry.model_choices())"""
         self.model = model_name
-        return True 
\ No newline at end of file
+        self.warm_up()
+        return True
\ No newline at end of file
@@ -0,0 +1,125 @@
+"""
+On-disk cache of LLM responses for repeated prompts.
+
+Entries are keyed by a hash of the model, the normalized messages and the
+generation settings, expire after a TTL and are evicted least recently
+used first once the cache holds more than its maximum number of entries.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+def make_key(model: str, messages: List[Dict], temperature: float, options: Optional[Dict] = None) -> str:
+    """
+    Hash a request into a cache key.
+
+    Message text is compared case-insensitively and with runs of whitespace
+    collapsed, so "Какво е времето?" and "какво е  времето? " share a key.
+    """
+    normalized = [
+        {
+            "role": msg.get("role", "user"),
+            "content": re.sub(r"\s+", " ", msg.get("content", "")).strip().casefold()
+        }
+        for msg in messages
+    ]
+    payload = json.dumps(
+        {"model": model, "messages": normalized, "temperature": temperature, "options": options or {}},
+        sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, db_path: str, max_entries: int = 1000, ttl: float = 24 * 3600):
+        """
+        Args:
+            db_path: SQLite file holding the cache
+            max_entries: Maximum number of cached responses
+            ttl: Seconds after which a response is no longer used
+        """
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # One connection shared by the LLM threads; the cache does tiny queries only
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used)"
+            )
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for a key, or None on a miss."""
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT response FROM responses WHERE key=? AND created_at > ?",
+                (key, now - self.ttl)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE responses SET last_used=? WHERE key=?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, response: str):
+        """Store a response and evict expired and least recently used entries."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                (key, response, now, now)
+            )
+            self._conn.execute("DELETE FROM responses WHERE created_at <= ?", (now - self.ttl,))
+            self._conn.execute(
+                """
+                DELETE FROM responses WHERE key IN (
+                    SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,)
+            )
+
+    def clear(self):
+        """Remove every cached response."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses")
+
+    def stats(self) -> Dict:
+        """Return hit and miss counts of this session and the number of cached responses."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,287 @@
+"""
+Semantic index of the user's notes, todos and events for the chat (local RAG).
+
+Records are split into chunks and embedded through Ollama's embeddings
+endpoint. The unit-length vectors are kept in a float32 matrix in a
+memory-mapped .npy file, one row per chunk, so the index opens without
+loading anything and a search is one matrix-vector product. Chunk texts and
+their rows live in SQLite, where triggers queue every record whose text
+changes; sync() embeds only the queued records.
+"""
+
+import os
+import re
+import threading
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+import config
+from src.database.db_manager import DatabaseManager
+from src.services import http_client
+
+# Characters per chunk and characters repeated at the start of the next one
+CHUNK_CHARS = 400
+CHUNK_OVERLAP = 80
+
+# Rows the vector file starts with; it doubles whenever it is full
+INITIAL_CAPACITY = 1024
+
+PRIORITY_NAMES = {"high": "висок", "medium": "среден", "low": "нисък"}
+
+
+def embed_texts(texts: List[str], model: str = config.EMBEDDING_MODEL) -> np.ndarray:
+    """
+    Embed texts with Ollama.
+
+    Returns:
+        float32 matrix with one unit-length row per text
+    """
+    response = http_client.post(
+        f"{config.OLLAMA_API_URL}/embed",
+        json={"model": model, "input": texts, "keep_alive": config.OLLAMA_KEEP_ALIVE},
+        timeout=config.API_TIMEOUT
+    )
+    if response.status_code != 200:
+        error_msg = f"Embedding API Error: Status code {response.status_code}"
+        try:
+            error_msg += f" - {response.json().get('error', '')}"
+        except ValueError:
+            pass
+        raise Exception(error_msg)
+
+    return normalize(np.asarray(response.json()["embeddings"], dtype=np.float32))
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale the rows to unit length, so a dot product is their cosine similarity."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return (vectors / norms).astype(np.float32, copy=False)
+
+
+def split_text(text: str, size: int = CHUNK_CHARS, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """Split text into chunks of at most size characters, breaking between words."""
+    text = text.strip()
+    chunks = []
+    start = 0
+    while len(text) - start > size:
+        end = start + size
+        cut = max(text.rfind(" ", start + overlap + 1, end), text.rfind("\n", start + overlap + 1, end))
+        if cut == -1:
+            cut = end
+        chunks.append(text[start:cut].strip())
+
+        # Start the next chunk at a word boundary about overlap characters back
+        start = cut - overlap
+        space = text.find(" ", start, cut)
+        if space != -1:
+            start = space + 1
+
+    if text[start:].strip():
+        chunks.append(text[start:].strip())
+    return chunks
+
+
+def record_chunks(source: str, record: Dict) -> List[str]:
+    """
+    Turn a note, todo or event into the texts that get embedded.
+
+    Every chunk starts with a line naming the record, so a chunk from the
+    middle of a long note still says which note it belongs to.
+    """
+    if source == "note":
+        header, body = f"Бележка: {record['title']}", record["content"] or ""
+    elif source == "todo":
+        details = [f"приоритет {PRIORITY_NAMES.get(str(record['priority']).lower(), record['priority'])}"]
+        if record["due_date"]:
+            details.append(f"срок {record['due_date']}")
+        details.append("изпълнена" if record["completed"] else "неизпълнена")
+        header, body = f"Задача ({', '.join(details)})", record["task"]
+    else:
+        when = f"{record['event_date']} {record['event_time'] or ''}".strip()
+        header, body = f"Събитие на {when}: {record['title']}", record["description"] or ""
+
+    return [f"{header}\n{chunk}" for chunk in split_text(body)] or [header]
+
+
+class SemanticIndex:
+    def __init__(self, db: DatabaseManager, model: str = config.EMBEDDING_MODEL,
+                 directory: str = config.EMBEDDINGS_DIR,
+                 embed: Optional[Callable[[List[str]], np.ndarray]] = None):
+        """
+        Args:
+            db: Database holding the records, chunk texts and change queue
+            model: Ollama embedding model
+            directory: Directory of the memory-mapped vector file
+            embed: Function returning unit-length vectors for a list of
+                   texts; defaults to embed_texts with the model
+        """
+        self.db = db
+        self.model = model
+        self.embed = embed or (lambda texts: embed_texts(texts, model))
+        self.path = os.path.join(directory, re.sub(r"[^\w.-]", "_", model) + ".npy")
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._vectors = None  # np.memmap of shape (capacity, dimensions)
+        self._used = np.zeros(0, dtype=bool)  # rows holding a chunk
+        self._count = 0  # rows up to the last one ever used; searches scan only these
+
+        # The chunks may point at the rows of another model's file, e.g. after
+        # switching models and back; only this model's file of this model's
+        # chunks can be reused
+        if os.path.exists(self.path) and self.db.get_embedding_model() == model:
+            self._vectors = np.lib.format.open_memmap(self.path, mode="r+")
+            rows = self.db.get_embedding_rows()
+            self._used = np.zeros(len(self._vectors), dtype=bool)
+            if rows and max(rows) >= len(self._vectors):
+                self._reset()
+            elif rows:
+                self._used[rows] = True
+                self._count = max(rows) + 1
+        else:
+            self._reset()
+
+    def pending(self) -> int:
+        """Return how many changed records are waiting to be embedded."""
+        return self.db.count_embedding_queue()
+
+    def sync(self, limit: int = 32) -> int:
+        """
+        Embed the records that changed since the last sync.
+
+        Args:
+            limit: Maximum number of queued records handled in this call
+
+        Returns:
+            Number of records handled
+        """
+        entries = self.db.get_embedding_queue(limit)
+        if not entries:
+            return 0
+
+        texts, counts = [], []
+        for entry in entries:
+            record = self.db.get_embedding_record(entry["source"], entry["record_id"])
+            chunks = record_chunks(entry["source"], record) if record is not None else []
+            texts.extend(chunks)
+            counts.append(len(chunks))
+
+        vectors = self.embed(texts) if texts else None
+
+        # New chunks go to free rows and the replaced ones are freed after the
+        # commit, so a crash in between never leaves a row with the wrong text
+        with self._lock:
+            rows = self._allocate(len(texts), vectors.shape[1] if vectors is not None else 0)
+            if rows:
+                self._vectors[rows] = vectors
+                self._vectors.flush()
+
+        updates, offset = [], 0
+        for entry, count in zip(entries, counts):
+            chunk_rows = rows[offset:offset + count]
+            updates.append((entry["id"], entry["source"], entry["record_id"],
+                            list(zip(chunk_rows, texts[offset:offset + count]))))
+            offset += count
+        freed = self.db.save_embedding_chunks(updates)
+
+        with self._lock:
+            if freed:
+                # Zero vectors score 0, below any useful match
+                self._vectors[freed] = 0
+                self._used[freed] = False
+                self._vectors.flush()
+        return len(entries)
+
+    def search(self, query: str, k: int = config.RAG_TOP_K,
+               min_score: float = config.RAG_MIN_SCORE) -> List[Dict]:
+        """
+        Find the chunks most similar to the query.
+
+        Returns:
+            Up to k dicts with source, record_id, content and score (cosine
+            similarity), best first
+        """
+        if self._count == 0:
+            return []
+        return self.search_vector(self.embed([query])[0], k, min_score)
+
+    def search_vector(self, query: np.ndarray, k: int = config.RAG_TOP_K,
+                      min_score: float = config.RAG_MIN_SCORE) -> List[Dict]:
+        """Like search(), with an already embedded unit-length query."""
+        with self._lock:
+            if self._count == 0:
+                return []
+            scores = self._vectors[:self._count] @ query
+
+        # Partial sort: only the k best rows get ordered
+        top = np.argpartition(scores, -k)[-k:] if len(scores) > k else np.arange(len(scores))
+        top = top[np.argsort(scores[top])[::-1]]
+        top = [int(row) for row in top if scores[row] >= min_score]
+
+        chunks = self.db.get_embedding_chunks(top)
+        return [dict(chunks[row], score=float(scores[row])) for row in top if row in chunks]
+
+    def close(self):
+        with self._lock:
+            self._close_vectors()
+            self._count = 0
+
+    def _allocate(self, count: int, dimensions: int) -> List[int]:
+        """Reserve count free rows, growing the vector file when needed."""
+        if count == 0:
+            return []
+
+        if self._vectors is None:
+            self._vectors = np.lib.format.open_memmap(
+                self.path, mode="w+", dtype=np.float32,
+                shape=(max(INITIAL_CAPACITY, count), dimensions)
+            )
+            self._used = np.zeros(len(self._vectors), dtype=bool)
+        elif self._vectors.shape[1] != dimensions:
+            raise ValueError(f"Embedding size changed from {self._vectors.shape[1]} to {dimensions}")
+
+        rows = np.flatnonzero(~self._used[:self._count])[:count].tolist()
+        rows.extend(range(self._count, self._count + count - len(rows)))
+        if rows[-1] >= len(self._vectors):
+            self._grow(rows[-1] + 1)
+
+        self._used[rows] = True
+        self._count = max(self._count, rows[-1] + 1)
+        return rows
+
+    def _grow(self, needed: int):
+        """Copy the vectors into a file with at least needed rows (doubling the capacity)."""
+        capacity = len(self._vectors)
+        while capacity < needed:
+            capacity *= 2
+
+        temp_path = self.path + ".tmp"
+        grown = np.lib.format.open_memmap(temp_path, mode="w+", dtype=np.float32,
+                                          shape=(capacity, self._vectors.shape[1]))
+        grown[:len(self._vectors)] = self._vectors
+        grown.flush()
+        del grown
+
+        # The old mapping has to be closed before the file can be replaced on Windows
+        self._close_vectors()
+        os.replace(temp_path, self.path)
+        self._vectors = np.lib.format.open_memmap(self.path, mode="r+")
+        self._used = np.concatenate([self._used, np.zeros(capacity - len(self._used), dtype=bool)])
+
+    def _reset(self):
+        """Start over with an empty vector file and every record queued."""
+        self._close_vectors()
+        for path in (self.path, self.path + ".tmp"):
+            if os.path.exists(path):
+                os.remove(path)
+        self.db.reset_embeddings(self.model)
+        self._used = np.zeros(0, dtype=bool)
+        self._count = 0
+
+    def _close_vectors(self):
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors._mmap.close()
+            self._vectors = None
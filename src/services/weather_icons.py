@@ -0,0 +1,130 @@
+"""
+Weather condition icons for the weather widget and dashboard.
+
+An icon is downloaded once per OpenWeather icon code ("01d", "10n", ...)
+into a directory on disk, which also serves it when offline. Each code is
+decoded once with Pillow and kept, together with the CTkImages made from
+it for every displayed size, in a least recently used cache of bounded
+size.
+"""
+
+import io
+import os
+import re
+import threading
+import tkinter
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+import customtkinter as ctk
+from PIL import Image
+
+import config
+from src.services import http_client
+from src.services.weather_service import WeatherService
+from src.utils.logger import setup_logger
+
+logger = setup_logger()
+
+ICON_URL = "https://openweathermap.org/img/wn/{code}@2x.png"
+
+# Icon codes are two digits and d/n; anything else never becomes a file name
+ICON_CODE = re.compile(r"^\d{2}[dn]$")
+
+
+def load_icon(code: str, directory: str = config.WEATHER_ICONS_DIR) -> Image.Image:
+    """
+    Return the decoded icon, downloading it only if it is not on disk yet.
+    Blocks, so it is meant for background threads.
+    """
+    if not ICON_CODE.match(code):
+        raise ValueError(f"Invalid icon code: {code!r}")
+
+    path = os.path.join(directory, f"{code}.png")
+    if not os.path.exists(path):
+        response = http_client.get(ICON_URL.format(code=code), timeout=config.WEATHER_TIMEOUT)
+        if response.status_code != 200:
+            raise Exception(f"Icon download failed: Status code {response.status_code}")
+
+        # Check that it decodes before it is cached; the rename makes the file appear complete
+        Image.open(io.BytesIO(response.content)).verify()
+        os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(response.content)
+        os.replace(temp_path, path)
+
+    with Image.open(path) as image:
+        return image.convert("RGBA")
+
+
+class IconCache:
+    def __init__(self, service: WeatherService, directory: str = config.WEATHER_ICONS_DIR,
+                 max_icons: int = config.WEATHER_ICON_CACHE_SIZE):
+        """
+        Used from the Tk main thread only; downloads and decoding run on the
+        worker pool of the weather service.
+
+        Args:
+            service: Weather service whose workers load the icons
+            directory: Directory of the downloaded icons
+            max_icons: Decoded icon codes kept in memory
+        """
+        self.service = service
+        self.directory = directory
+        self.max_icons = max_icons
+        # Icon code -> {"image": decoded PIL image, "sizes": {size: CTkImage}}
+        self._icons: "OrderedDict[str, dict]" = OrderedDict()
+
+    def get(self, code: str, size: int) -> Optional[ctk.CTkImage]:
+        """Return the icon if it is already decoded, else None."""
+        entry = self._icons.get(code)
+        if entry is None:
+            return None
+
+        self._icons.move_to_end(code)
+        image = entry["sizes"].get(size)
+        if image is None:
+            image = ctk.CTkImage(light_image=entry["image"], dark_image=entry["image"], size=(size, size))
+            entry["sizes"][size] = image
+        return image
+
+    def load(self, code: str, size: int, widget, on_ready: Callable[[ctk.CTkImage], None]):
+        """
+        Pass the icon to on_ready on the Tk main thread: at once if it is
+        decoded, otherwise after it is read from disk or downloaded.
+
+        Args:
+            widget: Widget whose after() hands the result to the main thread
+        """
+        image = self.get(code, size)
+        if image is not None:
+            on_ready(image)
+            return
+
+        future = self.service.submit(f"icon:{code}", lambda: load_icon(code, self.directory))
+
+        def loaded(done: Future):
+            try:
+                widget.after(0, lambda: self._store(code, size, done, on_ready))
+            except (RuntimeError, tkinter.TclError):
+                pass  # The widget was destroyed meanwhile
+
+        future.add_done_callback(loaded)
+
+    def _store(self, code: str, size: int, done: Future, on_ready: Callable[[ctk.CTkImage], None]):
+        if done.exception() is not None:
+            logger.warning(f"Error loading weather icon {code}: {done.exception()}")
+            return
+
+        # Several widgets may have waited for the same icon; the first stores it
+        if code not in self._icons:
+            self._icons[code] = {"image": done.result(), "sizes": {}}
+            while len(self._icons) > self.max_icons:
+                self._icons.popitem(last=False)
+
+        try:
+            on_ready(self.get(code, size))
+        except Exception as e:
+            logger.error(f"Error showing weather icon {code}: {e}")
@@ -0,0 +1,432 @@
+"""
+OpenWeather requests for the weather widget, off the Tk main thread.
+
+Location names are resolved to coordinates once through the geocoding API
+and kept for good; the weather is then requested by latitude/longitude.
+Responses are cached in SQLite per location. A cached answer younger than
+the TTL is used without any request; an older one is still shown at once
+and a fresh one is fetched in the background (stale-while-revalidate).
+Requests run on a worker pool and a response already being fetched is not
+requested a second time. WeatherScheduler keeps the current weather and
+the 5-day forecast of one location fresh on an interval.
+"""
+
+import datetime
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import config
+from src.services import http_client
+
+OPENWEATHER_URL = "http://api.openweathermap.org/data/2.5"
+GEOCODING_URL = "http://api.openweathermap.org/geo/1.0/direct"
+
+# Callbacks run on a worker thread (or the caller's for cached data); widgets
+# hand them to the Tk main thread with after()
+DataCallback = Callable[[Dict, bool], None]  # data, True while it is older than the TTL
+ErrorCallback = Callable[[str], None]
+
+# Days shown by daily_forecast() (the forecast API covers 5 days in 3-hour steps)
+FORECAST_DAYS = 5
+
+
+class WeatherError(Exception):
+    """OpenWeather answered with an error (unknown city, invalid key, ...)."""
+
+
+def has_api_key(api_key: str) -> bool:
+    return bool(api_key) and api_key != "your_openweather_api_key_here"
+
+
+def location_key(location: str) -> str:
+    """Cache key of a location: "София,BG" and " софия,bg" are the same place."""
+    return " ".join(location.split()).casefold()
+
+
+def geocode(location: str, api_key: str) -> Dict:
+    """
+    Resolve a location name such as "София,BG" with the geocoding API.
+
+    Returns:
+        {"name", "country", "lat", "lon"} of the best match
+    """
+    places = _get(GEOCODING_URL, {"q": location, "limit": 1}, api_key)
+    if not places:
+        raise WeatherError("Местоположението не е намерено")
+
+    place = places[0]
+    return {
+        "name": place.get("local_names", {}).get("bg", place["name"]),
+        "country": place.get("country", ""),
+        "lat": place["lat"],
+        "lon": place["lon"],
+    }
+
+
+def fetch_current(place: Dict, api_key: str) -> Dict:
+    """Request the current weather at the coordinates of a geocoded place."""
+    return _get(f"{OPENWEATHER_URL}/weather", _coordinates(place), api_key)
+
+
+def fetch_forecast(place: Dict, api_key: str) -> Dict:
+    """Request the 5-day forecast (3-hour steps) at the coordinates of a geocoded place."""
+    return _get(f"{OPENWEATHER_URL}/forecast", _coordinates(place), api_key)
+
+
+def daily_forecast(forecast: Dict, days: int = FORECAST_DAYS) -> List[Dict]:
+    """
+    Summarize a 3-hour forecast by day.
+
+    Returns:
+        Up to days dicts with date, temp_min, temp_max, and the description
+        and icon of the step closest to noon, in the location's local time
+    """
+    offset = datetime.timedelta(seconds=forecast.get("city", {}).get("timezone", 0))
+    by_day: Dict[datetime.date, List[Tuple[datetime.datetime, Dict]]] = {}
+    for step in forecast.get("list", []):
+        local = datetime.datetime.fromtimestamp(step["dt"], datetime.timezone.utc) + offset
+        by_day.setdefault(local.date(), []).append((local, step))
+
+    summary = []
+    for date in sorted(by_day)[:days]:
+        steps = by_day[date]
+        _, noon = min(steps, key=lambda item: abs(item[0].hour - 12))
+        summary.append({
+            "date": date,
+            "temp_min": min(step["main"]["temp_min"] for _, step in steps),
+            "temp_max": max(step["main"]["temp_max"] for _, step in steps),
+            "description": noon["weather"][0]["description"],
+            "icon": noon["weather"][0]["icon"],
+        })
+    return summary
+
+
+class WeatherService:
+    def __init__(self, cache_path: str = config.WEATHER_CACHE_PATH,
+                 ttl: float = config.WEATHER_CACHE_TTL):
+        """
+        Args:
+            cache_path: SQLite file holding the cached responses
+            ttl: Seconds a cached response is used without asking again
+        """
+        self.ttl = ttl
+
+        directory = os.path.dirname(cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # One connection shared by the UI and the workers; the queries are tiny
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS weather (
+                    key TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    fetched_at REAL NOT NULL
+                )
+            """)
+            # Places do not move, so these never expire
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS geocodes (
+                    key TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    country TEXT NOT NULL,
+                    lat REAL NOT NULL,
+                    lon REAL NOT NULL
+                )
+            """)
+
+        self._executor = ThreadPoolExecutor(max_workers=config.WEATHER_WORKERS,
+                                            thread_name_prefix="weather")
+        self._in_flight: Dict[str, Future] = {}
+        self._geocode_locks: Dict[str, threading.Lock] = {}
+
+    def cached(self, location: str) -> Optional[Tuple[Dict, float]]:
+        """Return the cached current weather of a location and its age in seconds."""
+        return self._cache_get(f"current:{location_key(location)}")
+
+    def cached_forecast(self, location: str) -> Optional[Tuple[Dict, float]]:
+        """Return the cached forecast of a location and its age in seconds."""
+        return self._cache_get(f"forecast:{location_key(location)}")
+
+    def get_current(self, location: str, api_key: str, on_data: DataCallback,
+                    on_error: Optional[ErrorCallback] = None, force: bool = False) -> bool:
+        """
+        Deliver the current weather of a location.
+
+        A cached response is passed to on_data right away. When there is none,
+        it is older than the TTL or force is set, the weather is fetched in
+        the background and passed to on_data again (or the error to on_error).
+
+        Returns:
+            True if a request was started or joined
+        """
+        key = f"current:{location_key(location)}"
+        entry = self._cache_get(key)
+        if entry is not None:
+            data, age = entry
+            on_data(data, age > self.ttl)
+            if age <= self.ttl and not force:
+                return False
+
+        future = self._submit(key, lambda: self._fetch("current", location, api_key))
+
+        def deliver(done: Future):
+            try:
+                if done.exception() is None:
+                    on_data(done.result(), False)
+                elif on_error is not None:
+                    on_error(error_message(done.exception()))
+            except Exception as e:
+                print(f"Грешка при обработка на данните за времето: {e}")
+
+        future.add_done_callback(deliver)
+        return True
+
+    def refresh(self, location: str, api_key: str, forecast: bool = True) -> Tuple[Dict, Optional[Dict]]:
+        """
+        Return the current weather and the forecast of a location, fetching
+        (in parallel) whichever is missing or older than the TTL. Blocks, so
+        it is meant for background threads.
+
+        Args:
+            forecast: False to refresh only the current weather (the forecast
+                      is then None)
+
+        Raises:
+            WeatherError or a network error when a needed request fails
+        """
+        futures, results = {}, {"forecast": None}
+        for kind in ("current", "forecast") if forecast else ("current",):
+            key = f"{kind}:{location_key(location)}"
+            entry = self._cache_get(key)
+            if entry is not None and entry[1] <= self.ttl:
+                results[kind] = entry[0]
+            else:
+                futures[kind] = self._submit(key, lambda kind=kind: self._fetch(kind, location, api_key))
+
+        for kind, future in futures.items():
+            results[kind] = future.result()
+        return results["current"], results["forecast"]
+
+    def place(self, location: str, api_key: str) -> Dict:
+        """
+        Return the geocoded place of a location name, asking the geocoding
+        API only the first time. Blocks, so it is meant for background threads.
+        """
+        key = location_key(location)
+        place = self._geocode_get(key)
+        if place is not None:
+            return place
+
+        # Parallel requests for a new location geocode it once
+        with self._lock:
+            lock = self._geocode_locks.setdefault(key, threading.Lock())
+        with lock:
+            place = self._geocode_get(key)
+            if place is None:
+                place = geocode(location, api_key)
+                with self._lock, self._conn:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO geocodes (key, name, country, lat, lon) VALUES (?, ?, ?, ?, ?)",
+                        (key, place["name"], place["country"], place["lat"], place["lon"])
+                    )
+        return place
+
+    def submit(self, key: str, task: Callable[[], object]) -> Future:
+        """Run a task on the worker pool, or join the running task with the same key."""
+        return self._submit(key, task)
+
+    def clear(self):
+        """Remove every cached response (the geocoded places are kept)."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM weather")
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            self._conn.close()
+
+    def _submit(self, key: str, fetch: Callable[[], Dict]) -> Future:
+        """Start a fetch of the response cached under key, or join the one in flight."""
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                return future
+            future = self._executor.submit(fetch)
+            self._in_flight[key] = future
+        # Outside the lock: a fetch that is already done runs the callback right here
+        future.add_done_callback(lambda done: self._forget(key, done))
+        return future
+
+    def _forget(self, key: str, future: Future):
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+    def _fetch(self, kind: str, location: str, api_key: str) -> Dict:
+        """Request the current weather or the forecast of a location and cache it."""
+        fetch = fetch_current if kind == "current" else fetch_forecast
+        data = fetch(self.place(location, api_key), api_key)
+        self._cache_put(f"{kind}:{location_key(location)}", data)
+        return data
+
+    def _geocode_get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT name, country, lat, lon FROM geocodes WHERE key=?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"name": row[0], "country": row[1], "lat": row[2], "lon": row[3]}
+
+    def _cache_get(self, key: str) -> Optional[Tuple[Dict, float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, fetched_at FROM weather WHERE key=?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), max(time.time() - row[1], 0.0)
+
+    def _cache_put(self, key: str, data: Dict):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO weather (key, data, fetched_at) VALUES (?, ?, ?)",
+                (key, json.dumps(data, ensure_ascii=False), time.time())
+            )
+
+
+class WeatherScheduler:
+    def __init__(self, service: WeatherService,
+                 on_update: Callable[[str, Optional[Dict], Optional[Dict], Optional[str]], None],
+                 interval: float = config.WEATHER_REFRESH_INTERVAL, forecast: bool = True):
+        """
+        Refreshes the current weather and the forecast of one location on a
+        background thread. After a failed refresh, or while there is no API
+        key, the next attempt waits WEATHER_BACKOFF_BASE seconds, doubling up
+        to WEATHER_BACKOFF_MAX.
+
+        Args:
+            service: Service doing the cached requests
+            on_update: Called on the scheduler thread with (location, current,
+                       forecast, None) after a refresh or (location, None,
+                       None, error message)
+            interval: Seconds between refreshes
+            forecast: False to refresh only the current weather
+        """
+        self.service = service
+        self.on_update = on_update
+        self.interval = interval
+        self.forecast = forecast
+        self.failures = 0
+
+        self._location = ""
+        self._api_key = ""
+        self._target_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._active = threading.Event()  # cleared while paused
+        self._active.set()
+        self._stopped = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def set_target(self, location: str, api_key: str):
+        """Switch to a location (or API key) and refresh right away."""
+        with self._target_lock:
+            self._location = location
+            self._api_key = api_key
+        self.failures = 0
+        self._wake.set()
+
+    def pause(self):
+        """Stop refreshing (e.g. while the window is minimized)."""
+        self._active.clear()
+
+    def resume(self):
+        """Continue refreshing; a refresh that fell due meanwhile runs at once."""
+        self._active.set()
+
+    def stop(self):
+        self._stopped = True
+        self._active.set()
+        self._wake.set()
+
+    def next_delay(self) -> float:
+        """Seconds until the next refresh."""
+        if self.failures == 0:
+            return self.interval
+        return min(config.WEATHER_BACKOFF_BASE * 2 ** (self.failures - 1), config.WEATHER_BACKOFF_MAX)
+
+    def _run(self):
+        delay = 0
+        while True:
+            self._wake.wait(delay)
+            self._wake.clear()
+            self._active.wait()
+            if self._stopped:
+                break
+
+            with self._target_lock:
+                location, api_key = self._location, self._api_key
+            if location:
+                self._refresh(location, api_key)
+            delay = self.next_delay()
+
+    def _refresh(self, location: str, api_key: str):
+        if not has_api_key(api_key):
+            self.failures += 1
+            current, forecast, error = None, None, "API ключ не е намерен"
+        else:
+            try:
+                current, forecast = self.service.refresh(location, api_key, self.forecast)
+                self.failures, error = 0, None
+            except Exception as e:
+                self.failures += 1
+                current, forecast, error = None, None, error_message(e)
+
+        try:
+            self.on_update(location, current, forecast, error)
+        except Exception as e:
+            print(f"Грешка при обработка на данните за времето: {e}")
+
+
+def error_message(error: BaseException) -> str:
+    """Text shown for a failed request."""
+    if isinstance(error, WeatherError):
+        return str(error)
+    return f"Грешка при извличане на данни за времето: {error}"
+
+
+def _coordinates(place: Dict) -> Dict:
+    return {"lat": place["lat"], "lon": place["lon"]}
+
+
+def _get(url: str, params: Dict, api_key: str):
+    """GET an OpenWeather URL; the geocoding API answers with a list, the others with a dict."""
+    response = http_client.get(
+        url,
+        params=dict(params, appid=api_key, units="metric", lang="bg"),
+        timeout=config.WEATHER_TIMEOUT
+    )
+    try:
+        data = response.json()
+    except ValueError:
+        data = {}
+
+    if response.status_code != 200:
+        message = data.get("message") if isinstance(data, dict) else None
+        raise WeatherError(message or f"Status code {response.status_code}")
+    return data
@@ -0,0 +1,84 @@
+"""Tests for the keyset-paginated todo reader behind the todo list."""
+
+import os
+
+import pytest
+
+from src.database.db_manager import DatabaseManager
+from src.database.stores import TodoStore
+
+PRIORITY_ORDER = {"High": 0, "Medium": 1, "Low": 2}
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseManager(os.path.join(tmp_path, "todos.db"))
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def store(db):
+    # Several todos per priority share a created_at, so the id has to break ties
+    with db.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO todos (task, completed, priority, created_at) VALUES (?, ?, ?, ?)",
+            ((f"Задача {i}", i % 3 == 0, ["low", "medium", "high"][i % 3],
+              f"2024-01-01 00:{i % 7:02d}:00") for i in range(120))
+        )
+    return TodoStore(db)
+
+
+def read_all(store, page_size, completed=None):
+    todos, cursor = store.load_page(page_size, completed=completed)
+    while cursor is not None:
+        page, cursor = store.load_page(page_size, after=cursor, completed=completed)
+        todos.extend(page)
+    return todos
+
+
+def list_order(todo):
+    return todo['completed'], PRIORITY_ORDER[todo['priority']], todo['created'], todo['id']
+
+
+def test_pages_cover_every_todo_in_list_order(store):
+    todos = read_all(store, 25)
+
+    assert len(todos) == 120
+    assert len({todo['id'] for todo in todos}) == 120
+    assert todos == sorted(todos, key=list_order)
+
+
+@pytest.mark.parametrize("completed", [False, True])
+def test_pages_of_one_tab(store, completed):
+    todos = read_all(store, 7, completed=completed)
+
+    assert len(todos) == (40 if completed else 80)
+    assert all(todo['completed'] == completed for todo in todos)
+    assert todos == sorted(todos, key=list_order)
+
+
+def test_last_page_has_no_cursor(store):
+    todos, cursor = store.load_page(120)
+
+    assert len(todos) == 120
+    assert cursor is None
+
+
+def test_counts_and_delete_completed(store):
+    assert store.counts() == (80, 40)
+
+    assert store.delete_completed() == 40
+    assert store.counts() == (80, 0)
+    assert store.load_page(10, completed=True) == ([], None)
+
+
+def test_deep_page_seeks_the_index(db, store):
+    _, cursor = store.load_page(100)
+    plan = " ".join(row[3] for row in db._get_connection().execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM todos WHERE (completed, priority_rank, created_at, id) > (?, ?, ?, ?) "
+        "ORDER BY completed ASC, priority_rank ASC, created_at ASC, id ASC LIMIT 10", cursor
+    ))
+
+    assert "idx_todos_list_order" in plan
+    assert "TEMP B-TREE" not in plan